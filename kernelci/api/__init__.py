@@ -7,18 +7,24 @@
 """KernelCI API"""
 
 import abc
+import collections
+import concurrent.futures
 import importlib
+import itertools
 import json
+import threading
 import urllib
 from typing import Dict, Optional, Sequence
 
 import requests
+import urllib3
 from requests.adapters import HTTPAdapter
 from urllib3.util import Retry
 
 import kernelci.config.api
 
 HTTP_ERROR_BODY_SNIPPET = 512
+RETRY_STATUS_FORCELIST = [500, 502, 503, 504, 521]
 
 
 def _http_error_body_snippet(
@@ -94,6 +100,25 @@ def _enrich_http_error(error, max_length: int = HTTP_ERROR_BODY_SNIPPET):
     error.args = (": ".join(message_parts),)
 
 
+class _PoolAdapter(HTTPAdapter):
+    """HTTP adapter using a connection pool shared with other adapters
+
+    This lets each HTTP method have its own retry policy while all the
+    requests still go through the same pool of persistent connections.
+    """
+
+    def __init__(self, poolmanager, max_retries):
+        self._shared_poolmanager = poolmanager
+        super().__init__(max_retries=max_retries)
+
+    def init_poolmanager(self, *args, **kwargs):
+        self.poolmanager = self._shared_poolmanager
+
+    def close(self):
+        # The shared pool is closed by its owner, see Data.close()
+        pass
+
+
 class Data:
     """Convenience class to keep common data in API bindings implementation"""
 
@@ -103,7 +128,12 @@ class Data:
         self._headers = {}
         if self._token:
             self._headers["Authorization"] = f"Bearer {self._token}"
+        if not config.keep_alive:
+            self._headers["Connection"] = "close"
         self._timeout = float(config.timeout)
+        self._lock = threading.Lock()
+        self._poolmanager: Optional[urllib3.PoolManager] = None
+        self._sessions: Dict[str, requests.Session] = {}
 
     @property
     def config(self) -> kernelci.config.api.API:
@@ -120,6 +150,65 @@ class Data:
         """HTTP headers with content type, authorization token etc."""
         return self._headers
 
+    def session(self, method: str) -> requests.Session:
+        """Get the persistent HTTP session to use for a given method
+
+        All the sessions share the same connection pool, they only differ by
+        their retry policy as set in the API configuration.  This method is
+        thread-safe.
+        """
+        with self._lock:
+            session = self._sessions.get(method)
+            if session is None:
+                if self._poolmanager is None:
+                    self._poolmanager = urllib3.PoolManager(
+                        maxsize=self.config.pool_size
+                    )
+                retry_strategy = Retry(
+                    total=self.config.retries.get(method, 0),
+                    backoff_factor=1,
+                    status_forcelist=RETRY_STATUS_FORCELIST,
+                    allowed_methods=[method],
+                )
+                adapter = _PoolAdapter(self._poolmanager, retry_strategy)
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[method] = session
+            return session
+
+    def pool_stats(self) -> dict:
+        """Get the connection pool statistics
+
+        Return a dictionary with the number of `requests` sent, the number of
+        `connections_opened` and the number of `connections_reused` in the
+        connection pools currently alive.
+        """
+        opened = requests_sent = 0
+        with self._lock:
+            if self._poolmanager is not None:
+                pools = self._poolmanager.pools
+                for key in pools.keys():
+                    pool = pools.get(key)
+                    if pool is not None:
+                        opened += pool.num_connections
+                        requests_sent += pool.num_requests
+        return {
+            "requests": requests_sent,
+            "connections_opened": opened,
+            "connections_reused": max(requests_sent - opened, 0),
+        }
+
+    def close(self):
+        """Close all the persistent HTTP connections"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            if self._poolmanager is not None:
+                self._poolmanager.clear()
+                self._poolmanager = None
+
 
 class Base:
     """Common primitive methods used in API bindings implementation"""
@@ -139,17 +228,7 @@ class Base:
 
     def _get(self, path, params=None):
         url = self.make_url(path)
-        retry_strategy = Retry(
-            total=5,
-            backoff_factor=1,
-            status_forcelist=[500, 502, 503, 504, 521],
-            allowed_methods=["GET"],  # need this
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session = requests.Session()
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
-
+        session = self.data.session("GET")
         resp = session.get(
             url,
             params=params,
@@ -178,16 +257,7 @@ class Base:
 
         """
         url = self.make_url(path)
-        retry_strategy = Retry(
-            total=5,
-            backoff_factor=1,
-            status_forcelist=[500, 502, 503, 504, 521],
-            allowed_methods=["POST"],  # need this
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session = requests.Session()
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
+        session = self.data.session("POST")
 
         if isinstance(data, str):
             # If the payload is a string we pass it as it is to
@@ -237,17 +307,7 @@ class Base:
 
     def _put(self, path, data=None, params=None):
         url = self.make_url(path)
-        retry_strategy = Retry(
-            total=5,
-            backoff_factor=1,
-            status_forcelist=[500, 502, 503, 504, 521],
-            allowed_methods=["PUT"],  # need this
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session = requests.Session()
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
-
+        session = self.data.session("PUT")
         resp = session.put(
             url,
             json=data,
@@ -264,17 +324,7 @@ class Base:
 
     def _patch(self, path, data=None, params=None):
         url = self.make_url(path)
-        retry_strategy = Retry(
-            total=5,
-            backoff_factor=1,
-            status_forcelist=[500, 502, 503, 504, 521],
-            allowed_methods=["PATCH"],  # need this
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session = requests.Session()
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
-
+        session = self.data.session("PATCH")
         resp = session.patch(
             url,
             json=data,
@@ -289,7 +339,15 @@ class Base:
             raise
         return resp
 
-    def _get_paginated(self, input_params, path, offset=None, limit=None):
+    def _get_paginated(
+        self,
+        input_params,
+        path,
+        offset=None,
+        limit=None,
+        page_size=100,
+        prefetch=0,
+    ):
         params = input_params.copy()
 
         if any((offset, limit)):
@@ -303,19 +361,62 @@ class Base:
             items = resp.json()["items"]
             return items
 
-        objs = []
-        offset = 0
-        limit = 100
-        params["limit"] = limit
-        while True:
-            params["offset"] = offset
-            resp = self._get(path, params=params)
-            items = resp.json()["items"]
-            objs.extend(items)
-            if len(items) < limit:
-                break
-            offset += limit
-        return objs
+        return list(self._iter_paginated(params, path, page_size, prefetch))
+
+    def _get_page(self, params, path, offset, limit):
+        page_params = params | {"offset": offset, "limit": limit}
+        return self._get(path, params=page_params).json()
+
+    def _iter_paginated(self, input_params, path, page_size=100, prefetch=0):
+        """Iterate over all the items from a paginated endpoint
+
+        Pages of *page_size* items are fetched as the iteration goes on.  If
+        the first page shows there are more items, up to *prefetch* of the
+        following pages are fetched in parallel using the `total` count from
+        the response to plan the offsets.  Items are always yielded in the
+        same order as with sequential pagination.
+        """
+        params = input_params.copy()
+        page = self._get_page(params, path, 0, page_size)
+        items = page["items"]
+        yield from items
+        offset = page_size
+        total = page.get("total")
+
+        if prefetch and total is not None and total > offset:
+            offsets = iter(range(offset, total, page_size))
+            executor = concurrent.futures.ThreadPoolExecutor(prefetch)
+            try:
+                pending = collections.deque(
+                    executor.submit(
+                        self._get_page, params, path, page_offset, page_size
+                    )
+                    for page_offset in itertools.islice(offsets, prefetch)
+                )
+                while pending:
+                    items = pending.popleft().result()["items"]
+                    page_offset = next(offsets, None)
+                    if page_offset is not None:
+                        pending.append(
+                            executor.submit(
+                                self._get_page,
+                                params,
+                                path,
+                                page_offset,
+                                page_size,
+                            )
+                        )
+                    yield from items
+                    offset += page_size
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+        # Carry on sequentially, also in case new items were added since the
+        # total count was first retrieved
+        while len(items) == page_size:
+            items = self._get_page(params, path, offset, page_size)["items"]
+            yield from items
+            offset += page_size
 
     def _get_fast(self, input_params, path):
         params = input_params.copy()
@@ -324,17 +425,7 @@ class Base:
 
     def _delete(self, path):
         url = self.make_url(path)
-        retry_strategy = Retry(
-            total=5,
-            backoff_factor=1,
-            status_forcelist=[500, 502, 503, 504, 521],
-            allowed_methods=["DELETE"],  # need this
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session = requests.Session()
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
-
+        session = self.data.session("DELETE")
         resp = session.delete(
             url, headers=self.data.headers, timeout=self.data.timeout
         )
@@ -0,0 +1,539 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+#
+# Copyright (C) 2026 Collabora Limited
+
+"""KernelCI API asyncio bindings
+
+This module provides asyncio-native bindings mirroring the synchronous ones
+from kernelci.api.latest.  It is kept separate so that aiohttp only gets
+imported by the applications that actually need it.
+"""
+
+import asyncio
+import json
+import urllib
+from typing import Awaitable, Dict, Iterable, List, Optional, Sequence
+
+import aiohttp
+
+import kernelci.config.api
+
+from . import HTTP_ERROR_BODY_SNIPPET, RETRY_STATUS_FORCELIST
+from .latest import NodeStates
+
+
+async def gather(aws: Iterable[Awaitable], concurrency: int = 10) -> list:
+    """Run awaitables with bounded concurrency
+
+    Run all the awaitables from *aws* with at most *concurrency* of them
+    pending at a time, and return a list of their results in the same order
+    as the input.  The first exception raised by any of them is propagated.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _bounded(aw):
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*(_bounded(aw) for aw in aws))
+
+
+class AsyncData:
+    """Common data shared by all the asyncio API bindings
+
+    This holds a single aiohttp client session with a pool of keep-alive
+    connections, created on first use in the running event loop.
+    """
+
+    def __init__(self, config: kernelci.config.api.API, token: str):
+        self._config = config
+        self._headers = {}
+        if token:
+            self._headers["Authorization"] = f"Bearer {token}"
+        self._timeout = aiohttp.ClientTimeout(total=float(config.timeout))
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def config(self) -> kernelci.config.api.API:
+        """API config object"""
+        return self._config
+
+    @property
+    def headers(self) -> dict:
+        """HTTP headers with authorization token etc."""
+        return self._headers
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Shared aiohttp client session"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.config.pool_size,
+                force_close=not self.config.keep_alive,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self._headers,
+                timeout=self._timeout,
+            )
+        return self._session
+
+    async def close(self):
+        """Close the client session and all its connections"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class AsyncBase:
+    """Common primitive methods used in asyncio API bindings"""
+
+    def __init__(self, data: AsyncData):
+        self._data = data
+
+    @property
+    def data(self) -> AsyncData:
+        """Internal AsyncData object instance"""
+        return self._data
+
+    def make_url(self, path: str) -> str:
+        """Make a full URL for a given API endpoint path"""
+        version_path = "/".join((self.data.config.version, path))
+        return urllib.parse.urljoin(self.data.config.url, version_path)
+
+    @classmethod
+    def _error_message(cls, resp, body):
+        message_parts = ["HTTP Error", str(resp.status), f"url={resp.url}"]
+        try:
+            payload = json.loads(body)
+            if isinstance(payload, dict):
+                payload = (
+                    payload.get("detail")
+                    or payload.get("error")
+                    or payload.get("message")
+                    or payload
+                )
+            snippet = (
+                payload if isinstance(payload, str) else json.dumps(payload)
+            )
+        except ValueError:
+            snippet = body
+        snippet = snippet.strip()
+        if len(snippet) > HTTP_ERROR_BODY_SNIPPET:
+            snippet = snippet[:HTTP_ERROR_BODY_SNIPPET] + "..."
+        if snippet:
+            message_parts.append(f"body={snippet}")
+        return ": ".join(message_parts)
+
+    async def _request(self, method, path, **kwargs):
+        """Send an HTTP request and return the decoded JSON response
+
+        Server errors and connection errors are retried with an exponential
+        backoff according to the per-method retry policy in the API config.
+        """
+        url = self.make_url(path)
+        retries = self.data.config.retries.get(method, 0)
+        for attempt in range(retries + 1):
+            if attempt > 1:
+                await asyncio.sleep(2 ** (attempt - 1))
+            try:
+                async with self.data.session.request(
+                    method, url, **kwargs
+                ) as resp:
+                    body = await resp.text()
+            except aiohttp.ClientConnectionError:
+                if attempt == retries:
+                    raise
+                continue
+            if resp.status in RETRY_STATUS_FORCELIST and attempt < retries:
+                continue
+            if resp.status >= 400:
+                raise aiohttp.ClientResponseError(
+                    resp.request_info,
+                    resp.history,
+                    status=resp.status,
+                    message=self._error_message(resp, body),
+                    headers=resp.headers,
+                )
+            return json.loads(body) if body else None
+        return None
+
+    async def _get(self, path, params=None):
+        return await self._request("GET", path, params=params)
+
+    async def _post(self, path, data=None, params=None, json_data=True):
+        """Issues an API POST request to the endpoint specified in <path>.
+
+        Arguments:
+          path: API endpoint
+          data: request payload, either a dict or a string which is sent
+              as it is
+          params: additional query parameters
+          json_data: True if the payload is a json definition, False for
+              x-www-form-urlencoded
+        """
+        if isinstance(data, str):
+            content_type = (
+                "application/json"
+                if json_data
+                else "application/x-www-form-urlencoded"
+            )
+            return await self._request(
+                "POST",
+                path,
+                data=data,
+                params=params,
+                headers={"Content-Type": content_type},
+            )
+        if json_data:
+            return await self._request("POST", path, json=data, params=params)
+        return await self._request("POST", path, data=data, params=params)
+
+    async def _put(self, path, data=None, params=None):
+        return await self._request("PUT", path, json=data, params=params)
+
+    async def _patch(self, path, data=None, params=None):
+        return await self._request("PATCH", path, json=data, params=params)
+
+    async def _delete(self, path):
+        return await self._request("DELETE", path)
+
+    async def _get_paginated(self, input_params, path, offset=None, limit=None):
+        params = input_params.copy()
+
+        if any((offset, limit)):
+            params.update(
+                {
+                    key: value
+                    for key, value in (("offset", offset), ("limit", limit))
+                    if value
+                }
+            )
+            return (await self._get(path, params=params))["items"]
+
+        objs = []
+        offset = 0
+        limit = 100
+        params["limit"] = limit
+        while True:
+            params["offset"] = offset
+            items = (await self._get(path, params=params))["items"]
+            objs.extend(items)
+            if len(items) < limit:
+                break
+            offset += limit
+        return objs
+
+
+class AsyncLatestAPI(AsyncBase):
+    """Asyncio bindings for the latest API version
+
+    All the methods are coroutines mirroring the ones in LatestAPI, except
+    they return the decoded JSON data rather than HTTP response objects.  The
+    object can be used as an asynchronous context manager to close the
+    underlying HTTP session when done:
+
+      async with AsyncLatestAPI(config, token) as api:
+          nodes = await api.node.get_many(node_ids)
+    """
+
+    def __init__(self, config: kernelci.config.api.API, token: str):
+        super().__init__(AsyncData(config, token))
+        self._node = self.Node(self.data)
+        self._user = self.User(self.data)
+        self._telemetry = self.Telemetry(self.data)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def close(self):
+        """Close the HTTP session"""
+        await self.data.close()
+
+    @property
+    def config(self) -> kernelci.config.api.API:
+        """API configuration data"""
+        return self.data.config
+
+    @property
+    def version(self) -> str:
+        """API version"""
+        return self.config.version
+
+    async def hello(self) -> dict:
+        """Get the hello message"""
+        return await self._get("/")
+
+    class User(AsyncBase):
+        """User bindings for the latest API version"""
+
+        async def whoami(self) -> dict:
+            """Get information about the current user"""
+            return await self._get("/whoami")
+
+        async def create_token(self, username: str, password: str) -> dict:
+            """Create a new API token for the current user"""
+            data = {
+                "username": username,
+                "password": password,
+            }
+            return await self._post("/user/login", data, json_data=False)
+
+        async def get(self, user_id: str) -> dict:
+            """Get the user matching the given user id"""
+            return await self._get(f"user/{user_id}")
+
+        async def find(
+            self,
+            attributes: Dict[str, str],
+            offset: Optional[int] = None,
+            limit: Optional[int] = None,
+        ) -> Sequence[dict]:
+            """Find user accounts that match the provided attributes"""
+            params = attributes.copy() if attributes else {}
+            return await self._get_paginated(params, "users", offset, limit)
+
+        async def add(self, user: dict) -> dict:
+            """Create a new user"""
+            return await self._post("user/register", user)
+
+        async def update(
+            self, fields: dict, user_id: Optional[str] = None
+        ) -> dict:
+            """Update a user matching with the provided fields"""
+            return await self._patch(f"user/{user_id or 'me'}", fields)
+
+        async def request_verification_token(self, email: str):
+            """Request an email verification token"""
+            return await self._post(
+                "user/request-verify-token", {"email": email}
+            )
+
+        async def verify_email(self, token: str):
+            """Verify the user's email address"""
+            return await self._post("user/verify", {"token": token})
+
+        async def request_password_reset_token(self, email: str):
+            """Request password reset token to be sent by email"""
+            return await self._post("user/forgot-password", {"email": email})
+
+        async def reset_password(self, token: str, password: str):
+            """Reset password"""
+            return await self._post(
+                "user/reset-password", {"token": token, "password": password}
+            )
+
+        async def update_password(
+            self, username: str, current_password: str, new_password: str
+        ):
+            """Update a user's password"""
+            data = {
+                "username": username,
+                "password": current_password,
+                "new_password": new_password,
+            }
+            return await self._post(
+                "user/update-password", data, json_data=False
+            )
+
+    @property
+    def user(self) -> User:
+        """AsyncLatestAPI.User part of the interface"""
+        return self._user
+
+    class Node(AsyncBase):
+        """Node bindings for the latest API version"""
+
+        @property
+        def states(self):
+            """An enum with all the valid node state names"""
+            return NodeStates
+
+        async def get(self, node_id: str) -> dict:
+            """Get the node matching the given node id"""
+            return await self._get(f"node/{node_id}")
+
+        async def get_many(
+            self, node_ids: Iterable[str], concurrency: Optional[int] = None
+        ) -> List[dict]:
+            """Get the nodes matching the given node ids
+
+            Send the requests with at most *concurrency* of them in flight at
+            a time, or the API config pool size by default.  The nodes are
+            returned in the same order as *node_ids*.
+            """
+            return await gather(
+                (self.get(node_id) for node_id in node_ids),
+                concurrency or self.data.config.pool_size,
+            )
+
+        async def find(
+            self,
+            attributes: Dict[str, str],
+            offset: Optional[int] = None,
+            limit: Optional[int] = None,
+        ) -> Sequence[dict]:
+            """Find nodes that match the provided attributes"""
+            params = attributes.copy() if attributes else {}
+            return await self._get_paginated(params, "nodes", offset, limit)
+
+        async def findfast(self, attributes: Dict[str, str]) -> dict:
+            """
+            Find nodes with arbitrary attributes using non-paginated
+            endpoint
+            """
+            params = attributes.copy() if attributes else {}
+            return await self._get("nodes/fast", params=params)
+
+        async def count(self, attributes: dict) -> int:
+            """Count nodes that match the provided attributes"""
+            return await self._get("count", params=attributes)
+
+        async def add(self, node: dict) -> dict:
+            """Create a new node object (no id)"""
+            return await self._post("node", node)
+
+        async def update(self, node: dict, noevent=False) -> dict:
+            """Update an existing node object (with id)"""
+            if node["result"] != "incomplete":
+                data = node.get("data", {})
+                if data.get("error_code") == "node_timeout":
+                    node["data"]["error_code"] = None
+                    node["data"]["error_msg"] = None
+            uri = "/".join(["node", node["id"]])
+            if noevent:
+                uri += "?noevent=true"
+            return await self._put(uri, node)
+
+        async def bulkset(self, nodes: list, field: str, value: str):
+            """
+            Set a field to a value for a list of nodes(ids)
+            """
+            param = {"nodes": nodes, "field": field, "value": value}
+            return await self._put("batch/nodeset", data=param)
+
+    @property
+    def node(self) -> Node:
+        """AsyncLatestAPI.Node part of the interface"""
+        return self._node
+
+    class Telemetry(AsyncBase):
+        """Telemetry bindings for the latest API version"""
+
+        async def add(self, events: list) -> dict:
+            """Bulk insert telemetry events"""
+            return await self._post("telemetry", events)
+
+        async def find(
+            self,
+            attributes: Dict[str, str],
+            offset: Optional[int] = None,
+            limit: Optional[int] = None,
+        ) -> Sequence[dict]:
+            """Find telemetry events matching the provided attributes"""
+            params = attributes.copy() if attributes else {}
+            return await self._get_paginated(params, "telemetry", offset, limit)
+
+        async def stats(self, attributes: Dict[str, str]) -> list:
+            """Get aggregated telemetry statistics"""
+            params = attributes.copy() if attributes else {}
+            return await self._get("telemetry/stats", params=params)
+
+    @property
+    def telemetry(self) -> Telemetry:
+        """AsyncLatestAPI.Telemetry part of the interface"""
+        return self._telemetry
+
+    async def subscribe(
+        self,
+        channel: str,
+        promisc: Optional[bool] = None,
+        subscriber_id: Optional[str] = None,
+    ) -> int:
+        """Subscribe to a pub/sub channel"""
+        params: Dict[str, str] = {}
+        if promisc:
+            params["promisc"] = "true"
+        if subscriber_id:
+            params["subscriber_id"] = subscriber_id
+        resp = await self._post(f"subscribe/{channel}", params=params)
+        return resp["id"]
+
+    async def unsubscribe(self, sub_id: int):
+        """Unsubscribe from the given subscription id"""
+        await self._post(f"unsubscribe/{sub_id}")
+
+    async def send_event(self, channel: str, data):
+        """Send an event to a given pub/sub channel"""
+        await self._post("/".join(["publish", channel]), data)
+
+    async def receive_event(self, sub_id: int, block: bool = True):
+        """Listen and receive an event from a given subscription id"""
+        path = "/".join(["listen", str(sub_id)])
+        while True:
+            resp = await self._get(path)
+            data = resp.get("data")
+            if not data:
+                continue
+            event = json.loads(data)
+            if event.get("data") == "BEEP":
+                if not block:
+                    return None
+                continue
+            return event
+
+    async def push_event(self, list_name: str, data):
+        """Push an event to a given Redis List"""
+        await self._post("/".join(["push", list_name]), data)
+
+    async def pop_event(self, list_name: str) -> dict:
+        """Listen and pop an event from a given List"""
+        return await self._get("/".join(["pop", str(list_name)]))
+
+    async def subscription_stats(self):
+        """Get Pub/Sub scribscription statistics"""
+        return await self._get("stats/subscriptions")
+
+    async def get_group(self, group_id: str) -> dict:
+        """Get the user group matching the given group id"""
+        return await self._get(f"group/{group_id}")
+
+    async def get_groups(
+        self,
+        attributes: dict,
+        offset: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> Sequence[dict]:
+        """Get user groups that match the provided attributes"""
+        params = attributes.copy() if attributes else {}
+        return await self._get_paginated(params, "groups", offset, limit)
+
+    async def create_group(self, name: str) -> dict:
+        """Create a new group"""
+        return await self._post("group", {"name": name})
+
+    async def delete_group(self, group_id: str):
+        """Delete a group"""
+        return await self._delete(f"group/{group_id}")
+
+    async def set_kv(self, namespace: str, key: str, value: str):
+        """
+        Set a key-value pair in the database
+        """
+        return await self._post(f"kv/{namespace}/{key}", value)
+
+    async def get_kv(self, namespace: str, key: str) -> str:
+        """
+        Get a value from the database
+        """
+        return await self._get(f"kv/{namespace}/{key}")
+
+
+def get_api(config, token=None):
+    """Get an asyncio API object matching the provided configuration"""
+    if config.version != "latest":
+        raise ValueError(f"No asyncio bindings for API {config.version}")
+    return AsyncLatestAPI(config, token)
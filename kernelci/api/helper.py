@@ -7,12 +7,18 @@
 
 """KernelCI API helpers"""
 
+import collections
+import concurrent.futures
 import json
 import os
-from typing import Dict
+import threading
+import time
+from typing import Dict, Optional
 
 import requests
 
+from kernelci.config.rules import VersionRule, compile_rules
+
 from . import API
 
 
@@ -61,6 +67,62 @@ def merge(primary: dict, secondary: dict):
     return result
 
 
+class NodeCache:
+    """Bounded LRU cache of API nodes with a time-to-live
+
+    This is used to avoid retrieving the same ancestor nodes over and over
+    again from the API when evaluating rules.  Nodes are keyed by their id and
+    expire after *ttl* seconds, with at most *size* of them kept in the cache.
+    The cached node objects are shared and must not be modified.
+    """
+
+    def __init__(self, size=128, ttl=60):
+        self._size = size
+        self._ttl = ttl
+        self._nodes: collections.OrderedDict = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, node_id) -> Optional[dict]:
+        """Get a node from the cache or None if missing or expired"""
+        with self._lock:
+            entry = self._nodes.get(node_id)
+            if entry and time.monotonic() - entry[0] < self._ttl:
+                self._nodes.move_to_end(node_id)
+                self._hits += 1
+                return entry[1]
+            if entry:
+                del self._nodes[node_id]
+            self._misses += 1
+            return None
+
+    def put(self, node):
+        """Add or replace a node in the cache"""
+        if not self._size:
+            return
+        with self._lock:
+            self._nodes[node["id"]] = (time.monotonic(), node)
+            self._nodes.move_to_end(node["id"])
+            while len(self._nodes) > self._size:
+                self._nodes.popitem(last=False)
+
+    def invalidate(self, node_id):
+        """Drop a node from the cache if present"""
+        with self._lock:
+            self._nodes.pop(node_id, None)
+
+    def clear(self):
+        """Drop all the nodes from the cache"""
+        with self._lock:
+            self._nodes.clear()
+
+    @property
+    def stats(self) -> dict:
+        """Number of cache hits and misses"""
+        return {"hits": self._hits, "misses": self._misses}
+
+
 class APIHelper:
     """API helper base class
 
@@ -68,15 +130,28 @@ class APIHelper:
     applications.
     """
 
-    def __init__(self, api: API):
+    def __init__(self, api: API, node_cache_size=128, node_cache_ttl=60):
         self._api = api
         self._filters: Dict[str, Dict[str, str]] = {}
+        self._node_cache = NodeCache(node_cache_size, node_cache_ttl)
 
     @property
     def api(self):
         """API object"""
         return self._api
 
+    @property
+    def node_cache(self) -> NodeCache:
+        """Cache of ancestor nodes used when evaluating rules"""
+        return self._node_cache
+
+    def _get_cached_node(self, node_id):
+        node = self._node_cache.get(node_id)
+        if node is None:
+            node = self._api.node.get(node_id)
+            self._node_cache.put(node)
+        return node
+
     def subscribe_filters(
         self,
         filters=None,
@@ -161,6 +236,8 @@ class APIHelper:
             # Crude (provisional) filtering of non-node events
             if not node:
                 continue
+            # Any cached copy of the node is now out of date
+            self._node_cache.invalidate(node["id"])
             if all(
                 self.pubsub_event_filter(sub_id, obj) for obj in [node, event]
             ):
@@ -179,11 +256,11 @@ class APIHelper:
             elif field == item:
                 return node
         if node.get("parent"):
-            parent = self._api.node.get(node["parent"])
+            parent = self._get_cached_node(node["parent"])
             return self._find_container(field, parent)
         return None
 
-    def _is_allowed(self, rules, key, node):
+    def _is_allowed(self, rule, node):
         """
         Check whether the value of a specific node attribute matches
         a filtering rule. As the specified attribute might not be present
@@ -192,14 +269,14 @@ class APIHelper:
 
         Returns True if the rule allows the current value, False otherwise.
         """
+        key = rule.key
+        allow = rule.allow
+        deny = rule.deny
 
         # Find the node (or ancestor node) attribute corresponding to the
         # rule we're applying
         base = self._find_container(key, node)
 
-        deny = [f.lstrip("!") for f in rules[key] if f.startswith("!")]
-        allow = [f for f in rules[key] if not f.startswith("!")]
-
         # If the parameter (key) associated to a given rule cannot be found
         # in the current hierarchy, there are two cases:
         # * the rule only excludes certain values (no allowed value, only
@@ -235,7 +312,8 @@ class APIHelper:
             for item in base[key]:
                 if item in deny:
                     print(
-                        f"rules[{key}]: {key.capitalize()} {item} not allowed due !{deny}"
+                        f"rules[{key}]: {key.capitalize()} {item} not allowed due "
+                        f"!{list(rule.deny_list)}"
                     )
                     return False
                 if item in allow:
@@ -243,124 +321,98 @@ class APIHelper:
 
             if not found:
                 print(
-                    f"rules[{key}]: {key.capitalize()} missing one of {allow}"
+                    f"rules[{key}]: {key.capitalize()} missing one of "
+                    f"{list(rule.allow_list)}"
                 )
                 return False
 
         else:
             if base[key] in deny or (len(allow) > 0 and base[key] not in allow):
                 print(
-                    f"rules[{key}]: {key.capitalize()} {base[key]} not allowed due !{deny}"
+                    f"rules[{key}]: {key.capitalize()} {base[key]} not allowed due "
+                    f"!{list(rule.deny_list)}"
                 )
                 return False
 
         return True
 
-    def _extract_combos(self, rules, key):
+    def _is_tree_branch_allowed(self, node, tree_branch_rules):
         """
-        Process tree/branch rules and extract "combo" values.
+        Check whether the tree and/or branch for the current checkout matches
+        the corresponding filtering rules.
 
         Tree and branch rules can be formatted as `<tree>:<branch>`, meaning
         only a given branch is allowed for a specific tree. When prepended with
         `!`, it indicates a forbidden tree/branch combination.
 
-        In order to simplify further processing, this function processes those
-        rules and returns lists of allowed/denied single values and combos.
-
-        Returns a tuple of 4 arrays:
-          * allowed single values
-          * allowed combinations
-          * denied single values
-          * denied combinations
-        """
-
-        allow = []
-        allow_combos = []
-        deny = []
-        deny_combos = []
-
-        for rule in rules[key]:
-            if ":" in rule:
-                combo = {}
-                # we use ':' as a tree/branch separator as this character is forbidden
-                # in git branch names, so if found it should be present only once.
-                [combo["tree"], combo["branch"]] = rule.split(":", 1)
-                if combo["tree"].startswith("!"):
-                    combo["tree"] = combo["tree"].lstrip("!")
-                    deny_combos.append(combo)
-                else:
-                    allow_combos.append(combo)
-            else:
-                if rule.startswith("!"):
-                    deny.append(rule.lstrip("!"))
-                else:
-                    allow.append(rule)
-
-        return (allow, allow_combos, deny, deny_combos)
-
-    def _match_combos(self, node, combos):
-        """
-        Check whether the current node's tree/branch attributes match one of the
-        combinations present in combos.
-
-        Returns the matched combo or None.
+        Returns True if the rules allow the current value, False otherwise.
         """
-        match = None
-        for combo in combos:
-            if (
-                node["tree"] == combo["tree"]
-                and node["branch"] == combo["branch"]
-            ):
-                match = combo
+        combo = (node["tree"], node["branch"])
+        for rule in tree_branch_rules:
+            key = rule.key
+            # Process combos first:
+            # * if the tree/branch combination matches an allowed combo, then the node
+            #   fulfills the tree/branch rules and we can move forward to processing
+            #   the other rules
+            # * likewise, if the combination matches a denied combo, then we can stop
+            #   processing here and reject the node creation altogether
+            if combo in rule.allow_combos:
                 break
-        return match
-
-    def _is_tree_branch_allowed(self, node, rules):
-        """
-        Check whether the tree and/or branch for the current checkout matches
-        the corresponding filtering rules.
+            if combo in rule.deny_combos:
+                print(
+                    f"rules[{key}]: Tree/branch combination "
+                    f"{combo[0]}/{combo[1]} not allowed"
+                )
+                return False
 
-        Returns True if the rules allow the current value, False otherwise.
-        """
-        for key in ("tree", "branch"):
-            if key in rules:
-                (allow, allow_combos, deny, deny_combos) = self._extract_combos(
-                    rules, key
+            # Get back to regular allow/deny list processing
+            if node[key] in rule.deny:
+                print(
+                    f"rules[{key}]: {key.capitalize()} {node[key]} not allowed due "
+                    f"!{list(rule.deny_list)}"
                 )
-                # Process combos first:
-                # * if the tree/branch combination matches an allowed combo, then the node
-                #   fulfills the tree/branch rules and we can move forward to processing
-                #   the other rules
-                # * likewise, if the combination matches a denied combo, then we can stop
-                #   processing here and reject the node creation altogether
-                if self._match_combos(node, allow_combos):
-                    break
-                match = self._match_combos(node, deny_combos)
-                if match:
-                    print(
-                        f"rules[{key}]: Tree/branch combination "
-                        f"{match['tree']}/{match['branch']} not allowed"
-                    )
-                    return False
+                return False
+            if len(rule.allow) == 0 and len(rule.allow_combos) > 0:
+                print(
+                    f"rules[{key}]: {key.capitalize()} {node[key]} not allowed due"
+                    f" to tree/branch rules"
+                )
+                return False
+            if len(rule.allow) > 0 and node[key] not in rule.allow:
+                print(
+                    f"rules[{key}]: {key.capitalize()} {node[key]} not allowed due "
+                    f"{list(rule.allow_list)}"
+                )
+                return False
 
-                # Get back to regular allow/deny list processing
-                if node[key] in deny:
-                    print(
-                        f"rules[{key}]: {key.capitalize()} {node[key]} not allowed due !{deny}"
-                    )
-                    return False
-                if len(allow) == 0 and len(allow_combos) > 0:
-                    print(
-                        f"rules[{key}]: {key.capitalize()} {node[key]} not allowed due"
-                        f" to tree/branch rules"
-                    )
-                    return False
-                if len(allow) > 0 and node[key] not in allow:
-                    print(
-                        f"rules[{key}]: {key.capitalize()} {node[key]} not allowed due {allow}"
-                    )
-                    return False
+        return True
 
+    @classmethod
+    def _is_version_allowed(cls, rule, node):
+        """
+        Check whether the kernel version is within the minimum or maximum
+        version of the rule.  There is no field in the node giving us the full
+        kernel version in "x.y" format so it's compared as (major, minor).
+        """
+        kver = node["data"]["kernel_revision"]["version"]
+        major = kver["version"]
+        minor = kver["patchlevel"]
+        if rule.minimum and (
+            (major < rule.major) or (major == rule.major and minor < rule.minor)
+        ):
+            print(
+                f"rules[{rule.key}]: Version {major}.{minor} older than minimum version "
+                f"({rule.major}.{rule.minor})"
+            )
+            return False
+        if not rule.minimum and (
+            (major > rule.major) or (major == rule.major and minor > rule.minor)
+        ):
+            print(
+                f"rules[{rule.key}]: Version {major}.{minor} newer than maximum version "
+                f"({rule.major}.{rule.minor})"
+            )
+            return False
         return True
 
     def should_create_node(self, rules, node):
@@ -418,52 +470,30 @@ class APIHelper:
             fragments:
               - 'kselftest'
               - '!arm64-chromebook'
+
+        `rules` can either be a dictionary as loaded from YAML or a Rules
+        object already compiled with kernelci.config.rules.compile_rules().
         """
         if rules is None:
             return True
+        rules = compile_rules(rules)
 
         # Process the tree and branch rules first as they need specific processing
         # for handling tree/branch combinations
+        if rules.tree_branch:
+            # Find the node (or ancestor node) attribute containing the "tree"
+            # (and therefore "branch") value
+            ref_base = self._find_container("tree", node)
+            if ref_base and not self._is_tree_branch_allowed(
+                ref_base, rules.tree_branch
+            ):
+                return False
 
-        # Find the node (or ancestor node) attribute containing the "tree" (and therefore
-        # "branch") value
-        ref_base = self._find_container("tree", node)
-        if ref_base and not self._is_tree_branch_allowed(ref_base, rules):
-            return False
-
-        for key in rules:
-            # Skip tree and branch rules as we already processed them above
-            if key in ("tree", "branch"):
-                continue
-
-            # Special case as there is no field in the node giving us the full
-            # kernel version in "x.y" format
-            if key.endswith("_version"):
-                kver = node["data"]["kernel_revision"]["version"]
-                major = kver["version"]
-                minor = kver["patchlevel"]
-                rule_major = rules[key]["version"]
-                rule_minor = rules[key]["patchlevel"]
-                if key.startswith("min") and (
-                    (major < rule_major)
-                    or (major == rule_major and minor < rule_minor)
-                ):
-                    print(
-                        f"rules[{key}]: Version {major}.{minor} older than minimum version "
-                        f"({rule_major}.{rule_minor})"
-                    )
-                    return False
-                if key.startswith("max") and (
-                    (major > rule_major)
-                    or (major == rule_major and minor > rule_minor)
-                ):
-                    print(
-                        f"rules[{key}]: Version {major}.{minor} newer than maximum version "
-                        f"({rule_major}.{rule_minor})"
-                    )
+        for rule in rules.checks:
+            if isinstance(rule, VersionRule):
+                if not self._is_version_allowed(rule, node):
                     return False
-
-            elif not self._is_allowed(rules, key, node):
+            elif not self._is_allowed(rule, node):
                 return False
 
         return True
@@ -515,16 +545,10 @@ class APIHelper:
 
         return False
 
-    def create_job_node(
-        self,
-        job_config,
-        input_node,
-        *,
-        runtime=None,
-        platform=None,
-        retry_counter=0,
+    def _make_job_node(
+        self, job_config, input_node, runtime, platform, retry_counter
     ):
-        """Create a new job node based on input and configuration"""
+        """Make the data for a new job node, or None if it's filtered out"""
         jobfilter = input_node.get("jobfilter")
         platform_filter = input_node.get("platform_filter")
         treeid = input_node.get("treeid")
@@ -555,7 +579,7 @@ class APIHelper:
             )
             return None
 
-        if not self.should_create_node(job_config.rules, job_node):
+        if not self.should_create_node(job_config.compiled_rules, job_node):
             _debug_print(
                 f"Not creating node due to job rules for {job_config.name} "
                 f"evaluating node {input_node['id']}"
@@ -579,7 +603,9 @@ class APIHelper:
         # in case of kubernetes: cluster name
         if runtime:
             job_node["data"]["runtime"] = runtime.config.name
-            if not self.should_create_node(runtime.config.rules, job_node):
+            if not self.should_create_node(
+                runtime.config.compiled_rules, job_node
+            ):
                 _debug_print(
                     f"Not creating node {input_node['id']} due to runtime rules "
                     f"for {runtime.config.name}"
@@ -599,7 +625,7 @@ class APIHelper:
                 )
                 return None
             job_node["data"]["platform"] = platform.name
-            if not self.should_create_node(platform.rules, job_node):
+            if not self.should_create_node(platform.compiled_rules, job_node):
                 _debug_print(
                     f"Not creating node {input_node['id']} due to platform rules "
                     f"for {platform.name}"
@@ -623,11 +649,68 @@ class APIHelper:
             except Exception as error:
                 print(f"Exception Error, node id: {input_node['id']}, {error}")
                 raise error
+        return job_node
+
+    def _add_job_node(self, job_node):
         try:
             return self._api.node.add(job_node)
         except requests.exceptions.HTTPError as error:
             raise RuntimeError(json.loads(error.response.content)) from error
 
+    def create_job_node(
+        self,
+        job_config,
+        input_node,
+        *,
+        runtime=None,
+        platform=None,
+        retry_counter=0,
+    ):
+        """Create a new job node based on input and configuration"""
+        job_node = self._make_job_node(
+            job_config, input_node, runtime, platform, retry_counter
+        )
+        if job_node is None:
+            return None
+        return self._add_job_node(job_node)
+
+    def create_job_nodes(
+        self, input_node, jobs, *, retry_counter=0, concurrency=8
+    ):
+        """Create several job nodes based on the same input node
+
+        `jobs` is a list of (job_config, runtime, platform) tuples with the
+        same meaning as the create_job_node() arguments, runtime and platform
+        may be None.  All the filters and rules are evaluated first, then the
+        remaining nodes are added with up to `concurrency` parallel requests
+        as the API doesn't have a bulk node creation endpoint.
+
+        Return a list with one item per job in the same order: the new node,
+        None if it was filtered out or the exception raised while adding it,
+        typically a RuntimeError with the API error details or a
+        requests.exceptions.ConnectionError.  Errors while evaluating the
+        filters are raised straight away and no nodes get added in this case.
+        """
+        job_nodes = [
+            self._make_job_node(
+                job_config, input_node, runtime, platform, retry_counter
+            )
+            for job_config, runtime, platform in jobs
+        ]
+        outcomes = [None] * len(job_nodes)
+        with concurrent.futures.ThreadPoolExecutor(concurrency) as executor:
+            futures = {
+                executor.submit(self._add_job_node, job_node): index
+                for index, job_node in enumerate(job_nodes)
+                if job_node is not None
+            }
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    outcomes[futures[future]] = future.result()
+                except Exception as error:
+                    outcomes[futures[future]] = error
+        return outcomes
+
     def submit_regression(self, regression):
         """Post a regression object
 
@@ -639,8 +722,9 @@ class APIHelper:
         except requests.exceptions.HTTPError as error:
             raise RuntimeError(json.loads(error.response.content)) from error
 
-    def _prepare_results(self, results, parent, base):
-        node = results["node"].copy()
+    @classmethod
+    def _prepare_node(cls, result_node, parent, base):
+        node = result_node.copy()
         # Merge `Node.data` instead of overwriting it
         for key, value in base.items():
             if isinstance(value, dict):
@@ -653,6 +737,10 @@ class APIHelper:
         node["path"] = (parent["path"] if parent else []) + [node["name"]]
         if "kind" not in node:
             node["kind"] = parent["kind"]
+        return node
+
+    def _prepare_results(self, results, parent, base):
+        node = self._prepare_node(results["node"], parent, base)
         child_nodes = []
         for child_node in results["child_nodes"]:
             child_nodes.append(self._prepare_results(child_node, node, base))
@@ -661,7 +749,78 @@ class APIHelper:
             "child_nodes": child_nodes,
         }
 
-    def submit_results(self, results, root):
+    def _fill_results_chunk(self, item, child_results, base, budget, remaining):
+        """Add up to `budget` nodes from `child_results` to a chunk item
+
+        Nodes are added depth first.  The (node, child_results) pairs which
+        can't fit in the chunk are added to `remaining`, and the number of
+        nodes added is returned.
+        """
+        count = 0
+        for index, child in enumerate(child_results):
+            if count == budget:
+                remaining.append((item["node"], child_results[index:]))
+                break
+            node = self._prepare_node(child["node"], item["node"], base)
+            child_item = {"node": node, "child_nodes": []}
+            item["child_nodes"].append(child_item)
+            count += 1
+            count += self._fill_results_chunk(
+                child_item,
+                child["child_nodes"],
+                base,
+                budget - count,
+                remaining,
+            )
+        return count
+
+    def _put_results_chunk(self, chunk_root, child_results, base, chunk_size):
+        """Submit part of a hierarchy of results
+
+        Add up to `chunk_size` nodes from `child_results` under `chunk_root`
+        which needs to already exist in the API.  Then submit them and return
+        the submitted nodes from the API together with the (node,
+        child_results) pairs for the nodes which couldn't fit in the chunk,
+        to be submitted later on once their parents have been created.
+        """
+        chunk = {"node": chunk_root, "child_nodes": []}
+        remaining = []
+        self._fill_results_chunk(
+            chunk, child_results, base, chunk_size, remaining
+        )
+        node_id = chunk_root["id"]
+        nodes = self.api._put(f"nodes/{node_id}", chunk).json()
+        by_path = {tuple(node["path"]): node for node in nodes}
+        return nodes, [
+            (by_path[tuple(node["path"])], children)
+            for node, children in remaining
+        ]
+
+    def _submit_results_chunked(self, results, parent, base, chunk_size):
+        root_node = self._prepare_node(results["node"], parent, base)
+        # Keep the root node running until all its child nodes have been
+        # submitted so nothing acts on an incomplete hierarchy of results
+        running_root = dict(root_node, state="running", result=None)
+        submitted = {}
+        pending = collections.deque([(running_root, results["child_nodes"])])
+        while pending:
+            chunk_root, child_results = pending.popleft()
+            nodes, remaining = self._put_results_chunk(
+                chunk_root, child_results, base, chunk_size
+            )
+            for node in nodes:
+                submitted[node["id"]] = node
+            pending.extend(remaining)
+        node_id = root_node["id"]
+        final_root = dict(
+            submitted[node_id],
+            state=root_node["state"],
+            result=root_node["result"],
+        )
+        submitted[node_id] = self.api._put(f"node/{node_id}", final_root).json()
+        return list(submitted.values())
+
+    def submit_results(self, results, root, chunk_size=None):
         """Submit a hierarchy of results
 
         Submit a hierarchy of test results with 'node' containing data for a
@@ -686,11 +845,18 @@ class APIHelper:
                 }
             ]
         }
+
+        By default, the whole hierarchy is sent in a single request.  If
+        `chunk_size` is set, nodes are sent in several requests with up to
+        `chunk_size` child nodes each, parents first.  Each chunk is retried
+        on its own according to the API PUT retries configuration.  The root
+        node is first sent as running without a result, then updated with its
+        final state and result once all the child nodes have been submitted.
+        The submitted nodes are returned as a list in both cases.
+
         Logic need fix:
         https://github.com/kernelci/kernelci-core/issues/2386
         """
-        root_from_db = self.api.node.get(root["id"])
-        root_node = merge(root_from_db, root)
         root_node = root.copy()
         root_node["result"] = results["node"]["result"]
         root_node["state"] = results["node"].get("state", "done")
@@ -726,11 +892,15 @@ class APIHelper:
             "group": root["name"],
             "processed_by_kcidb_bridge": False,
         }
-        data = self._prepare_results(root_results, parent, base)
-        # Once this has been consolidated at the API level:
-        # self.api.create_node_hierarchy(data)
-        node_id = data["node"]["id"]
         try:
+            if chunk_size:
+                return self._submit_results_chunked(
+                    root_results, parent, base, chunk_size
+                )
+            data = self._prepare_results(root_results, parent, base)
+            # Once this has been consolidated at the API level:
+            # self.api.create_node_hierarchy(data)
+            node_id = data["node"]["id"]
             return self.api._put(f"nodes/{node_id}", data).json()
         except requests.exceptions.HTTPError as error:
             raise RuntimeError(_http_error_detail(error)) from error
@@ -8,7 +8,7 @@
 
 import enum
 import json
-from typing import Dict, Optional, Sequence
+from typing import Dict, Iterator, Optional, Sequence
 
 from . import API
 
@@ -107,9 +107,26 @@ class LatestAPI(API):
             attributes: Dict[str, str],
             offset: Optional[int] = None,
             limit: Optional[int] = None,
+            page_size: int = 100,
+            prefetch: int = 0,
         ) -> Sequence[dict]:
             params = attributes.copy() if attributes else {}
-            return self._get_paginated(params, "nodes", offset, limit)
+            return self._get_paginated(
+                params, "nodes", offset, limit, page_size, prefetch
+            )
+
+        def iter_find(
+            self,
+            attributes: Dict[str, str],
+            page_size: int = 100,
+            prefetch: int = 0,
+        ) -> Iterator[dict]:
+            """
+            Iterate over the nodes matching the provided attributes as the
+            pages are received, fetching up to `prefetch` pages in parallel
+            """
+            params = attributes.copy() if attributes else {}
+            return self._iter_paginated(params, "nodes", page_size, prefetch)
 
         def findfast(
             self,
@@ -158,10 +175,26 @@ class LatestAPI(API):
             attributes: Dict[str, str],
             offset: Optional[int] = None,
             limit: Optional[int] = None,
+            page_size: int = 100,
+            prefetch: int = 0,
         ) -> Sequence[dict]:
             """Find telemetry events matching the provided attributes"""
             params = attributes.copy() if attributes else {}
-            return self._get_paginated(params, "telemetry", offset, limit)
+            return self._get_paginated(
+                params, "telemetry", offset, limit, page_size, prefetch
+            )
+
+        def iter_find(
+            self,
+            attributes: Dict[str, str],
+            page_size: int = 100,
+            prefetch: int = 0,
+        ) -> Iterator[dict]:
+            """Iterate over the telemetry events matching the attributes"""
+            params = attributes.copy() if attributes else {}
+            return self._iter_paginated(
+                params, "telemetry", page_size, prefetch
+            )
 
         def stats(self, attributes: Dict[str, str]) -> list:
             """Get aggregated telemetry statistics"""
@@ -13,6 +13,7 @@ the Click framework, it adds support for loading default values and secrets
 from TOML settings.
 """
 
+import collections.abc
 import email.policy
 import functools
 import json
@@ -272,8 +273,8 @@ def get_api(
     YAML config found in the `config` path or in the `config` dictionary
     already loaded.
     """
-    if not isinstance(config, dict):
-        config = kernelci.config.load(config)
+    if not isinstance(config, collections.abc.Mapping):
+        config = kernelci.config.load(config, lazy=True)
     api_section = config.get("api", None)
     if api_section is None:
         raise click.ClickException("No API section found in the toml config")
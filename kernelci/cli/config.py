@@ -8,6 +8,7 @@
 import json
 import os
 import sys
+import time
 
 import click
 import yaml
@@ -44,17 +45,42 @@ def list_files(config):
             click.echo(yaml_file)
 
 
+def _print_timings(timings, elapsed, count=10):
+    click.echo(
+        f"Parsed {len(timings)} YAML files in {elapsed:.3f}s "
+        f"({sum(timings.values()):.3f}s of parsing time)"
+    )
+    slowest = sorted(timings.items(), key=lambda item: item[1], reverse=True)
+    for yaml_path, duration in slowest[:count]:
+        click.echo(f"{duration:8.3f}s  {yaml_path}")
+
+
 @kci_config.command
 @Args.config
 @Args.verbose
-def validate(config, verbose):
+@click.option(
+    "-j",
+    "--jobs",
+    type=int,
+    help="Number of processes to parse the YAML files in parallel",
+)
+@click.option(
+    "--timing",
+    is_flag=True,
+    help="Print the time it took to parse the YAML files",
+)
+def validate(config, verbose, jobs, timing):
     """Validate the YAML pipeline configuration"""
     sections = [
         "jobs",
         "runtimes",
         "scheduler",
     ]
-    err = kernelci.config.validate_yaml(config, sections)
+    timings = {} if timing else None
+    start = time.perf_counter()
+    err = kernelci.config.validate_yaml(config, sections, jobs, timings)
+    if timing:
+        _print_timings(timings, time.perf_counter() - start)
     if err:
         raise click.ClickException(err)
     if verbose:
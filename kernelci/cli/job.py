@@ -47,7 +47,7 @@ def new(
     secrets,
 ):
     """Create a new job node"""
-    configs = kernelci.config.load(config)
+    configs = kernelci.config.load(config, lazy=True)
     helper = get_api_helper(configs, api, secrets)
     input_node = helper.api.node.get(input_node_id)
     if not input_node:
@@ -96,7 +96,7 @@ def generate(
     secrets,
 ):
     """Generate a job definition in a file"""
-    configs = kernelci.config.load(config)
+    configs = kernelci.config.load(config, lazy=True)
     api = get_api(configs, api, secrets)
     job_node = api.node.get(node_id)
     if job_node.get("parent"):
@@ -151,7 +151,7 @@ def _get_runtime(runtime, config, secrets):
         raise click.ClickException(
             "Runtime not specified, please provide --runtime argument"
         )
-    configs = kernelci.config.load(config)
+    configs = kernelci.config.load(config, lazy=True)
     runtime_section = configs.get("runtimes", None)
     if runtime_section is None:
         raise click.ClickException("No runtime section found in the config")
@@ -183,7 +183,7 @@ def submit(
     api,
 ):
     """Submit a job definition to its designated runtime"""
-    configs = kernelci.config.load(config)
+    configs = kernelci.config.load(config, lazy=True)
     runtime_config = configs["runtimes"][runtime]
     runtime = kernelci.runtime.get_runtime(
         runtime_config,
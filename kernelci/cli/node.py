@@ -134,7 +134,7 @@ def submit_hierarchy(node_id, results_file, config, api, secrets):
     root_node = api_instance.node.get(node_id)
     if not root_node:
         raise click.ClickException("Node not found with the provided ID")
-    configs = kernelci.config.load(config)
+    configs = kernelci.config.load(config, lazy=True)
     helper = get_api_helper(configs, api, secrets)
     results = json.load(results_file)
     helper.submit_results(results, root_node)
@@ -23,17 +23,28 @@ def kci_storage():
 @kci_storage.command(secrets=True)
 @click.argument("filename", type=click.Path(exists=True))
 @click.argument("path", required=False)
+@click.option(
+    "--dedup-index",
+    type=click.Path(dir_okay=False),
+    help="Manifest index file to skip files which were already uploaded",
+)
+@click.option(
+    "--dedup-verify/--no-dedup-verify",
+    default=True,
+    help="Check that files found in the index are still available",
+)
 @Args.config
 @Args.storage
 @catch_error
-def upload(filename, path, config, storage, secrets):
+def upload(filename, path, dedup_index, dedup_verify, config, storage, secrets):
     """Upload FILENAME to the designated storage service in PATH"""
-    configs = kernelci.config.load(config)
+    configs = kernelci.config.load(config, lazy=True)
     storage_config = configs["storage"][storage]
     storage = kernelci.storage.get_storage(
-        storage_config, secrets.storage.credentials
+        storage_config, secrets.storage.credentials, dedup_index, dedup_verify
     )
     url = storage.upload_single(
         file_path=(filename, os.path.basename(filename)), dest_path=(path or "")
     )
+    storage.flush()
     click.echo(url)
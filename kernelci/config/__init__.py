@@ -5,9 +5,19 @@
 
 """KernelCI YAML pipeline configuration"""
 
+import collections.abc
+import contextlib
 import glob
+import hashlib
 import importlib
+import itertools
 import os
+import pickle
+import stat
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 import yaml
 
@@ -15,13 +25,43 @@ import kernelci
 
 from .base import default_filters_from_yaml
 
-
-def iterate_yaml_files(config_path: str):
-    """Load all the YAML files found in config_path
+# Use the much faster C implementation of the YAML loader if available
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Bump this when the snapshot format changes
+SNAPSHOT_VERSION = 1
+
+# Top-level configuration sections created by each module
+CONFIG_SECTIONS = {
+    "kernelci.config.api": ("api",),
+    "kernelci.config.build": (
+        "trees",
+        "fragments",
+        "build_environments",
+        "build_configs",
+    ),
+    "kernelci.config.job": ("jobs",),
+    "kernelci.config.platform": ("platforms",),
+    "kernelci.config.runtime": ("runtimes",),
+    "kernelci.config.scheduler": ("scheduler",),
+    "kernelci.config.storage": ("storage_configs", "storage"),
+    # For db, rootfs, test configs
+    "kernelci.legacy.config": (
+        "db_configs",
+        "file_system_types",
+        "file_systems",
+        "test_plans",
+        "device_types",
+        "test_configs",
+    ),
+}
+
+
+def iterate_yaml_paths(config_path: str):
+    """Iterate over the YAML files found in config_path
 
     The `config_path` can be either a single file if it ends with .yaml or a
-    directory path where to find multiple YAML files recursively.  Then iterate
-    over the file(s) as (path, data) 2-tuples.
+    directory path where to find multiple YAML files recursively.
     """
     if config_path.endswith(".yaml"):
         yaml_files = iter([config_path])
@@ -33,9 +73,48 @@ def iterate_yaml_files(config_path: str):
         # Skip debos template files which contain Go template syntax
         if "/debos/" in yaml_path:
             continue
-        with open(yaml_path, encoding="utf8") as yaml_file:
-            data = yaml.safe_load(yaml_file)
-            yield yaml_path, data
+        yield yaml_path
+
+
+def _parse_yaml_file(yaml_path):
+    start = time.perf_counter()
+    with open(yaml_path, encoding="utf8") as yaml_file:
+        data = yaml.load(yaml_file, Loader=SafeLoader)
+    return data, time.perf_counter() - start
+
+
+def parse_yaml_files(yaml_paths, jobs=None):
+    """Parse YAML files, optionally in parallel
+
+    Iterate over the parsed files as (path, data, duration) 3-tuples in the
+    same order as *yaml_paths*, with the duration in seconds it took to parse
+    each file.  If *jobs* is greater than 1, the files are parsed in a pool of
+    up to *jobs* processes but no more than the number of CPUs.
+    """
+    yaml_paths = list(yaml_paths)
+    jobs = min(jobs or 1, len(yaml_paths), os.cpu_count() or 1)
+    if jobs <= 1:
+        for yaml_path in yaml_paths:
+            yield (yaml_path, *_parse_yaml_file(yaml_path))
+        return
+    chunksize = max(1, len(yaml_paths) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        parsed = executor.map(_parse_yaml_file, yaml_paths, chunksize=chunksize)
+        for yaml_path, (data, duration) in zip(yaml_paths, parsed):
+            yield yaml_path, data, duration
+
+
+def iterate_yaml_files(config_path: str, jobs=None):
+    """Load all the YAML files found in config_path
+
+    The `config_path` can be either a single file if it ends with .yaml or a
+    directory path where to find multiple YAML files recursively.  Then iterate
+    over the file(s) as (path, data) 2-tuples.  See parse_yaml_files() for the
+    optional `jobs` argument to parse them in parallel.
+    """
+    yaml_paths = iterate_yaml_paths(config_path)
+    for yaml_path, data, _ in parse_yaml_files(yaml_paths, jobs):
+        yield yaml_path, data
 
 
 def get_config_paths(config_paths):
@@ -51,38 +130,60 @@ def get_config_paths(config_paths):
     return config_paths
 
 
-def validate_yaml(config_paths, entries):
-    """Load all the YAML config and validate the data integrity"""
+def validate_yaml(config_paths, entries, jobs=None, timings=None):
+    """Load all the YAML config and validate the data integrity
+
+    *jobs* is the number of processes to parse the YAML files in parallel
+    *timings* is an optional dictionary populated with the time in seconds it
+              took to parse each YAML file
+    """
     error = None
+    yaml_paths = (
+        yaml_path
+        for path in get_config_paths(config_paths)
+        for yaml_path in iterate_yaml_paths(path)
+    )
     try:
-        for path in get_config_paths(config_paths):
-            for yaml_path, data in iterate_yaml_files(path):
-                for name, value in (
-                    (k, v) for k, v in data.items() if k in entries
-                ):
-                    if isinstance(value, dict):
-                        keys = value.keys()
-                    elif isinstance(value, list):
-                        keys = (
-                            []
-                            if len(value) and isinstance(value[0], dict)
-                            else value
-                        )
-                    else:
-                        keys = []
-                    err = kernelci.sort_check(keys)
-                    if err:
-                        error = (
-                            f"Broken order in {yaml_path} {name}: "
-                            f"'{err[0]}' is before '{err[1]}'"
-                        )
-                        break
+        for yaml_path, data, duration in parse_yaml_files(yaml_paths, jobs):
+            if timings is not None:
+                timings[yaml_path] = duration
+            for name, value in (
+                (k, v) for k, v in data.items() if k in entries
+            ):
+                if isinstance(value, dict):
+                    keys = value.keys()
+                elif isinstance(value, list):
+                    keys = (
+                        []
+                        if len(value) and isinstance(value[0], dict)
+                        else value
+                    )
+                else:
+                    keys = []
+                err = kernelci.sort_check(keys)
+                if err:
+                    error = (
+                        f"Broken order in {yaml_path} {name}: "
+                        f"'{err[0]}' is before '{err[1]}'"
+                    )
+                    break
     except yaml.scanner.ScannerError as exc:
         error = str(exc)
     return error
 
 
-def load_single_yaml(config_path):
+def _merge_yaml_file(config, data):
+    for name, value in data.items():
+        config_value = config.setdefault(name, value.__class__())
+        if hasattr(config_value, "update"):
+            config_value.update(value)
+        elif hasattr(config_value, "extend"):
+            config_value.extend(value)
+        else:
+            config[name] = value
+
+
+def load_single_yaml(config_path, jobs=None):
     """Load the YAML configuration from a single directory or file
 
     Load all the YAML files found in a configuration directory or single file
@@ -91,17 +192,11 @@ def load_single_yaml(config_path):
 
     *config_path* is the path to the YAML config directory, or alternative a
                   single YAML file.
+    *jobs* is the number of processes to parse the YAML files in parallel
     """
     config = {}
-    for _, data in iterate_yaml_files(config_path):
-        for name, value in data.items():
-            config_value = config.setdefault(name, value.__class__())
-            if hasattr(config_value, "update"):
-                config_value.update(value)
-            elif hasattr(config_value, "extend"):
-                config_value.extend(value)
-            else:
-                config[name] = value
+    for _, data in iterate_yaml_files(config_path, jobs):
+        _merge_yaml_file(config, data)
     return config
 
 
@@ -140,7 +235,165 @@ def merge_trees(old, update):
     return merged
 
 
-def load_yaml(config_paths):
+def _load_yaml_parallel(config_paths, jobs):
+    """Parse the YAML files from all the config paths in a single pool
+
+    The results are then merged in the same order as with load_single_yaml()
+    for each config path and merge_trees() across config paths.
+    """
+    yaml_paths = [
+        (config_path, list(iterate_yaml_paths(config_path)))
+        for config_path in config_paths
+    ]
+    parsed = parse_yaml_files(
+        (yaml_path for _, paths in yaml_paths for yaml_path in paths), jobs
+    )
+    config = {}
+    with contextlib.closing(parsed):
+        for _, paths in yaml_paths:
+            single = {}
+            for _, data, _ in itertools.islice(parsed, len(paths)):
+                _merge_yaml_file(single, data)
+            config = merge_trees(config, single)
+    return config
+
+
+def _load_yaml_paths(config_paths, jobs=None):
+    if jobs and jobs > 1:
+        return _load_yaml_parallel(config_paths, jobs)
+    config = {}
+    for path in config_paths:
+        config = merge_trees(config, load_single_yaml(path))
+    return config
+
+
+def _get_file_hashes(yaml_paths):
+    hashes = []
+    for yaml_path in yaml_paths:
+        with open(yaml_path, "rb") as yaml_file:
+            hashes.append(hashlib.sha256(yaml_file.read()).hexdigest())
+    return hashes
+
+
+def _save_yaml_snapshot(snapshot, snapshot_path):
+    cache_dir = os.path.dirname(snapshot_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        "wb", dir=cache_dir, delete=False
+    ) as snapshot_file:
+        try:
+            pickle.dump(
+                snapshot, snapshot_file, protocol=pickle.HIGHEST_PROTOCOL
+            )
+        except BaseException:
+            os.unlink(snapshot_file.name)
+            raise
+    # Replace any existing snapshot atomically
+    os.replace(snapshot_file.name, snapshot_path)
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+    """Unpickler which can only create the types found in YAML data
+
+    Any other global such as a function or class is refused so loading a
+    snapshot file can't run arbitrary code.
+    """
+
+    ALLOWED = {
+        ("datetime", "date"),
+        ("datetime", "datetime"),
+        ("datetime", "timedelta"),
+        ("datetime", "timezone"),
+    }
+
+    def find_class(self, module, name):
+        if (module, name) not in self.ALLOWED:
+            raise pickle.UnpicklingError(
+                f"Invalid type in config snapshot: {module}.{name}"
+            )
+        return super().find_class(module, name)
+
+
+def _read_yaml_snapshot(snapshot_path):
+    """Read a snapshot file or return None if it can't be used
+
+    Files which are not owned by the current user or are writable by other
+    users are ignored, as well as any invalid or corrupt ones.
+    """
+    try:
+        with open(snapshot_path, "rb") as snapshot_file:
+            file_stat = os.fstat(snapshot_file.fileno())
+            if file_stat.st_uid != os.getuid() or (
+                file_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+            ):
+                print(f"Ignoring unsafe config snapshot {snapshot_path}")
+                return None
+            snapshot = _SnapshotUnpickler(snapshot_file).load()
+    except FileNotFoundError:
+        return None
+    except (
+        OSError,
+        pickle.UnpicklingError,
+        EOFError,
+        AttributeError,
+        ImportError,
+        IndexError,
+        TypeError,
+        ValueError,
+    ) as exc:
+        print(f"Ignoring invalid config snapshot {snapshot_path}: {exc}")
+        return None
+    if not isinstance(snapshot, dict) or set(snapshot) != {
+        "stats",
+        "hashes",
+        "data",
+    }:
+        print(f"Ignoring invalid config snapshot {snapshot_path}")
+        return None
+    return snapshot
+
+
+def _load_yaml_snapshot(config_paths, cache_dir, jobs=None):
+    """Load the YAML configuration via a snapshot cache
+
+    The merged YAML data is stored in a pickle file in *cache_dir* with a
+    name based on the config paths and all the YAML file paths.  It's used
+    as long as the YAML files haven't been modified, as found with their
+    modification time and size or otherwise their SHA-256 hash.  Otherwise,
+    the YAML files are loaded again and the snapshot is replaced.  Snapshot
+    files are only used if they are owned by the current user and not
+    writable by other users.
+    """
+    yaml_paths = [
+        yaml_path
+        for config_path in config_paths
+        for yaml_path in iterate_yaml_paths(config_path)
+    ]
+    stats = []
+    for yaml_path in yaml_paths:
+        yaml_stat = os.stat(yaml_path)
+        stats.append((yaml_stat.st_mtime_ns, yaml_stat.st_size))
+    key = hashlib.sha256(
+        repr((SNAPSHOT_VERSION, config_paths, yaml_paths)).encode()
+    ).hexdigest()
+    snapshot_path = os.path.join(cache_dir, f"config-{key}.pickle")
+    snapshot = _read_yaml_snapshot(snapshot_path)
+    if snapshot and snapshot["stats"] == stats:
+        return snapshot["data"]
+    hashes = _get_file_hashes(yaml_paths)
+    if snapshot and snapshot["hashes"] == hashes:
+        data = snapshot["data"]
+    else:
+        data = _load_yaml_paths(config_paths, jobs)
+    snapshot = {"stats": stats, "hashes": hashes, "data": data}
+    try:
+        _save_yaml_snapshot(snapshot, snapshot_path)
+    except OSError as exc:
+        print(f"Failed to save config snapshot {snapshot_path}: {exc}")
+    return data
+
+
+def load_yaml(config_paths, cache_dir=None, jobs=None):
     """Load the YAML configuration
 
     Load all the YAML files in all the specific configuration directories or
@@ -151,36 +404,104 @@ def load_yaml(config_paths):
     *config_paths* is a single string or an ordered list of YAML configuration
                    directories or YAML files, with later entries having higher
                    priority.
+    *cache_dir* is an optional directory where to keep a snapshot of the
+                loaded data to skip parsing the YAML files when they haven't
+                changed, the KCI_CONFIG_CACHE environment variable is used by
+                default.
+    *jobs* is the number of processes to parse the YAML files in parallel,
+           the KCI_CONFIG_JOBS environment variable is used by default and
+           files are parsed sequentially if not set.
     """
     if not isinstance(config_paths, list):
         config_paths = [config_paths]
-    config = {}
-    for path in config_paths:
-        data = load_single_yaml(path)
-        config = merge_trees(config, data)
-    return config
+    if cache_dir is None:
+        cache_dir = os.environ.get("KCI_CONFIG_CACHE")
+    if jobs is None:
+        jobs = os.environ.get("KCI_CONFIG_JOBS", "0")
+        try:
+            jobs = int(jobs)
+        except ValueError as exc:
+            raise ValueError(
+                f"Invalid KCI_CONFIG_JOBS value, expected an integer: {jobs}"
+            ) from exc
+    if cache_dir:
+        return _load_yaml_snapshot(config_paths, cache_dir, jobs)
+    return _load_yaml_paths(config_paths, jobs)
+
+
+class LazyConfig(collections.abc.Mapping):
+    """Read-only mapping creating the configuration objects on first access
+
+    This is equivalent to the dictionary returned by load_data() except that
+    each module is only imported and its sections created when one of them is
+    looked up.  Modules with a `lazy_from_yaml()` function also create each
+    named entry on first access.  The same objects are always returned for
+    subsequent lookups.
+    """
+
+    def __init__(self, data):
+        self._data = data
+        self._modules = {
+            section: module
+            for module, sections in CONFIG_SECTIONS.items()
+            for section in sections
+        }
+        if "rootfs" in data:
+            self._modules["rootfs"] = None
+        self._filters = None
+        self._sections = {}
+        self._lock = threading.Lock()
+
+    def _load_module(self, module):
+        if module is None:
+            # Pass through rootfs definitions for rootfs_ref resolution
+            self._sections["rootfs"] = self._data["rootfs"]
+            return
+        if self._filters is None:
+            self._filters = default_filters_from_yaml(self._data)
+        mod = importlib.import_module(module)
+        loader = getattr(mod, "lazy_from_yaml", mod.from_yaml)
+        self._sections.update(loader(self._data, self._filters))
+
+    def __getitem__(self, section):
+        try:
+            return self._sections[section]
+        except KeyError:
+            pass
+        module = self._modules[section]
+        with self._lock:
+            if section not in self._sections:
+                self._load_module(module)
+            return self._sections[section]
+
+    def __iter__(self):
+        return iter(self._modules)
+
+    def __len__(self):
+        return len(self._modules)
+
+    def __contains__(self, section):
+        return section in self._modules
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {list(self._modules)}>"
 
 
-def load_data(data):
+def load_data(data, lazy=False):
     """Create configuration objects from the YAML data
 
     Create a top-level dictionary with all the configuration objects using the
     provided data dictionary loaded from YAML and return it.
 
     *data* is the configuration dictionary loaded from YAML
+    *lazy* is whether to return a LazyConfig object creating the configuration
+           objects on first access rather than a dictionary
     """
+    if lazy:
+        return LazyConfig(data)
     config = {}
     filters = default_filters_from_yaml(data)
-    for module in [
-        "kernelci.config.api",
-        "kernelci.config.build",
-        "kernelci.config.job",
-        "kernelci.config.platform",
-        "kernelci.config.runtime",
-        "kernelci.config.scheduler",
-        "kernelci.config.storage",
-        "kernelci.legacy.config",  # For db, rootfs, test configs
-    ]:
+    for module in CONFIG_SECTIONS:
         mod = importlib.import_module(module)
         config.update(mod.from_yaml(data, filters))
     # Pass through rootfs definitions for rootfs_ref resolution
@@ -220,7 +541,7 @@ def resolve_rootfs_params(params, rootfs_defs):
             params[key] = value
 
 
-def load(config_paths):
+def load(config_paths, cache_dir=None, lazy=False, jobs=None):
     """Load the configuration from YAML files
 
     Load all the YAML files found in the configuration directories then create
@@ -229,9 +550,15 @@ def load(config_paths):
     earlier ones.
 
     *config_paths* is a list of YAML config directories or unified files
+    *cache_dir* is an optional directory for the YAML snapshot cache, see
+                load_yaml()
+    *lazy* is whether to create the configuration objects on first access,
+           see LazyConfig
+    *jobs* is the number of processes to parse the YAML files in parallel, see
+           load_yaml()
     """
     config_paths = get_config_paths(config_paths)
     if not config_paths:
         return {}
-    data = load_yaml(config_paths)
-    return load_data(data)
+    data = load_yaml(config_paths, cache_dir, jobs)
+    return load_data(data, lazy)
@@ -5,7 +5,9 @@
 
 """KernelCI API object configuration"""
 
-from .base import YAMLConfigObject
+from .base import LazySection, YAMLConfigObject
+
+HTTP_METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE")
 
 
 class API(YAMLConfigObject):
@@ -13,11 +15,39 @@ class API(YAMLConfigObject):
 
     yaml_tag = "!API"
 
-    def __init__(self, name, url, version="latest", timeout=60):
+    def __init__(
+        self,
+        name,
+        url,
+        version="latest",
+        timeout=60,
+        pool_size=10,
+        keep_alive=True,
+        retries=None,
+    ):
+        """API configuration class
+
+        *name* is the name of the API configuration
+        *url* is the full URL to use the API
+        *version* is the API version name
+        *timeout* is the HTTP request timeout in seconds
+        *pool_size* is the maximum number of connections kept in the pool
+        *keep_alive* is whether to keep connections open between requests
+        *retries* is a dictionary with the maximum number of retries for each
+                  HTTP method, e.g. {'GET': 5, 'POST': 0}, with unlisted
+                  methods retried 5 times
+        """
         self._name = name
         self._url = url
         self._version = version
         self._timeout = timeout
+        self._pool_size = int(pool_size)
+        self._keep_alive = bool(keep_alive)
+        self._retries = {method: 5 for method in HTTP_METHODS}
+        if retries:
+            self._retries.update(
+                {method.upper(): int(num) for method, num in retries.items()}
+            )
 
     @property
     def name(self):
@@ -39,10 +69,27 @@ class API(YAMLConfigObject):
         """HTTP request timeout in seconds"""
         return self._timeout
 
+    @property
+    def pool_size(self):
+        """Maximum number of HTTP connections kept in the pool"""
+        return self._pool_size
+
+    @property
+    def keep_alive(self):
+        """Whether HTTP connections are kept open between requests"""
+        return self._keep_alive
+
+    @property
+    def retries(self):
+        """Maximum number of retries for each HTTP method"""
+        return self._retries
+
     @classmethod
     def _get_yaml_attributes(cls):
         attrs = super()._get_yaml_attributes()
-        attrs.update({"url", "version", "timeout"})
+        attrs.update(
+            {"url", "version", "timeout", "pool_size", "keep_alive", "retries"}
+        )
         return attrs
 
 
@@ -56,3 +103,13 @@ def from_yaml(data, _):
     return {
         "api": api_configs,
     }
+
+
+def lazy_from_yaml(data, _):
+    """Create the API configs using data loaded from YAML on first access"""
+    return {
+        "api": LazySection(
+            data.get("api", {}),
+            lambda name, config: API.load_from_yaml(config, name=name),
+        ),
+    }
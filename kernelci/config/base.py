@@ -7,8 +7,12 @@
 
 """Common classes for all YAML pipeline config types"""
 
+import collections.abc
 import copy
+import functools
 import re
+import string
+import threading
 
 import yaml
 
@@ -60,6 +64,60 @@ def get_system_arch(system: str, arch: str):
     return arch
 
 
+@functools.lru_cache(maxsize=None)
+def _get_arch_map(arch: str):
+    """Get all the system-dependent architecture strings for an arch"""
+    return {
+        system: get_system_arch(system, arch)
+        for system in ("brarch", "crosarch", "debarch", "karch")
+    }
+
+
+@functools.lru_cache(maxsize=4096)
+def _get_format_fields(param: str):
+    """Get the format fields needed by a string
+
+    Return None if the string has no braces so it doesn't need to be
+    formatted, or a tuple with the names of the fields in the format map
+    needed to format it.  The tuple is empty if the string should always be
+    formatted, for escaped braces or to report format errors.
+    """
+    if "{" not in param and "}" not in param:
+        return None
+    fields = []
+    try:
+        for _, field, _, _ in string.Formatter().parse(param):
+            if field is None:
+                continue
+            name = re.match(r"[^.\[]*", field).group()
+            if not name or name.isdigit():
+                return ()
+            fields.append(name)
+    except ValueError:
+        return ()
+    return tuple(fields)
+
+
+def _format_string(param, fmap):
+    fields = _get_format_fields(param)
+    # Upon loading the config files, we go through lots of fields (e.g. `nfsroot`)
+    # that contain unresolved params (such as `debarch` or `kver`) as we're not
+    # processing a job yet.  The fields needed by each string are known in
+    # advance so they can just be skipped.
+    if fields is None or any(field not in fmap for field in fields):
+        return param
+    try:
+        return param.format_map(fmap)
+    # Nested fields such as `{data[key]}` may still not be found
+    except KeyError:
+        return param  # Don't do anything but keep python happy
+    except ValueError as exc:
+        print(f"Format string error in param '{param}': {exc}")
+        return (
+            param  # Return the unformatted param, this will help spot the error
+        )
+
+
 def _format_dict_strings(param, fmap):
     """Format strings from a dict based on a format map
 
@@ -70,20 +128,15 @@ def _format_dict_strings(param, fmap):
     different architectures.
     """
     if isinstance(param, str):
-        try:
-            param = param.format_map(fmap)
-        # Upon loading the config files, we go through lots of fields (e.g. `nfsroot`)
-        # that contain unresolved params (such as `debarch` or `kver`) as we're not
-        # processing a job yet. In such cases, format_map() returns a KeyError we can
-        # just ignore.
-        except KeyError:
-            return param  # Don't do anything but keep python happy
-        except ValueError as exc:
-            print(f"Format string error in param '{param}': {exc}")
-            return param  # Return the unformatted param, this will help spot the error
-    elif isinstance(param, dict):
-        for key in param:
-            param[key] = _format_dict_strings(param[key], fmap)
+        return _format_string(param, fmap)
+    if isinstance(param, dict):
+        for key, value in param.items():
+            if isinstance(value, str):
+                # Skip the strings without any placeholders straight away
+                if "{" in value or "}" in value:
+                    param[key] = _format_string(value, fmap)
+            elif isinstance(value, dict):
+                _format_dict_strings(value, fmap)
     return param
 
 
@@ -155,11 +208,15 @@ class YAMLConfigObject(yaml.YAMLObject):
         from this function can then be used to process f-strings containing
         attribute names as placeholders.
         """
-        return {
-            k: getattr(self, k)
-            for k in self._get_yaml_attributes()
-            if k not in ("params", "rules")
-        }
+        fmap = self.__dict__.get("_format_map")
+        if fmap is None:
+            fmap = {
+                k: getattr(self, k)
+                for k in self._get_yaml_attributes()
+                if k not in ("params", "rules")
+            }
+            self._format_map = fmap
+        return dict(fmap)
 
     def format_params(self, param, fmap=None):
         """Format strings from a dict based on object attributes
@@ -173,8 +230,7 @@ class YAMLConfigObject(yaml.YAMLObject):
             args.update(fmap)
         arch = args.get("arch")
         if arch:
-            for system in ("brarch", "crosarch", "debarch", "karch"):
-                args.update({system: get_system_arch(system, arch)})
+            args.update(_get_arch_map(arch))
         return _format_dict_strings(param, args)
 
 
@@ -253,12 +309,72 @@ class _YAMLObject:
         return yaml.dump(self.to_dict())
 
 
+def _get_trie_pattern(node):
+    alternatives = [
+        re.escape(char) + _get_trie_pattern(child)
+        for char, child in sorted(node.items())
+        if char
+    ]
+    if not alternatives:
+        return ""
+    if len(alternatives) == 1 and "" not in node:
+        return alternatives[0]
+    # If an item ends here, the rest of the pattern is optional
+    return f"(?:{'|'.join(alternatives)}){'?' if '' in node else ''}"
+
+
+class _ItemsMatcher:
+    """Check if any of the filter items is in a value
+
+    When the value is a string, this means any item is a substring of the
+    value.  All the string items are compiled into a single regular expression
+    structured as a prefix tree, so each value is scanned only once regardless
+    of the number of items.  Other values such as lists are checked with the
+    `in` operator for each item.
+    """
+
+    def __init__(self, items):
+        self._items = tuple(items)
+        self._regex = None
+        if self._items and all(isinstance(item, str) for item in self._items):
+            trie = {}
+            for item in self._items:
+                node = trie
+                for char in item:
+                    node = node.setdefault(char, {})
+                node[""] = {}
+            self._regex = re.compile(_get_trie_pattern(trie))
+
+    def match(self, value):
+        """Return True if any of the items is in *value*"""
+        if self._regex is not None and isinstance(value, str):
+            return self._regex.search(value) is not None
+        return any(item in value for item in self._items)
+
+
+def _get_cache_key(params):
+    try:
+        key = tuple(sorted(params.items()))
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
 class Filter(YAMLConfigObject):
-    """Base class to implement arbitrary configuration filters."""
+    """Base class to implement arbitrary configuration filters.
+
+    Filter results are cached for each set of keywords as the same filters are
+    typically evaluated many times with the same values.
+    """
+
+    # Maximum number of cached results for each filter
+    CACHE_SIZE = 4096
 
     def __init__(self, items):
         """The *items* can be any data used to filter configurations."""
         self._items = items
+        self._cache = {}
 
     @property
     def items(self):
@@ -273,6 +389,29 @@ class Filter(YAMLConfigObject):
 
     def match(self, **kw):
         """Return True if the given *kw* keywords match the filter."""
+        return self.match_params(kw)
+
+    def match_params(self, params, key=None):
+        """Return True if the given *params* dictionary matches the filter.
+
+        The *key* is an optional cache key for *params* to avoid computing it
+        again when evaluating several filters, see match_filters().
+        """
+        if key is None:
+            key = _get_cache_key(params)
+            if key is None:
+                return self._match(params)
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        result = self._match(params)
+        if len(self._cache) >= self.CACHE_SIZE:
+            self._cache.clear()
+        self._cache[key] = result
+        return result
+
+    def _match(self, params):
         raise NotImplementedError("Filter.match() is not implemented")
 
     def combine(self, items):
@@ -285,6 +424,16 @@ class Filter(YAMLConfigObject):
         return False
 
 
+def match_filters(filters, params):
+    """Return True if the *params* dictionary matches all the *filters*"""
+    if not filters:
+        return True
+    key = _get_cache_key(params)
+    if key is None:
+        return all(fil.match(**params) for fil in filters)
+    return all(fil.match_params(params, key) for fil in filters)
+
+
 def _merge_filter_lists(old, update):
     """Merge the items for a Blocklist or Passlist.
 
@@ -301,6 +450,12 @@ def _merge_filter_lists(old, update):
         old.setdefault(key, []).extend(value)
 
 
+def _get_items_matchers(items):
+    return {
+        key: _ItemsMatcher(values) for key, values in items.items() if values
+    }
+
+
 class Blocklist(Filter):
     """Blocklist filter to discard certain configurations.
 
@@ -312,18 +467,22 @@ class Blocklist(Filter):
     yaml_tag = "!BlockList"
     name = "blocklist"
 
-    def match(self, **kwargs):
-        for key, value in kwargs.items():
-            blocklist = self._items.get(key)
-            if not blocklist:
-                continue
-            if any(item in value for item in blocklist):
+    def __init__(self, items):
+        super().__init__(items)
+        self._matchers = _get_items_matchers(self._items)
+
+    def _match(self, params):
+        for key, value in params.items():
+            matcher = self._matchers.get(key)
+            if matcher and matcher.match(value):
                 return False
 
         return True
 
     def combine(self, items):
         _merge_filter_lists(self._items, items)
+        self._matchers = _get_items_matchers(self._items)
+        self._cache = {}
         return True
 
 
@@ -338,18 +497,30 @@ class Passlist(Filter):
     yaml_tag = "!PassList"
     name = "passlist"
 
-    def match(self, **kwargs):
-        for key, passlist in self._items.items():
-            value = kwargs.get(key)
+    def __init__(self, items):
+        super().__init__(items)
+        self._matchers = {
+            key: _ItemsMatcher(passlist)
+            for key, passlist in self._items.items()
+        }
+
+    def _match(self, params):
+        for key, matcher in self._matchers.items():
+            value = params.get(key)
             if not value:
                 return False
-            if not any(item in value for item in passlist):
+            if not matcher.match(value):
                 return False
 
         return True
 
     def combine(self, items):
         _merge_filter_lists(self._items, items)
+        self._matchers = {
+            key: _ItemsMatcher(passlist)
+            for key, passlist in self._items.items()
+        }
+        self._cache = {}
         return True
 
 
@@ -369,9 +540,9 @@ class Regex(Filter):
         super().__init__(*args, **kwargs)
         self._re_items = {k: re.compile(v) for k, v in self._items.items()}
 
-    def match(self, **kwargs):
+    def _match(self, params):
         for key, regex in self._re_items.items():
-            value = kwargs.get(key)
+            value = params.get(key)
             return value and regex.match(value)
 
 
@@ -391,18 +562,22 @@ class Combination(Filter):
     def __init__(self, items):
         super().__init__(items)
         self._keys = tuple(items["keys"])
-        self._values = list(tuple(values) for values in items["values"])
+        self._values = set(tuple(values) for values in items["values"])
 
-    def match(self, **kwargs):
-        filter_values = tuple(kwargs.get(k) for k in self._keys)
-        return filter_values in self._values
+    def _match(self, params):
+        filter_values = tuple(params.get(k) for k in self._keys)
+        try:
+            return filter_values in self._values
+        except TypeError:
+            return False
 
     def combine(self, items):
         keys = tuple(items["keys"])
         if keys != self._keys:
             return False
 
-        self._values.extend([tuple(values) for values in items["values"]])
+        self._values.update(tuple(values) for values in items["values"])
+        self._cache = {}
         return True
 
 
@@ -456,6 +631,44 @@ class FilterFactory:
         return cls.load_from_yaml(params) if params else default_filters
 
 
+class LazySection(collections.abc.Mapping):
+    """Read-only mapping creating each configuration object on first access
+
+    The raw YAML *entries* are kept as-is and each object is created by
+    calling *factory* with the entry name and its YAML data the first time it
+    is looked up.  The same object is then returned for subsequent lookups.
+    """
+
+    def __init__(self, entries, factory):
+        self._entries = entries
+        self._factory = factory
+        self._objects = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        try:
+            return self._objects[name]
+        except KeyError:
+            pass
+        config = self._entries[name]
+        with self._lock:
+            if name not in self._objects:
+                self._objects[name] = self._factory(name, config)
+            return self._objects[name]
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {list(self._entries)}>"
+
+
 def default_filters_from_yaml(data):
     """Load the default YAML filters"""
     return {
@@ -7,7 +7,7 @@
 
 """Build configuration classes for kernel builds"""
 
-from .base import FilterFactory, YAMLConfigObject
+from .base import FilterFactory, YAMLConfigObject, match_filters
 
 
 class Tree(YAMLConfigObject):
@@ -255,7 +255,7 @@ class Architecture(YAMLConfigObject):
 
     def match(self, params):
         """Check if parameters match the filters."""
-        return all(f.match(**params) for f in self._filters)
+        return match_filters(self._filters, params)
 
 
 class Reference(YAMLConfigObject):
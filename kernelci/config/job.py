@@ -10,7 +10,8 @@ from typing import Annotated, Any, Dict, Literal, Optional, Union
 
 from pydantic import BaseModel, ConfigDict, Field
 
-from .base import YAMLConfigObject
+from .base import LazySection, YAMLConfigObject
+from .rules import compile_rules
 
 JobPriority = Union[
     Literal["low", "medium", "high"],
@@ -70,6 +71,7 @@ class Job(YAMLConfigObject):
             self.format_params(copy.deepcopy(params), params) if params else {}
         )
         self._rules = rules
+        self._compiled_rules = compile_rules(rules)
 
     @property
     def name(self):
@@ -105,6 +107,7 @@ class Job(YAMLConfigObject):
     def image(self, value):
         """Set the runtime environment image name"""
         self._image = value
+        self._format_map = None
 
     @property
     def params(self):
@@ -116,6 +119,11 @@ class Job(YAMLConfigObject):
         """Kernel requirements (tree, branch, version...)"""
         return self._rules
 
+    @property
+    def compiled_rules(self):
+        """Kernel requirements compiled for faster evaluation"""
+        return self._compiled_rules
+
     @property
     def kcidb_test_suite(self):
         """Mapping of KernelCI test to KCIDB test suite"""
@@ -150,3 +158,15 @@ def from_yaml(data, _):
     return {
         "jobs": jobs,
     }
+
+
+def _job_from_yaml(name, config):
+    validated = JobsConfig.model_validate({"jobs": {name: config}})
+    return Job(name=name, **validated.jobs[name].model_dump())
+
+
+def lazy_from_yaml(data, _):
+    """Create each pipeline job definition on first access"""
+    return {
+        "jobs": LazySection(data.get("jobs", {}), _job_from_yaml),
+    }
@@ -5,7 +5,8 @@
 
 """KernelCI platform configuration"""
 
-from .base import YAMLConfigObject
+from .base import LazySection, YAMLConfigObject
+from .rules import compile_rules
 
 
 class Platform(YAMLConfigObject):
@@ -46,6 +47,7 @@ class Platform(YAMLConfigObject):
             self.format_params(params.copy(), params) if params else None
         )
         self._rules = rules
+        self._compiled_rules = compile_rules(rules)
 
     @property
     def name(self):
@@ -102,6 +104,11 @@ class Platform(YAMLConfigObject):
         """Kernel requirements (tree, branch, version...)"""
         return self._rules
 
+    @property
+    def compiled_rules(self):
+        """Kernel requirements compiled for faster evaluation"""
+        return self._compiled_rules
+
     @classmethod
     def _get_yaml_attributes(cls):
         attrs = super()._get_yaml_attributes()
@@ -132,3 +139,13 @@ def from_yaml(data, _):
     return {
         "platforms": platforms,
     }
+
+
+def lazy_from_yaml(data, _):
+    """Create the platforms configurations on first access"""
+    return {
+        "platforms": LazySection(
+            data.get("platforms", {}),
+            lambda name, config: Platform.load_from_yaml(config, name=name),
+        ),
+    }
@@ -0,0 +1,133 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+#
+# Copyright (C) 2026 Collabora Limited
+
+"""Compiled node creation rules
+
+Jobs, platforms and runtimes can have some `rules` to restrict when nodes get
+created, see kernelci.api.helper.APIHelper.should_create_node() for the full
+syntax.  The rules are evaluated for every candidate node, so they get parsed
+once here into immutable objects with sets and pre-extracted values.
+"""
+
+from dataclasses import dataclass
+from typing import FrozenSet, List, Optional, Tuple, Union
+
+
+@dataclass(frozen=True)
+class ValueRule:
+    """Allowed and denied values for a node attribute"""
+
+    key: str
+    allow: FrozenSet
+    deny: FrozenSet
+    allow_list: Tuple
+    deny_list: Tuple
+
+
+@dataclass(frozen=True)
+class TreeBranchRule:
+    """Allowed and denied tree or branch names and tree:branch combinations"""
+
+    key: str
+    allow: FrozenSet[str]
+    deny: FrozenSet[str]
+    allow_combos: FrozenSet[Tuple[str, str]]
+    deny_combos: FrozenSet[Tuple[str, str]]
+    allow_list: Tuple[str, ...]
+    deny_list: Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class VersionRule:
+    """Minimum or maximum kernel version"""
+
+    key: str
+    minimum: bool
+    major: int
+    minor: int
+
+
+@dataclass(frozen=True)
+class Rules:
+    """Compiled rules for a job, platform or runtime
+
+    The `tree_branch` rules are evaluated first, then the `checks` in the same
+    order as they were originally defined.
+    """
+
+    tree_branch: Tuple[TreeBranchRule, ...]
+    checks: Tuple[Union[ValueRule, VersionRule], ...]
+
+
+def _split_values(values):
+    allow = tuple(value for value in values if not value.startswith("!"))
+    deny = tuple(value.lstrip("!") for value in values if value.startswith("!"))
+    return allow, deny
+
+
+def _compile_tree_branch(key, values):
+    allow_combos = []
+    deny_combos = []
+    single_values = []
+    for value in values:
+        if ":" in value:
+            # ':' is used as a tree/branch separator as this character is
+            # forbidden in git branch names
+            tree, branch = value.split(":", 1)
+            if tree.startswith("!"):
+                deny_combos.append((tree.lstrip("!"), branch))
+            else:
+                allow_combos.append((tree, branch))
+        else:
+            single_values.append(value)
+    allow, deny = _split_values(single_values)
+    return TreeBranchRule(
+        key=key,
+        allow=frozenset(allow),
+        deny=frozenset(deny),
+        allow_combos=frozenset(allow_combos),
+        deny_combos=frozenset(deny_combos),
+        allow_list=allow,
+        deny_list=deny,
+    )
+
+
+def compile_rules(rules: Optional[dict]) -> Optional[Rules]:
+    """Compile a rules dictionary loaded from YAML
+
+    Return a Rules object or None if there are no rules.
+    """
+    if rules is None:
+        return None
+    if isinstance(rules, Rules):
+        return rules
+    tree_branch: List[TreeBranchRule] = []
+    checks: List[Union[ValueRule, VersionRule]] = []
+    for key, values in rules.items():
+        if key in ("tree", "branch"):
+            tree_branch.append(_compile_tree_branch(key, values))
+        elif key.endswith("_version"):
+            if key.startswith(("min", "max")):
+                checks.append(
+                    VersionRule(
+                        key=key,
+                        minimum=key.startswith("min"),
+                        major=values["version"],
+                        minor=values["patchlevel"],
+                    )
+                )
+        else:
+            allow, deny = _split_values(values)
+            checks.append(
+                ValueRule(
+                    key=key,
+                    allow=frozenset(allow),
+                    deny=frozenset(deny),
+                    allow_list=allow,
+                    deny_list=deny,
+                )
+            )
+    # Tree rules are always evaluated before branch rules
+    tree_branch.sort(key=lambda rule: rule.key != "tree")
+    return Rules(tree_branch=tuple(tree_branch), checks=tuple(checks))
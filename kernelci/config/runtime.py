@@ -8,7 +8,8 @@
 
 """KernelCI Runtime environment configuration"""
 
-from .base import FilterFactory, YAMLConfigObject
+from .base import FilterFactory, LazySection, YAMLConfigObject, match_filters
+from .rules import compile_rules
 
 
 class Runtime(YAMLConfigObject):
@@ -28,6 +29,7 @@ class Runtime(YAMLConfigObject):
         self._lab_type = lab_type
         self._filters = filters or []
         self._rules = rules
+        self._compiled_rules = compile_rules(rules)
 
     @property
     def name(self):
@@ -44,6 +46,11 @@ class Runtime(YAMLConfigObject):
         """Kernel requirements (tree, branch, version...)"""
         return self._rules
 
+    @property
+    def compiled_rules(self):
+        """Kernel requirements compiled for faster evaluation"""
+        return self._compiled_rules
+
     @classmethod
     def _get_yaml_attributes(cls):
         attrs = super()._get_yaml_attributes()
@@ -70,7 +77,7 @@ class Runtime(YAMLConfigObject):
 
     def match(self, data):
         """Match configuration filters with provided input data"""
-        return all(f.match(**data) for f in self._filters)
+        return match_filters(self._filters, data)
 
 
 class RuntimeLAVA(Runtime):
@@ -338,3 +345,16 @@ def from_yaml(data, filters):
     return {
         "runtimes": runtimes,
     }
+
+
+def lazy_from_yaml(data, filters):
+    """Load each runtime environment from YAML on first access"""
+    runtimes_filters = filters.get("runtimes")
+    return {
+        "runtimes": LazySection(
+            data.get("runtimes", {}),
+            lambda name, runtime: RuntimeFactory.from_yaml(
+                name, runtime, runtimes_filters
+            ),
+        ),
+    }
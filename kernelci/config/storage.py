@@ -5,7 +5,7 @@
 
 """KernelCI API object configuration"""
 
-from .base import YAMLConfigObject
+from .base import LazySection, YAMLConfigObject
 
 
 class Storage(YAMLConfigObject):
@@ -52,14 +52,38 @@ class AzureFilesStorage(Storage):
     *share* is the name of the Azure Files share
     *sas_public_token* is the read-only SAS token used in public URLs for
     downloads
+    *max_concurrency* is the number of files uploaded in parallel by each
+    upload call
+    *chunk_concurrency* is the number of parallel connections used to upload
+    the chunks of each file
+    *chunk_size* is the maximum size in bytes of each uploaded chunk, or None
+    to use the Azure SDK default value
+
+    The number of connections used by each upload call can go up to
+    max_concurrency * chunk_concurrency, multiplied by the number of upload
+    calls made in parallel such as the max_workers argument of
+    Storage.upload_batches().  With kbuild using up to 10 workers and the
+    default values, this is up to 40 connections.
     """
 
     yaml_tag = "!AzureFilesStorage"
 
-    def __init__(self, share, sas_public_token, *args, **kwargs):
+    def __init__(
+        self,
+        share,
+        sas_public_token,
+        *args,
+        max_concurrency=4,
+        chunk_concurrency=1,
+        chunk_size=None,
+        **kwargs,
+    ):
         super().__init__(*args, **kwargs)
         self._share = share
         self._sas_public_token = sas_public_token
+        self._max_concurrency = max_concurrency
+        self._chunk_concurrency = chunk_concurrency
+        self._chunk_size = chunk_size
 
     @property
     def share(self):
@@ -71,10 +95,33 @@ class AzureFilesStorage(Storage):
         """Public SAS token used in download URLs"""
         return self._sas_public_token
 
+    @property
+    def max_concurrency(self):
+        """Number of parallel uploads"""
+        return self._max_concurrency
+
+    @property
+    def chunk_concurrency(self):
+        """Number of parallel chunk uploads for each file"""
+        return self._chunk_concurrency
+
+    @property
+    def chunk_size(self):
+        """Maximum size of each uploaded chunk in bytes"""
+        return self._chunk_size
+
     @classmethod
     def _get_yaml_attributes(cls):
         attrs = super()._get_yaml_attributes()
-        attrs.update({"share", "sas_public_token"})
+        attrs.update(
+            {
+                "share",
+                "sas_public_token",
+                "max_concurrency",
+                "chunk_concurrency",
+                "chunk_size",
+            }
+        )
         return attrs
 
 
@@ -186,3 +233,15 @@ def from_yaml(data, _):
         "storage_configs": storage_configs,  # deprecated
         "storage": storage_configs,
     }
+
+
+def lazy_from_yaml(data, _):
+    """Load each storage configuration from YAML data on first access"""
+    storage_data = dict(data.get("storage", {}))
+    storage_data.update(data.get("storage_configs", {}))
+    storage_configs = LazySection(storage_data, StorageFactory.from_yaml)
+
+    return {
+        "storage_configs": storage_configs,  # deprecated
+        "storage": storage_configs,
+    }
@@ -0,0 +1,237 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+#
+# Copyright (C) 2026 Collabora Limited
+
+"""Reload the YAML pipeline configuration when the files change
+
+Long-running services can use a ConfigWatcher to pick up configuration
+changes without being restarted.  Only the YAML files which have been added or
+modified get parsed again, then all the cached file data is merged in the same
+order as with kernelci.config.load() and a new set of configuration objects is
+created.  Registered callbacks are then called with the new configuration so
+services can swap in their new objects, such as a new Scheduler.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import threading
+
+from . import (
+    _merge_yaml_file,
+    get_config_paths,
+    iterate_yaml_files,
+    iterate_yaml_paths,
+    load_data,
+    merge_trees,
+)
+
+
+class _Inotify:
+    """Minimal inotify wrapper used to wake up the watcher on file changes"""
+
+    # IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+    # IN_CREATE | IN_DELETE
+    MASK = 0x2 | 0x4 | 0x8 | 0x40 | 0x80 | 0x100 | 0x200
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "Failed to initialise inotify")
+        self._libc = libc
+        self._dirs = set()
+
+    def fileno(self):
+        """File descriptor to wait for events"""
+        return self._fd
+
+    def add_dirs(self, config_paths):
+        """Watch all the directories with YAML files in the config paths"""
+        for config_path in config_paths:
+            if os.path.isdir(config_path):
+                dirs = (dir_path for dir_path, _, _ in os.walk(config_path))
+            else:
+                dirs = [os.path.dirname(config_path) or "."]
+            for dir_path in dirs:
+                if dir_path in self._dirs:
+                    continue
+                wd = self._libc.inotify_add_watch(
+                    self._fd, os.fsencode(dir_path), self.MASK
+                )
+                if wd >= 0:
+                    self._dirs.add(dir_path)
+
+    def read(self):
+        """Discard all the pending events"""
+        try:
+            while os.read(self._fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+
+    def close(self):
+        """Stop watching all the directories"""
+        os.close(self._fd)
+
+
+class ConfigWatcher:
+    """Watch the YAML configuration files and reload them when they change
+
+    The files are checked every *interval* seconds, or as soon as a change is
+    reported by inotify when available and *inotify* is True.  Each check
+    compares the modification time, size and inode of the files so any change
+    is detected even without inotify.  If a file can't be parsed or the
+    configuration objects can't be created, the previous configuration is kept
+    until the files get modified again.
+    """
+
+    def __init__(self, config_paths=None, interval=5, lazy=False, inotify=True):
+        """Load the configuration and prepare to watch the files
+
+        *config_paths* is a list of YAML config directories or files, see
+                       kernelci.config.load()
+        *interval* is the time in seconds between two checks
+        *lazy* is whether to create the configuration objects on first access,
+               see kernelci.config.LazyConfig
+        *inotify* is whether to use inotify to detect changes immediately
+        """
+        self._config_paths = get_config_paths(config_paths)
+        self._interval = interval
+        self._lazy = lazy
+        self._use_inotify = inotify
+        self._files = {}
+        self._callbacks = []
+        self._config = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wakeup = None
+        self._thread = None
+        self.check()
+
+    @property
+    def config(self):
+        """Current configuration objects, see kernelci.config.load()"""
+        return self._config
+
+    def add_callback(self, callback):
+        """Add a function called with (config, paths) after each reload
+
+        *config* is the new configuration and *paths* is the list of YAML file
+        paths which were added, modified or removed.
+        """
+        self._callbacks.append(callback)
+
+    def _scan(self):
+        layout = []
+        stats = {}
+        for config_path in self._config_paths:
+            yaml_paths = list(iterate_yaml_paths(config_path))
+            for yaml_path in yaml_paths:
+                stat = os.stat(yaml_path)
+                stats[yaml_path] = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            layout.append(yaml_paths)
+        return layout, stats
+
+    def _merge(self, layout):
+        data = {}
+        for yaml_paths in layout:
+            single = {}
+            for yaml_path in yaml_paths:
+                yaml_data = self._files[yaml_path][1]
+                if yaml_data is None:
+                    raise ValueError(f"Failed to parse {yaml_path}")
+                _merge_yaml_file(single, yaml_data)
+            data = merge_trees(data, single)
+        return data
+
+    def check(self):
+        """Check for YAML file changes and reload the configuration
+
+        Only the files which have been added or modified since the last check
+        are parsed again.  Return the list of the YAML file paths which were
+        added, modified or removed, and call the callbacks if there were any.
+        """
+        with self._lock:
+            layout, stats = self._scan()
+            paths = [
+                yaml_path
+                for yaml_path, stat in stats.items()
+                if self._files.get(yaml_path, (None,))[0] != stat
+            ]
+            removed = [path for path in self._files if path not in stats]
+            if not paths and not removed:
+                return []
+            for yaml_path in removed:
+                del self._files[yaml_path]
+            for yaml_path in paths:
+                # Keep the file as broken until it gets modified again
+                self._files[yaml_path] = (stats[yaml_path], None)
+                for _, yaml_data in iterate_yaml_files(yaml_path):
+                    self._files[yaml_path] = (stats[yaml_path], yaml_data)
+            config = load_data(self._merge(layout), self._lazy)
+            self._config = config
+        paths.extend(removed)
+        for callback in self._callbacks:
+            try:
+                callback(config, paths)
+            except Exception as exc:
+                print(f"Config watcher callback failed: {exc}")
+        return paths
+
+    def _get_inotify(self):
+        if not self._use_inotify:
+            return None
+        try:
+            inotify = _Inotify()
+        except (AttributeError, OSError, TypeError):
+            return None
+        inotify.add_dirs(self._config_paths)
+        return inotify
+
+    def _wait(self, inotify):
+        fds = [self._wakeup[0]]
+        if inotify:
+            fds.append(inotify)
+        readable, _, _ = select.select(fds, [], [], self._interval)
+        if inotify in readable:
+            # Let editors finish writing all the files before checking them
+            self._stop.wait(0.1)
+            inotify.read()
+
+    def _run(self, inotify):
+        try:
+            while not self._stop.is_set():
+                self._wait(inotify)
+                if self._stop.is_set():
+                    break
+                try:
+                    self.check()
+                except Exception as exc:
+                    print(f"Failed to reload the config: {exc}")
+                if inotify:
+                    inotify.add_dirs(self._config_paths)
+        finally:
+            if inotify:
+                inotify.close()
+            for fd in self._wakeup:
+                os.close(fd)
+
+    def start(self):
+        """Start checking the files in a background thread"""
+        if self._thread is None:
+            self._stop.clear()
+            self._wakeup = os.pipe()
+            self._thread = threading.Thread(
+                target=self._run, args=(self._get_inotify(),), daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background thread"""
+        if self._thread is not None:
+            self._stop.set()
+            os.write(self._wakeup[1], b"\0")
+            self._thread.join()
+            self._thread = None
@@ -19,6 +19,7 @@ import toml
 import yaml
 
 import kernelci.config
+import kernelci.config.storage
 import kernelci.storage
 
 
@@ -487,16 +488,10 @@ class KContext:
         if not storage_config_data:
             return None
 
-        # Load the full configuration objects using kernelci.config
-        config_data = {"storage": {name: storage_config_data}}
-        loaded_configs = kernelci.config.load_data(config_data)
-
-        # Get the storage config object
-        storage_configs = loaded_configs.get("storage", {})
-        storage_config = storage_configs.get(name)
-
-        if not storage_config:
-            return None
+        # Create only the storage config object, not the full configuration
+        storage_config = kernelci.config.storage.StorageFactory.from_yaml(
+            name, storage_config_data
+        )
 
         # Get credentials
         credentials = storage_config_data.get("storage_cred")
@@ -23,12 +23,15 @@ Available kbuild parameters:
 - dtbs_check: run "make dtbs_check" ONLY, it is actually a separate test
 - kselftest: false - do not build kselftest
 - extra_targets: list of additional tuxmake targets (e.g. ['binrpm-pkg'])
+- compression: codec and level for each class of artifacts
+  (e.g. {'vmlinux': 'zstd:19', 'logs': 'none'})
 """
 
 import concurrent.futures
 import json
 import os
 import re
+import shutil
 import subprocess
 import sys
 import tarfile
@@ -110,6 +113,33 @@ ARTIFACT_NAMES = {
     r"metadata\.json": "metadata",
 }
 
+# Artifacts compressed before being uploaded, with a regex to match each class
+# of artifacts and its default "codec:level" which can be changed with the
+# compression parameter.  The "none" codec disables compression.
+ARTIFACT_COMPRESSION_CLASSES = {
+    "logs": r".*\.log$",
+    "vmlinux": r"^vmlinux$",
+}
+ARTIFACT_COMPRESSION = {
+    "logs": "gzip:6",
+    "vmlinux": "xz:6",
+}
+
+# Command and file extension for each compression codec, xz and zstd use one
+# thread per CPU and gzip is replaced with pigz when available
+COMPRESSION_CODECS = {
+    "gzip": (["gzip", "-c"], ".gz"),
+    "xz": (["xz", "-c", "-T0"], ".xz"),
+    "zstd": (["zstd", "-c", "-q", "-T0"], ".zst"),
+}
+
+# Range of the compression levels accepted by each codec
+COMPRESSION_LEVELS = {
+    "gzip": (1, 9),
+    "xz": (0, 9),
+    "zstd": (1, 19),
+}
+
 # kselftest TARGETS that build successfully but install no test binaries.
 # The presence-based check in _kselftest_suite_results() would otherwise mark
 # these as a false 'fail'; they are reported as 'skip' instead. Keyed by the
@@ -218,6 +248,9 @@ class KBuild:
             else:
                 self._kselftest = True
             self._extra_targets = params.get("extra_targets", [])
+            self._compression = params.get("compression", {})
+            self._check_compression()
+            self._compression_stats = {}
             self._apijobname = jobname
             self._steps = []
             self._artifacts = []
@@ -278,6 +311,10 @@ class KBuild:
             )
             self._coverage = jsonobj.get("coverage", False)
             self._extra_targets = jsonobj.get("extra_targets", [])
+            self._compression = jsonobj.get("compression", {})
+            # The artifacts are compressed where the build gets loaded
+            self._check_compression(check_tools=True)
+            self._compression_stats = {}
             return
         raise ValueError("No valid arguments provided")
 
@@ -1335,7 +1372,13 @@ trap 'case $stage in
         storage_cred = os.getenv("KCI_STORAGE_CREDENTIALS")
         if not storage_cred:
             raise ValueError("KCI_STORAGE_CREDENTIALS not set")
-        return kernelci.storage.get_storage(storage_config, storage_cred)
+        return kernelci.storage.get_storage(
+            storage_config,
+            storage_cred,
+            dedup_index=os.getenv("KCI_STORAGE_DEDUP_INDEX"),
+            dedup_verify=os.getenv("KCI_STORAGE_DEDUP_VERIFY", "1").lower()
+            in ("1", "true", "yes"),
+        )
 
     def map_artifact_name(self, artifact):
         """
@@ -1348,6 +1391,85 @@ trap 'case $stage in
         artifact = artifact.replace(".", "_")
         return artifact
 
+    def _check_compression(self, check_tools=False):
+        """
+        Check the codecs, levels and artifact classes in the compression
+        parameter, and optionally that the compression tools are installed
+        """
+        for name, spec in self._compression.items():
+            if name not in ARTIFACT_COMPRESSION_CLASSES:
+                raise ValueError(f"Invalid compression artifact class: {name}")
+            codec, _, level = spec.partition(":")
+            if codec == "none":
+                continue
+            if codec not in COMPRESSION_CODECS:
+                raise ValueError(f"Invalid compression codec: {codec}")
+            min_level, max_level = COMPRESSION_LEVELS[codec]
+            if level and not (
+                level.isdigit() and min_level <= int(level) <= max_level
+            ):
+                raise ValueError(
+                    f"Invalid {codec} compression level: {level}, "
+                    f"expected {min_level}-{max_level}"
+                )
+        if not check_tools:
+            return
+        for name in ARTIFACT_COMPRESSION_CLASSES:
+            spec = self._compression.get(name, ARTIFACT_COMPRESSION[name])
+            codec = spec.partition(":")[0]
+            if codec == "none":
+                continue
+            tool = COMPRESSION_CODECS[codec][0][0]
+            if not shutil.which(tool):
+                raise ValueError(f"Compression tool not found: {tool}")
+
+    def _get_compression(self, artifact):
+        """
+        Get the (codec, level) to compress an artifact or None
+        """
+        for name, pattern in ARTIFACT_COMPRESSION_CLASSES.items():
+            if re.match(pattern, artifact):
+                spec = self._compression.get(name, ARTIFACT_COMPRESSION[name])
+                codec, _, level = spec.partition(":")
+                if codec == "none":
+                    return None
+                return codec, level
+        return None
+
+    def _compress_artifact(self, artifact, artifact_path, codec, level):
+        """
+        Compress an artifact and record the time it took in metadata.json
+        """
+        cmd, ext = COMPRESSION_CODECS[codec]
+        if codec == "gzip" and shutil.which("pigz"):
+            cmd = ["pigz", "-c"]
+        if level:
+            cmd = cmd + [f"-{level}"]
+        upload_path = artifact_path + ext
+        start = time.monotonic()
+        try:
+            with open(upload_path, "wb") as out_file:
+                subprocess.run(
+                    cmd + [artifact_path], stdout=out_file, check=True
+                )
+        except BaseException:
+            if os.path.exists(upload_path):
+                os.unlink(upload_path)
+            raise
+        duration = time.monotonic() - start
+        self._compression_stats[artifact] = {
+            "codec": codec,
+            "level": int(level) if level else None,
+            "time": round(duration, 3),
+            "size": os.path.getsize(artifact_path),
+            "compressed_size": os.path.getsize(upload_path),
+        }
+        print(
+            f"[_upload_artifacts] Compressed {artifact} with {codec} "
+            f"in {duration:.1f}s"
+        )
+        return upload_path, artifact + ext
+
     def upload_artifacts(self):
         """
         Upload artifacts to storage using parallel processing
@@ -1405,53 +1527,76 @@ trap 'case $stage in
                 if not is_dtb_artifact(task[0]) and task[0] != "dtbs.tar.xz"
             ]
 
-        # Function to handle a single artifact upload
+        # Function to compress an artifact before uploading it
         # args: (artifact, artifact_path)
-        # returns: (artifact, stored_url, error)
-        def process_and_upload_artifact(
+        # returns: (artifact, upload_path, dst_filename, compressed_file)
+        def process_artifact(
             task: Tuple[str, str],
-        ) -> Tuple[str, str, str]:
+        ) -> Tuple[str, str, str, bool]:
             artifact, artifact_path = task
-            compressed_file = False
-            dst_filename = artifact
-            upload_path = artifact_path
 
             print(f"[_upload_artifacts] Processing {artifact}")
 
-            # Handle compression
-            if artifact.endswith(".log"):
-                # Use subprocess for better control and error handling
-                subprocess.run(["gzip", "-k", artifact_path], check=True)
-                upload_path = artifact_path + ".gz"
-                compressed_file = True
-                dst_filename = artifact + ".gz"
-            elif artifact == "vmlinux":
-                subprocess.run(["xz", "-k", artifact_path], check=True)
-                upload_path = artifact_path + ".xz"
-                compressed_file = True
-                dst_filename = artifact + ".xz"
-
-            # Upload the file
-            try:
-                stored_url = storage.upload_single(
-                    (upload_path, dst_filename), root_path
-                )
+            compression = self._get_compression(artifact)
+            if not compression:
+                return artifact, artifact_path, artifact, False
+            upload_path, dst_filename = self._compress_artifact(
+                artifact, artifact_path, *compression
+            )
+            return artifact, upload_path, dst_filename, True
+
+        # Function to upload processed artifacts and record their URLs
+        # args: list of (artifact, upload_path, dst_filename, compressed_file)
+        def upload_processed(processed, max_workers):
+            nonlocal successful_uploads
+
+            # Small files are grouped into multi-file requests while large
+            # ones such as kernel images are uploaded as parallel requests
+            dst_artifacts = {
+                dst_filename: (artifact, compressed_file)
+                for artifact, _, dst_filename, compressed_file in processed
+            }
+            file_paths = [
+                (upload_path, dst_filename)
+                for _, upload_path, dst_filename, _ in processed
+            ]
+            batches = storage.upload_batches(
+                file_paths, root_path, max_workers=max_workers
+            )
+            for batch, urls, error in batches:
+                for upload_path, dst_filename in batch:
+                    artifact, compressed_file = dst_artifacts[dst_filename]
 
-                # Clean up compressed file if needed
-                # TBD: Check if we need to keep the compressed file? Maybe
-                # we dont care, pod will die anyway
-                if compressed_file:
-                    os.unlink(upload_path)
+                    # Clean up compressed file if needed
+                    # TBD: Check if we need to keep the compressed file? Maybe
+                    # we dont care, pod will die anyway
+                    if compressed_file and os.path.exists(upload_path):
+                        os.unlink(upload_path)
 
-                print(
-                    f"[_upload_artifacts] Uploaded {artifact} to {stored_url}"
-                )
-                return artifact, stored_url, None
-            except Exception as e:
-                print(f"[_upload_artifacts] Error uploading {artifact}: {e}")
-                if compressed_file and os.path.exists(upload_path):
-                    os.unlink(upload_path)
-                return artifact, None, str(e)
+                    if error:
+                        print(
+                            "[_upload_artifacts] Error uploading "
+                            f"{artifact}: {error}"
+                        )
+                        failed_uploads.append((artifact, error))
+                        continue
+
+                    stored_url = urls[dst_filename]
+                    print(
+                        f"[_upload_artifacts] Uploaded {artifact} to "
+                        f"{stored_url}"
+                    )
+                    successful_uploads += 1
+                    self._full_artifacts[artifact] = stored_url
+                    artifact_key = self.map_artifact_name(artifact)
+
+                    # Thread-safe update of node_af
+                    with node_af_lock:
+                        if artifact in KERNEL_IMAGE_NAMES[self._arch]:
+                            node_af["kernel"] = stored_url
+                            self._node["data"]["kernel_type"] = artifact.lower()
+                        else:
+                            node_af[artifact_key] = stored_url
 
         # Process uploads in parallel
         successful_uploads = 0
@@ -1489,35 +1634,43 @@ trap 'case $stage in
                 print(f"[_upload_artifacts] Error uploading DTB archive: {e}")
 
         if upload_tasks:
+            self._compression_stats = {}
             max_workers = min(10, len(upload_tasks))  # Limit concurrent uploads
+            compress_tasks = []
+            plain_tasks = []
+            for task in upload_tasks:
+                if self._get_compression(task[0]):
+                    compress_tasks.append(task)
+                else:
+                    plain_tasks.append(task)
             with concurrent.futures.ThreadPoolExecutor(
                 max_workers=max_workers
             ) as executor:
-                # Submit all tasks
-                future_to_task = {
-                    executor.submit(process_and_upload_artifact, task): task
-                    for task in upload_tasks
-                }
-
-                # Process results as they complete
-                for future in concurrent.futures.as_completed(future_to_task):
-                    artifact, stored_url, error = future.result()
-
-                    if error:
-                        failed_uploads.append((artifact, error))
-                        continue
-
-                    successful_uploads += 1
-                    self._full_artifacts[artifact] = stored_url
-                    artifact_key = self.map_artifact_name(artifact)
+                compress_futures = [
+                    (executor.submit(process_artifact, task), task)
+                    for task in compress_tasks
+                ]
+                # Upload the other artifacts while the compression is running
+                upload_processed(
+                    [process_artifact(task) for task in plain_tasks],
+                    max_workers,
+                )
+                compressed = []
+                for future, (artifact, _) in compress_futures:
+                    try:
+                        compressed.append(future.result())
+                    except Exception as e:
+                        print(
+                            "[_upload_artifacts] Error compressing "
+                            f"{artifact}: {e}"
+                        )
+                        failed_uploads.append((artifact, str(e)))
+                upload_processed(compressed, max_workers)
 
-                    # Thread-safe update of node_af
-                    with node_af_lock:
-                        if artifact in KERNEL_IMAGE_NAMES[self._arch]:
-                            node_af["kernel"] = stored_url
-                            self._node["data"]["kernel_type"] = artifact.lower()
-                        else:
-                            node_af[artifact_key] = stored_url
+        try:
+            storage.flush()
+        except Exception as e:
+            print(f"[_upload_artifacts] Error flushing storage: {e}")
 
         # Report results
         print(
@@ -1544,6 +1697,7 @@ trap 'case $stage in
         stored_url = storage.upload_single(
             (metadata_path, "metadata.json"), root_path
         )
+        storage.flush()
         print(f"[_upload_metadata] Uploaded metadata.json to {stored_url}")
         print("[_upload_metadata] metadata.json uploaded to storage")
         return stored_url
@@ -1557,6 +1711,8 @@ trap 'case $stage in
             metadata = json.load(f)
         metadata["artifacts"] = self._full_artifacts
         metadata["build"]["result"] = job_result
+        if self._compression_stats:
+            metadata["compression"] = self._compression_stats
         with open(metadata_file, "w") as f:
             json.dump(metadata, f, indent=4)
 
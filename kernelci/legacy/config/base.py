@@ -12,3 +12,6 @@ from kernelci.config.base import (
 from kernelci.config.base import (
     _YAMLObject as _YAMLObject,
 )
+from kernelci.config.base import (
+    match_filters as match_filters,
+)
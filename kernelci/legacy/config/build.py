@@ -16,7 +16,7 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
 
 
-from .base import FilterFactory, YAMLConfigObject
+from .base import FilterFactory, YAMLConfigObject, match_filters
 
 
 class Tree(YAMLConfigObject):
@@ -222,7 +222,7 @@ class Architecture(YAMLConfigObject):
         )
 
     def match(self, params):
-        return all(f.match(**params) for f in self._filters)
+        return match_filters(self._filters, params)
 
 
 class BuildEnvironment(YAMLConfigObject):
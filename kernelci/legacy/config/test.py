@@ -16,7 +16,7 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
 
 
-from .base import FilterFactory, YAMLConfigObject, _YAMLObject
+from .base import FilterFactory, YAMLConfigObject, _YAMLObject, match_filters
 
 
 class DeviceType(_YAMLObject):
@@ -131,9 +131,9 @@ class DeviceType(_YAMLObject):
 
     def match(self, flags, config):
         """Checks if the given *flags* and *config* match this device type."""
-        return all(not v or self.get_flag(k) for k, v in flags.items()) and all(
-            f.match(**config) for f in self._filters
-        )
+        return all(
+            not v or self.get_flag(k) for k, v in flags.items()
+        ) and match_filters(self._filters, config)
 
 
 class DeviceType_arc(DeviceType):
@@ -532,7 +532,7 @@ class TestPlan(_YAMLObject):
         )
 
     def match(self, config):
-        return all(f.match(**config) for f in self._filters)
+        return match_filters(self._filters, config)
 
 
 class TestConfig(_YAMLObject):
@@ -583,7 +583,7 @@ class TestConfig(_YAMLObject):
                 self.device_type.arch is None or (self.device_type.arch == arch)
             )
             and self.device_type.match(flags, config)
-            and all(f.match(**config) for f in self._filters)
+            and match_filters(self._filters, config)
         )
 
     def get_template_path(self, plan):
@@ -9,14 +9,24 @@
 import abc
 import importlib
 import os
+import threading
 
 import requests
 import yaml
-from jinja2 import ChoiceLoader, Environment, FileSystemLoader
+from jinja2 import (
+    ChoiceLoader,
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+)
 from jinja2.exceptions import TemplateRuntimeError
 
 from kernelci.config.base import get_system_arch
 
+# Jinja2 environments shared between Runtime objects, see _get_jinja2_env()
+_JINJA2_ENVS = {}
+_JINJA2_ENVS_LOCK = threading.Lock()
+
 
 class Job:
     """Pipeline job"""
@@ -83,14 +93,22 @@ class Runtime(abc.ABC):
         token=None,
         custom_template_dir=None,
         kcictx=None,
+        template_cache_dir=None,
+        template_auto_reload=True,
     ):
         """A Runtime object can be used to run jobs in a runtime environment
 
         *config* is a kernelci.config.runtime.Runtime object
         *custom_template_dir* is an optional custom directory for Jinja2 templates
         *kcictx* is an optional KernelCI context object for passing program context
+        *template_cache_dir* is an optional directory to store compiled Jinja2
+                             templates on disk
+        *template_auto_reload* is whether to check if the Jinja2 template files
+                               have changed every time they are used
         """
         self._config = config
+        self._template_cache_dir = template_cache_dir
+        self._template_auto_reload = template_auto_reload
         self._templates = self.TEMPLATES.copy()
         if custom_template_dir:
             # Add the main custom dir
@@ -123,13 +141,41 @@ class Runtime(abc.ABC):
         """List of template directories used with this runtime"""
         return self._templates
 
-    def _get_template(self, job_config):
-        loaders = [FileSystemLoader(path) for path in self.templates]
-        jinja2_env = Environment(
-            loader=ChoiceLoader(loaders), extensions=["jinja2.ext.do"]
+    def _get_jinja2_env(self):
+        """Get the Jinja2 environment for this runtime
+
+        Environments are shared between all the runtimes of the same class
+        with the same template directories and caching options, so templates
+        only get compiled once and are then kept in the environment cache.
+        """
+        key = (
+            type(self),
+            tuple(self.templates),
+            self._template_cache_dir,
+            self._template_auto_reload,
         )
-        jinja2_env.globals.update(self._get_jinja2_functions())
-        return jinja2_env.get_template(job_config.template)
+        with _JINJA2_ENVS_LOCK:
+            jinja2_env = _JINJA2_ENVS.get(key)
+            if jinja2_env is None:
+                loaders = [FileSystemLoader(path) for path in self.templates]
+                bytecode_cache = (
+                    FileSystemBytecodeCache(self._template_cache_dir)
+                    if self._template_cache_dir
+                    else None
+                )
+                jinja2_env = Environment(
+                    loader=ChoiceLoader(loaders),
+                    extensions=["jinja2.ext.do"],
+                    bytecode_cache=bytecode_cache,
+                    auto_reload=self._template_auto_reload,
+                    cache_size=-1,
+                )
+                jinja2_env.globals.update(self._get_jinja2_functions())
+                _JINJA2_ENVS[key] = jinja2_env
+        return jinja2_env
+
+    def _get_template(self, job_config):
+        return self._get_jinja2_env().get_template(job_config.template)
 
     @classmethod
     def _get_jinja2_functions(cls):
@@ -266,6 +312,16 @@ class Runtime(abc.ABC):
             output.write(job)
         return output_file
 
+    def get_load(self, platforms):
+        """Get the current load of the runtime for some platforms
+
+        *platforms* is a list of kernelci.config.platform.Platform objects
+
+        Return the number of jobs waiting to be run, or None if the runtime
+        doesn't provide any load information.
+        """
+        return None
+
     @abc.abstractmethod
     def generate(self, job, params):
         """Generate a test job definition.
@@ -289,7 +345,12 @@ class Runtime(abc.ABC):
 
 
 def get_runtime(
-    config, user=None, token=None, custom_template_dir=None, kcictx=None
+    config,
+    user=None,
+    token=None,
+    custom_template_dir=None,
+    kcictx=None,
+    **kwargs,
 ):
     """Get the Runtime object for a given runtime config.
 
@@ -298,6 +359,9 @@ def get_runtime(
     *token* is the associated token to connect to the runtime
     *custom_template_dir* is an optional custom directory for Jinja2 templates
     *kcictx* is an optional KernelCI context object for passing program context
+
+    Any other keyword arguments such as *template_cache_dir* are passed to
+    the Runtime constructor.
     """
     module_name = ".".join(["kernelci", "runtime", config.lab_type])
     runtime_module = importlib.import_module(module_name)
@@ -307,11 +371,12 @@ def get_runtime(
         token=token,
         custom_template_dir=custom_template_dir,
         kcictx=kcictx,
+        **kwargs,
     )
 
 
 def get_all_runtimes(
-    runtime_configs, opts, custom_template_dir=None, kcictx=None
+    runtime_configs, opts, custom_template_dir=None, kcictx=None, **kwargs
 ):
     """Get all the Runtime objects based on the runtime configs and options
 
@@ -323,6 +388,8 @@ def get_all_runtimes(
     *opts* is an Options object loaded from the CLI args and settings file
     *custom_template_dir* is an optional custom directory for Jinja2 templates
     *kcictx* is an optional KernelCI context object for passing program context
+
+    Any other keyword arguments are passed to get_runtime().
     """
     for config_name, config in runtime_configs.items():
         section = ("runtime", config_name)
@@ -336,6 +403,7 @@ def get_all_runtimes(
             token=token,
             custom_template_dir=custom_template_dir,
             kcictx=kcictx,
+            **kwargs,
         )
         yield config_name, runtime
 
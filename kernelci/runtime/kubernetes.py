@@ -5,13 +5,17 @@
 
 """Kubernetes runtime implementation"""
 
+import concurrent.futures
 import logging
 import os
 import random
 import re
 import string
+import threading
+import time
 
 import kubernetes
+import urllib3
 
 from . import Runtime
 
@@ -29,6 +33,8 @@ class Kubernetes(Runtime):
     # Default timeout for Kubernetes API calls in seconds
     # This prevents indefinite hangs on network issues
     DEFAULT_API_TIMEOUT = 30
+    # Default interval in seconds to refresh the clusters load
+    DEFAULT_LOAD_REFRESH = 30
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -37,6 +43,17 @@ class Kubernetes(Runtime):
         self.api_timeout = getattr(
             self.config, "api_timeout", self.DEFAULT_API_TIMEOUT
         )
+        self.load_refresh = getattr(
+            self.config, "load_refresh", self.DEFAULT_LOAD_REFRESH
+        )
+        self._clients = {}
+        self._job_watchers = {}
+        self._clients_lock = threading.Lock()
+        self._load = {}
+        self._load_timestamp = 0
+        self._load_lock = threading.Lock()
+        self._load_stop = threading.Event()
+        self._load_thread = None
 
     @classmethod
     def _get_job_file_name(cls, params):
@@ -58,10 +75,20 @@ class Kubernetes(Runtime):
         params["k8s_job_name"] = k8s_job_name
         return template.render(params)
 
+    def _get_client(self, ctxname):
+        """Get an API client for a given context, created only once"""
+        with self._clients_lock:
+            client = self._clients.get(ctxname)
+            if client is None:
+                client = kubernetes.config.new_client_from_config(
+                    context=ctxname
+                )
+                self._clients[ctxname] = client
+            return client
+
     def _fetch_load(self, ctxname):
         """Fetch load with retry and workaround due repeating errors"""
-        kubernetes.config.load_kube_config(context=ctxname)
-        core_v1 = kubernetes.client.CoreV1Api()
+        core_v1 = kubernetes.client.CoreV1Api(self._get_client(ctxname))
         pods = None
         last_error = None
         for attempt in range(3):
@@ -71,6 +98,7 @@ class Kubernetes(Runtime):
                 # socket timeout
                 pods = core_v1.list_namespaced_pod(
                     namespace="default",
+                    field_selector="status.phase=Pending",
                     timeout_seconds=60,  # Server-side timeout
                     _request_timeout=self.api_timeout,  # Client-side
                 )
@@ -95,7 +123,7 @@ class Kubernetes(Runtime):
                 )
                 continue
 
-        if not pods:
+        if pods is None:
             logger.error(
                 "k8s cluster %s: failed to list pods after 3 attempts, last error: %s",
                 ctxname,
@@ -103,33 +131,75 @@ class Kubernetes(Runtime):
             )
             return 1000
 
-        load = len([pod for pod in pods.items if pod.status.phase == "Pending"])
-        return load
+        return len(pods.items)
+
+    def _refresh_clusters_load(self):
+        """Fetch the load of all the clusters and update the cache"""
+        load = {
+            ctxname: self._fetch_load(ctxname)
+            for ctxname in self.config.context
+        }
+        with self._load_lock:
+            self._load = load
+            self._load_timestamp = time.monotonic()
+        return dict(load)
+
+    def _watch_clusters_load(self):
+        while not self._load_stop.wait(self.load_refresh):
+            self._refresh_clusters_load()
 
     def _get_clusters_load(self):
         """Get the load of all clusters (number of pods in Pending
-        state)"""
-        load = {}
-        for ctxname in self.config.context:
-            load[ctxname] = self._fetch_load(ctxname)
-            # We found free cluster, return it, no need to check others
-            if load[ctxname] == 0:
-                break
+        state)
+
+        The load is cached and refreshed in the background every
+        `load_refresh` seconds once it has been fetched for the first time.
+        """
+        with self._load_lock:
+            if (
+                self._load
+                and time.monotonic() - self._load_timestamp
+                < 2 * self.load_refresh
+            ):
+                return dict(self._load)
+        load = self._refresh_clusters_load()
+        with self._load_lock:
+            if self._load_thread is None:
+                self._load_thread = threading.Thread(
+                    target=self._watch_clusters_load, daemon=True
+                )
+                self._load_thread.start()
         return load
 
+    def stop_load_refresh(self):
+        """Stop refreshing the clusters load in the background"""
+        self._load_stop.set()
+        if self._load_thread is not None:
+            self._load_thread.join()
+            self._load_thread = None
+
+    def get_load(self, platforms):
+        """Get the number of Pending pods in the least loaded cluster"""
+        if isinstance(self.config.context, list):
+            return min(self._get_clusters_load().values(), default=None)
+        return self._fetch_load(self.config.context)
+
     def submit(self, job_path):
         # if context is array, we have multiple k8s build clusters
-        # TBD: Implement caching to not check load for each job?
         if isinstance(self.config.context, list):
             # get the cluster with the least load
             load = self._get_clusters_load()
             self.kcontext = min(load, key=load.get)
             if load[self.kcontext] >= 1000:
                 logger.error("All k8s clusters unreachable, loads: %s", load)
+            else:
+                # Account for this job until the next refresh
+                with self._load_lock:
+                    if self.kcontext in self._load:
+                        self._load[self.kcontext] += 1
         else:
             self.kcontext = self.config.context
-        kubernetes.config.load_kube_config(context=self.kcontext)
-        client = kubernetes.client.ApiClient()
+        client = self._get_client(self.kcontext)
         return kubernetes.utils.create_from_yaml(client, job_path)
 
     def get_job_id(self, job_object):
@@ -139,24 +209,202 @@ class Kubernetes(Runtime):
         """Get kubernetes cluster name the job submitted to"""
         return self.kcontext
 
+    def _get_job_watcher(self, ctxname):
+        """Get the shared JobWatcher for a given context"""
+        with self._clients_lock:
+            watcher = self._job_watchers.get(ctxname)
+            if watcher is None:
+                watcher = JobWatcher(
+                    kubernetes.client.CoreV1Api(self._get_client(ctxname)),
+                    api_timeout=self.api_timeout,
+                )
+                self._job_watchers[ctxname] = watcher
+            return watcher
+
     def wait(self, job_object):
-        watch = kubernetes.watch.Watch()
-        core_v1 = kubernetes.client.CoreV1Api()
         job_name = job_object[0][0].metadata.labels["job-name"]
-        for event in watch.stream(
-            func=core_v1.list_namespaced_pod,
-            namespace="default",
-            timeout_seconds=3600,  # Server-side timeout (1 hour)
-            _request_timeout=self.api_timeout,
-        ):  # Client-side
-            if event["type"] != "MODIFIED":
-                continue
-            if job_name not in event["object"].metadata.name:
-                continue
-            state = event["object"].status.container_statuses[0].state
-            if not state.terminated:
-                continue
-            return 0 if state.terminated.reason == "Completed" else 1
+        return self._get_job_watcher(self.kcontext).wait(job_name)
+
+
+class JobWatcher:
+    """Wait for many Kubernetes jobs with a single watch
+
+    Only the pods with a `job-name` label are watched, and the watch is
+    resumed from the last resourceVersion received whenever the stream ends.
+    The terminal state of each job pod is dispatched to all the threads
+    waiting for it through futures, and events for any other jobs are
+    ignored.  The watch is only running while there are jobs being waited
+    for.
+
+    Expired resourceVersions, connection errors and read timeouts are
+    retried until no event has been received for `retry_timeout` seconds.
+    Any other error, or reaching this deadline, is set on all the pending
+    futures.
+    """
+
+    # Default time in seconds to keep retrying after transient errors
+    DEFAULT_RETRY_TIMEOUT = 600
+    # Errors after which the watch is resumed
+    TRANSIENT_ERRORS = (
+        ConnectionError,
+        TimeoutError,
+        urllib3.exceptions.ProtocolError,
+        urllib3.exceptions.MaxRetryError,
+        urllib3.exceptions.TimeoutError,
+    )
+
+    def __init__(
+        self,
+        core_v1,
+        namespace="default",
+        api_timeout=30,
+        retry_timeout=DEFAULT_RETRY_TIMEOUT,
+    ):
+        self._core_v1 = core_v1
+        self._namespace = namespace
+        self._api_timeout = api_timeout
+        self._retry_timeout = retry_timeout
+        self._waiters = {}
+        self._resource_version = None
+        self._last_event = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @classmethod
+    def _get_exit_code(cls, pod):
+        """Get the job exit code if the pod has terminated, or None"""
+        statuses = pod.status.container_statuses if pod.status else None
+        if not statuses:
+            return None
+        terminated = statuses[0].state.terminated
+        if not terminated:
+            return None
+        return 0 if terminated.reason == "Completed" else 1
+
+    def _handle_pod(self, pod):
+        job_name = (pod.metadata.labels or {}).get("job-name")
+        exit_code = self._get_exit_code(pod)
+        if job_name is None or exit_code is None:
+            return
+        with self._lock:
+            futures = self._waiters.pop(job_name, [])
+        for future in futures:
+            future.set_result(exit_code)
+
+    def _handle_event(self, event):
+        pod = event["object"]
+        self._resource_version = pod.metadata.resource_version
+        self._last_event = time.monotonic()
+        if event["type"] != "DELETED":
+            self._handle_pod(pod)
+
+    def _check(self, job_name):
+        """Check if a job pod has already terminated"""
+        try:
+            pods = self._core_v1.list_namespaced_pod(
+                namespace=self._namespace,
+                label_selector=f"job-name={job_name}",
+                _request_timeout=self._api_timeout,
+            )
+        except (
+            kubernetes.client.rest.ApiException,
+            *self.TRANSIENT_ERRORS,
+        ) as error:
+            logger.warning(
+                "k8s job %s: failed to get pod status: %s", job_name, error
+            )
+            return
+        for pod in pods.items:
+            self._handle_pod(pod)
+
+    def _watch(self):
+        watch = kubernetes.watch.Watch()
+        kwargs = {
+            "namespace": self._namespace,
+            "label_selector": "job-name",
+            "timeout_seconds": 3600,  # Server-side timeout (1 hour)
+            "_request_timeout": self._api_timeout,  # Client-side
+        }
+        if self._resource_version:
+            kwargs["resource_version"] = self._resource_version
+        try:
+            for event in watch.stream(
+                self._core_v1.list_namespaced_pod, **kwargs
+            ):
+                self._handle_event(event)
+                with self._lock:
+                    if not self._waiters:
+                        break
+        except kubernetes.client.rest.ApiException as error:
+            if error.status != 410:
+                raise
+            # The resourceVersion is too old, list all the pods again
+            logger.info("k8s watch expired, restarting from scratch")
+            self._resource_version = None
+        finally:
+            watch.stop()
+        self._last_event = time.monotonic()
+
+    def _fail(self, error):
+        """Set an error on all the pending futures and stop watching"""
+        with self._lock:
+            waiters, self._waiters = self._waiters, {}
+            self._thread = None
+        for futures in waiters.values():
+            for future in futures:
+                future.set_exception(error)
+
+    def _run(self):
+        self._last_event = time.monotonic()
+        while True:
+            with self._lock:
+                if not self._waiters:
+                    self._thread = None
+                    return
+            try:
+                self._watch()
+            except self.TRANSIENT_ERRORS as error:
+                if time.monotonic() - self._last_event > self._retry_timeout:
+                    logger.error(
+                        "k8s watch failed for %ds, giving up: %s: %s",
+                        self._retry_timeout,
+                        type(error).__name__,
+                        error,
+                    )
+                    self._fail(error)
+                    return
+                logger.warning(
+                    "k8s watch error, resuming: %s: %s",
+                    type(error).__name__,
+                    error,
+                )
+                time.sleep(1)
+            except Exception as error:
+                logger.error(
+                    "k8s watch error: %s: %s", type(error).__name__, error
+                )
+                self._fail(error)
+                return
+
+    def submit(self, job_name):
+        """Get a future with the exit code of the job pod
+
+        The pod status is first checked directly, as the events for a job
+        which terminated before it was submitted may have been skipped by
+        the watch.
+        """
+        future = concurrent.futures.Future()
+        with self._lock:
+            self._waiters.setdefault(job_name, []).append(future)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._check(job_name)
+        return future
+
+    def wait(self, job_name):
+        """Wait for a job pod to terminate and get its exit code"""
+        return self.submit(job_name).result()
 
 
 def get_runtime(runtime_config, **kwargs):
@@ -10,6 +10,9 @@
 
 """LAVA runtime implementation"""
 
+import gzip
+import io
+import json
 import tempfile
 import time
 import uuid
@@ -29,43 +32,101 @@ class LogParser:
     This class can be used to parse LAVA logs as received in a callback, in
     YAML format via *log_data_yaml*.  It can then produce a plain text version
     with just the serial output from the test platform.
+
+    LAVA logs have one entry per line, so they are parsed incrementally
+    rather than loading the whole YAML document.  *log_data_yaml* can be a
+    string, bytes or a file object opened in text mode, and it is parsed
+    again each time the log entries are iterated.
     """
 
     def __init__(self, log_data_yaml):
-        self._raw_log = self._get_raw_log(log_data_yaml)
+        self._log_data = log_data_yaml
+
+    @classmethod
+    def _iter_lines(cls, log_data):
+        if isinstance(log_data, bytes):
+            log_data = log_data.decode("utf-8", errors="replace")
+        if not isinstance(log_data, str):
+            if log_data.seekable():
+                log_data.seek(0)
+            yield from log_data
+            return
+        start = 0
+        while start < len(log_data):
+            end = log_data.find("\n", start)
+            end = len(log_data) if end == -1 else end + 1
+            yield log_data[start:end]
+            start = end
+
+    @staticmethod
+    def _reject_constant(name):
+        raise ValueError(f"Not a YAML value: {name}")
 
     @classmethod
-    def _get_raw_log(cls, log_data_yaml):
-        log = yaml.load(log_data_yaml, Loader=yaml.CSafeLoader)
-        raw_log = []
-        for line in log:
+    def _parse_entry(cls, entry):
+        # NaN and Infinity are valid in Python's JSON but strings in YAML
+        try:
+            return json.loads(entry[1:], parse_constant=cls._reject_constant)
+        except ValueError:
+            items = yaml.load(entry, Loader=yaml.CSafeLoader)
+            return items[0] if items else None
+
+    @classmethod
+    def _iter_entries(cls, log_data):
+        """Iterate over the log entries, each being a YAML list item"""
+        entry = None
+        for line in cls._iter_lines(log_data):
+            if line.startswith("-"):
+                if entry:
+                    yield cls._parse_entry(entry)
+                entry = line
+            elif entry is not None:
+                entry += line
+        if entry:
+            yield cls._parse_entry(entry)
+
+    def iter_raw_log(self):
+        """Iterate over the (dt, lvl, msg) log entries with a message"""
+        for line in self._iter_entries(self._log_data):
+            if not isinstance(line, dict):
+                continue
             dtime, level, msg = (line.get(key) for key in ["dt", "lvl", "msg"])
             if not isinstance(msg, str):
                 continue
             msg = msg.strip().replace("\x1b", "^[")
             if msg:
-                raw_log.append((dtime, level, msg))
-        return raw_log
+                yield dtime, level, msg
 
     def get_text_log(self, output):
         """Get the plain text serial console output log from the plaform"""
-        for _, level, msg in self._raw_log:
+        for _, level, msg in self.iter_raw_log():
             if level == "target":
                 output.write(msg)
                 output.write("\n")
 
     def get_text(self):
         """Get the plain text serial console output as a string"""
-        output = ""
-        for _, level, msg in self._raw_log:
-            if level == "target":
-                output += msg + "\n"
-        return output
+        output = io.StringIO()
+        self.get_text_log(output)
+        return output.getvalue()
+
+    def to_text_file(self, filename):
+        """Write the plain text serial console output to a file
+
+        The file is compressed with gzip if *filename* ends with ".gz".
+        """
+        if filename.endswith(".gz"):
+            output = gzip.open(filename, "wt", encoding="utf-8")
+        else:
+            output = open(filename, "w", encoding="utf-8")
+        with output:
+            self.get_text_log(output)
 
     def get_data(self):
         """Get the raw log data as a list of dicts in LAVA output.yaml format"""
         return [
-            {"dt": dt, "lvl": lvl, "msg": msg} for dt, lvl, msg in self._raw_log
+            {"dt": dt, "lvl": lvl, "msg": msg}
+            for dt, lvl, msg in self.iter_raw_log()
         ]
 
 
@@ -89,9 +150,17 @@ class Callback:
     }
 
     def __init__(self, data):
-        """This class can be used to parse LAVA callback data"""
+        """This class can be used to parse LAVA callback data
+
+        Each YAML document in the callback data is decoded only once when
+        first needed, then kept along with some indexes used by the various
+        methods of this class.
+        """
         self._data = data
         self._meta = None
+        self._suites = {}
+        self._stages = None
+        self._stage_results = None
 
     def get_data(self):
         """Get the raw callback data"""
@@ -104,7 +173,10 @@ class Callback:
     def get_meta(self, key):
         """Get a metadata value from the job definition"""
         if self._meta is None:
-            self._meta = yaml.safe_load(self._data["definition"])["metadata"]
+            definition = yaml.load(
+                self._data["definition"], Loader=yaml.CSafeLoader
+            )
+            self._meta = definition["metadata"]
         return self._meta.get(key)
 
     def get_job_status(self):
@@ -112,23 +184,33 @@ class Callback:
         # map over LAVA_JOB_RESULT_NAMES
         return self.LAVA_JOB_RESULT_NAMES.get(self._data["status"])
 
+    def _get_suite(self, suite_name):
+        """Get the decoded list of test results for a given suite"""
+        if suite_name not in self._suites:
+            self._suites[suite_name] = yaml.load(
+                self._data["results"][suite_name], Loader=yaml.CSafeLoader
+            )
+        return self._suites[suite_name]
+
+    def _get_stages(self):
+        """Get the LAVA stages results indexed by name"""
+        if self._stages is None:
+            self._stages = {
+                stage["name"]: stage for stage in self._get_suite("lava")
+            }
+        return self._stages
+
     def is_infra_error(self):
         """Determine wether the job has hit an infrastructure error"""
-        lava_yaml = self._data["results"]["lava"]
-        lava = yaml.safe_load(lava_yaml)
-        stages = {stage["name"]: stage for stage in lava}
-        job_meta = stages["job"]["metadata"]
+        job_meta = self._get_stages()["job"]["metadata"]
         return job_meta.get("error_type") == "Infrastructure"
 
     def _get_job_failure_metadata(self):
         """Get failed lava job metadata fields such as error type and
         error message"""
-        lava_yaml = self._data["results"].get("lava")
-        if not lava_yaml:
+        if not self._data["results"].get("lava"):
             return None
-        lava = yaml.safe_load(lava_yaml)
-        stages = {stage["name"]: stage for stage in lava}
-        job_meta = stages.get("job", {}).get("metadata")
+        job_meta = self._get_stages().get("job", {}).get("metadata")
         return job_meta
 
     @classmethod
@@ -163,14 +245,12 @@ class Callback:
         return "fail" if any_failed else "pass"
 
     def _get_os_release_measurement(self):
-        for suite_name, suite_results in self._data["results"].items():
-            if suite_name != "0_tast":
-                continue
-            tests = yaml.safe_load(suite_results)
-            tests_map = {test["name"]: test for test in tests}
-            os_release = tests_map.get("os-release")
-            if os_release:
-                return os_release.get("measurement")
+        if "0_tast" not in self._data["results"]:
+            return None
+        tests_map = {test["name"]: test for test in self._get_suite("0_tast")}
+        os_release = tests_map.get("os-release")
+        if os_release:
+            return os_release.get("measurement")
         return None
 
     @classmethod
@@ -188,8 +268,8 @@ class Callback:
     def get_results(self):
         """Parse the results and return them as a plain dictionary"""
         results = {}
-        for suite_name, suite_results in self._data["results"].items():
-            tests = yaml.safe_load(suite_results)
+        for suite_name in self._data["results"]:
+            tests = self._get_suite(suite_name)
             if suite_name == "lava":
                 setup = {
                     key: result
@@ -207,15 +287,13 @@ class Callback:
         return results
 
     def _get_stage_result(self, suite_name):
-        lava_yaml = self._data["results"]["lava"]
-        lava = yaml.safe_load(lava_yaml)
-        stages = {stage["name"]: stage for stage in lava}
-        result = None
-        for stage_name, stage_results in stages.items():
-            stage_name = stage_name.partition("_")[2]
-            if stage_name == suite_name:
-                result = stage_results["result"]
-        return result
+        if self._stage_results is None:
+            # Stage names are prefixed with their index e.g. 0_baseline
+            self._stage_results = {
+                stage_name.partition("_")[2]: stage_results["result"]
+                for stage_name, stage_results in self._get_stages().items()
+            }
+        return self._stage_results.get(suite_name)
 
     def _get_results_hierarchy(self, results):
         hierarchy = []
@@ -465,6 +543,13 @@ class LAVA(Runtime):
                 return 0 if health == "Complete" else 1
             time.sleep(3)
 
+    def get_load(self, platforms):
+        """Get the number of queued jobs for the platforms device types"""
+        if self._server.url is None:
+            return None
+        device_types = sorted({platform.base_name for platform in platforms})
+        return sum(self.get_devicetype_job_count(device_types).values())
+
     def _connect(self):
         if not hasattr(self.config, "url") or not self.config.url:
             return self.RestAPIServer(None, None)
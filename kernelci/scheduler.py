@@ -5,7 +5,219 @@
 
 """KernelCI Pipeline scheduler logic"""
 
+import abc
+import math
 import random
+import threading
+import time
+from collections.abc import Hashable
+
+
+class RuntimeLoadCache:
+    """Cache of runtime load probes refreshed in the background
+
+    Probing the load of a runtime typically means querying a remote service,
+    so the results are kept for *ttl* seconds.  Once a (runtime, platforms)
+    load has been requested, a background thread keeps refreshing it every
+    *ttl* / 2 seconds so the scheduler doesn't have to wait for it again.
+    Loads which haven't been requested for *ttl* seconds are dropped and not
+    refreshed any more, and the thread stops when there are none left.
+    """
+
+    def __init__(self, ttl=60, refresh=True):
+        self._ttl = ttl
+        self._refresh = refresh
+        self._loads = {}
+        self._probes = {}
+        self._reads = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def _probe(cls, runtime, platforms):
+        try:
+            return runtime.get_load(platforms)
+        except Exception as exc:
+            print(f"Failed to get load for {runtime.config.name}: {exc}")
+            return None
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                # New event for each thread so stop() can't miss a restart
+                self._stop = threading.Event()
+                self._thread = threading.Thread(
+                    target=self._run, args=(self._stop,), daemon=True
+                )
+                self._thread.start()
+
+    def _evict(self):
+        """Drop the loads which haven't been requested within the TTL"""
+        now = time.monotonic()
+        for key, read in list(self._reads.items()):
+            if now - read > self._ttl:
+                self._reads.pop(key)
+                self._probes.pop(key, None)
+                self._loads.pop(key, None)
+
+    def _run(self, stop):
+        while not stop.wait(self._ttl / 2):
+            with self._lock:
+                self._evict()
+                probes = list(self._probes.items())
+                if not probes:
+                    if self._thread is threading.current_thread():
+                        self._thread = None
+                    return
+            for key, (runtime, platforms) in probes:
+                load = self._probe(runtime, platforms)
+                with self._lock:
+                    if key in self._probes:
+                        self._loads[key] = (time.monotonic(), load)
+
+    def get(self, runtime, platforms):
+        """Get the load of a runtime for a list of Platform objects"""
+        key = (
+            runtime.config.name,
+            tuple(sorted(platform.name for platform in platforms)),
+        )
+        with self._lock:
+            cached = self._loads.get(key)
+            self._reads[key] = time.monotonic()
+        if cached and time.monotonic() - cached[0] < self._ttl:
+            return cached[1]
+        load = self._probe(runtime, platforms)
+        with self._lock:
+            self._loads[key] = (time.monotonic(), load)
+            self._probes[key] = (runtime, platforms)
+            self._reads[key] = time.monotonic()
+        if self._refresh:
+            self._start()
+        return load
+
+    def clear(self):
+        """Drop all the cached loads and stop refreshing them"""
+        with self._lock:
+            self._loads.clear()
+            self._probes.clear()
+            self._reads.clear()
+
+    def stop(self):
+        """Stop refreshing the loads in the background
+
+        The refresh thread is started again by the next get() call.
+        """
+        with self._lock:
+            self._stop.set()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+
+
+class RuntimeSelection(abc.ABC):
+    """Policy to select a runtime among several ones of the same type"""
+
+    name = None
+
+    def __init__(self, rand=None):
+        """Create a runtime selection policy
+
+        *rand* is an optional random.Random object used to make random choices,
+               a new one is created by default
+        """
+        self._random = rand or random.Random()
+
+    @abc.abstractmethod
+    def select(self, runtimes, get_load):
+        """Select a runtime
+
+        *runtimes* is a list of Runtime objects to choose from
+        *get_load* is a function returning the load of a runtime, or infinity
+                   if the load is not known
+        """
+
+
+class RandomSelection(RuntimeSelection):
+    """Pick a runtime at random, regardless of load"""
+
+    name = "random"
+
+    def select(self, runtimes, get_load):
+        return self._random.sample(runtimes, 1)[0]
+
+
+class LeastQueuedSelection(RuntimeSelection):
+    """Pick the runtime with the lowest load, ties are broken at random"""
+
+    name = "least-queued"
+
+    def select(self, runtimes, get_load):
+        return min(
+            runtimes,
+            key=lambda runtime: (get_load(runtime), self._random.random()),
+        )
+
+
+class PowerOfTwoSelection(RuntimeSelection):
+    """Pick the least loaded runtime out of two chosen at random
+
+    This only probes the load of two runtimes each time while still avoiding
+    the most loaded ones.
+    """
+
+    name = "power-of-two"
+
+    def select(self, runtimes, get_load):
+        choices = self._random.sample(runtimes, min(2, len(runtimes)))
+        return min(choices, key=get_load)
+
+
+class WeightedRoundRobinSelection(RuntimeSelection):
+    """Cycle through the runtimes according to their weights
+
+    *weights* is a dictionary with the runtime names as keys and their integer
+    weights as values, the default weight being 1.  Runtimes with an unknown
+    load are skipped unless they all are.
+    """
+
+    name = "weighted-round-robin"
+
+    def __init__(self, weights=None, rand=None):
+        super().__init__(rand)
+        self._weights = weights or {}
+        self._current = {}
+        self._lock = threading.Lock()
+
+    def select(self, runtimes, get_load):
+        available = [
+            runtime for runtime in runtimes if get_load(runtime) != math.inf
+        ]
+        candidates = available or runtimes
+        with self._lock:
+            total = 0
+            for runtime in candidates:
+                name = runtime.config.name
+                weight = self._weights.get(name, 1)
+                self._current[name] = self._current.get(name, 0) + weight
+                total += weight
+            selected = max(
+                candidates,
+                key=lambda runtime: self._current[runtime.config.name],
+            )
+            self._current[selected.config.name] -= total
+        return selected
+
+
+RUNTIME_SELECTIONS = {
+    policy.name: policy
+    for policy in (
+        RandomSelection,
+        LeastQueuedSelection,
+        PowerOfTwoSelection,
+        WeightedRoundRobinSelection,
+    )
+}
 
 
 class Scheduler:
@@ -17,7 +229,23 @@ class Scheduler:
     API via the Pub/Sub interface.
     """
 
-    def __init__(self, configs, runtimes):
+    # Event keys used to index the scheduler entries, most discriminating first
+    INDEX_KEYS = ("name", "kind", "result", "state")
+
+    def __init__(self, configs, runtimes, selection=None, load_ttl=60):
+        """Create a Scheduler object
+
+        *configs* is the YAML configuration with the scheduler, jobs and
+                  platforms entries
+        *runtimes* is a dictionary with the Runtime objects to use
+        *selection* is the default policy to select a runtime when a scheduler
+                    entry only has a runtime type, either a RuntimeSelection
+                    object or a name from RUNTIME_SELECTIONS; each entry can
+                    also have its own `selection` name in its runtime
+                    parameters
+        *load_ttl* is the time in seconds during which a runtime load is
+                   cached
+        """
         self._scheduler = configs["scheduler"]
         self._jobs = configs["jobs"]
         self._runtimes = runtimes
@@ -28,6 +256,100 @@ class Scheduler:
             )
             runtime_type.append(runtime)
         self._platforms = configs["platforms"]
+        self._index = self._build_index(self._scheduler)
+        self._selections = {}
+        self._selection = self._get_selection(selection or "random")
+        self._load_ttl = load_ttl
+        self._loads = RuntimeLoadCache(load_ttl)
+
+    @classmethod
+    def _build_index(cls, entries):
+        """Index scheduler entries by channel and then by event criteria
+
+        Each channel has a dictionary of entries keyed by the first (key,
+        value) pair found in the entry event criteria for any of the
+        INDEX_KEYS, and a list of entries with none of these keys.  Entries
+        are stored as (position, entry, criteria) tuples with the criteria
+        being the event dictionary without the channel.
+        """
+        index = {}
+        for position, entry in enumerate(entries):
+            sched_event = dict(entry.event)
+            channel = sched_event.pop("channel", None)
+            if channel is None:
+                continue
+            indexed, unindexed = index.setdefault(channel, ({}, []))
+            item = (position, entry, sched_event)
+            for key in cls.INDEX_KEYS:
+                value = sched_event.get(key)
+                if key in sched_event and isinstance(value, Hashable):
+                    indexed.setdefault((key, value), []).append(item)
+                    break
+            else:
+                unindexed.append(item)
+        return index
+
+    def _get_candidates(self, event, channel):
+        """Get the scheduler entries which may match an event, in order"""
+        channel_index = self._index.get(channel)
+        if not channel_index:
+            return []
+        indexed, unindexed = channel_index
+        candidates = list(unindexed)
+        for key in self.INDEX_KEYS:
+            value = event.get(key)
+            if isinstance(value, Hashable):
+                candidates.extend(indexed.get((key, value), []))
+        candidates.sort(key=lambda item: item[0])
+        return candidates
+
+    def _get_selection(self, selection):
+        if isinstance(selection, RuntimeSelection):
+            return selection
+        policy = self._selections.get(selection)
+        if policy is None:
+            policy_cls = RUNTIME_SELECTIONS.get(selection)
+            if policy_cls is None:
+                raise ValueError(f"Unknown runtime selection: {selection}")
+            policy = self._selections.setdefault(selection, policy_cls())
+        return policy
+
+    def _select_runtime(self, config, runtimes):
+        """Select a runtime for a scheduler entry with a runtime type"""
+        selection = config.runtime.get("selection")
+        policy = (
+            self._get_selection(selection) if selection else self._selection
+        )
+        platforms = [
+            self._platforms[name]
+            for name in config.platforms or [config.runtime.get("type")]
+            if name in self._platforms
+        ]
+
+        def get_load(runtime):
+            load = self._loads.get(runtime, platforms)
+            return math.inf if load is None else load
+
+        return policy.select(runtimes, get_load)
+
+    def close(self):
+        """Stop refreshing the runtime loads in the background"""
+        self._loads.stop()
+
+    def reload(self, configs):
+        """Create a new Scheduler object with updated configs
+
+        The new object uses the same runtimes and default runtime selection
+        policy.  It can be used to replace this one atomically while running,
+        typically from a kernelci.config.watcher.ConfigWatcher callback, and
+        this one should then be closed.  The runtime loads cached by this
+        object are cleared so they stop being refreshed for the entries and
+        platforms of the previous configs.
+        """
+        self._loads.clear()
+        return type(self)(
+            configs, self._runtimes, self._selection, self._load_ttl
+        )
 
     def get_configs(self, event, channel="node"):
         """Get the scheduler configs matching a given event"""
@@ -36,28 +358,28 @@ class Scheduler:
         if not isinstance(event, dict):
             print("Error: event type should be dict")
             return
-        for entry in self._scheduler:
-            sched_event_channel = entry.event.get("channel")
-            if sched_event_channel == channel:
-                sched_event = entry.event.copy()
-                sched_event.pop("channel")
-                if not sched_event.items() <= event.items():
-                    continue
-                # Edge-triggered scheduling (kernelci-core#2912): when the API
-                # reports a node update together with its previous state/result,
-                # only act on the transition INTO the matched condition. This
-                # avoids re-creating identical child jobs every time the parent
-                # node is updated while staying in the same matching state (e.g.
-                # an artifact or timeout update on an already-`available` node).
-                # Falls back to level-triggered behaviour when no previous_*
-                # info is present (node creation, retry events or older API).
-                if event.get("op") == "updated" and "previous_state" in event:
-                    previous_event = dict(event)
-                    previous_event["state"] = event.get("previous_state")
-                    previous_event["result"] = event.get("previous_result")
-                    if sched_event.items() <= previous_event.items():
-                        continue
-                yield entry
+        event_items = event.items()
+        previous_items = None
+        # Edge-triggered scheduling (kernelci-core#2912): when the API
+        # reports a node update together with its previous state/result,
+        # only act on the transition INTO the matched condition. This
+        # avoids re-creating identical child jobs every time the parent
+        # node is updated while staying in the same matching state (e.g.
+        # an artifact or timeout update on an already-`available` node).
+        # Falls back to level-triggered behaviour when no previous_*
+        # info is present (node creation, retry events or older API).
+        if event.get("op") == "updated" and "previous_state" in event:
+            previous_event = dict(event)
+            previous_event["state"] = event.get("previous_state")
+            previous_event["result"] = event.get("previous_result")
+            previous_items = previous_event.items()
+        for _, entry, sched_event in self._get_candidates(event, channel):
+            sched_items = sched_event.items()
+            if not sched_items <= event_items:
+                continue
+            if previous_items is not None and sched_items <= previous_items:
+                continue
+            yield entry
 
     def get_schedule(self, event, channel="node"):
         """Get the (job, runtime, platform) configs for each job to run"""
@@ -68,9 +390,9 @@ class Scheduler:
             if runtime_name:
                 runtime = self._runtimes.get(runtime_name)
             elif runtime_type:
-                # Pick one at random until there's more criteria
                 runtimes = self._runtimes_by_type.get(runtime_type)
-                runtime = random.sample(runtimes, 1)[0] if runtimes else None
+                if runtimes:
+                    runtime = self._select_runtime(config, runtimes)
             job = self._jobs.get(config.job)
             if not all((job, runtime)):
                 continue
@@ -7,13 +7,52 @@
 """KernelCI storage abstraction package"""
 
 import abc
+import concurrent.futures
 import importlib
+import os
 from urllib.parse import urljoin
 
 
+def get_upload_batches(file_paths, max_size, max_files):
+    """Group files into batches to upload them with fewer requests
+
+    Split the *file_paths* list of (local, remote) 2-tuples into lists of
+    2-tuples, each to be uploaded in a single request.  Small files are grouped
+    together in the same order as in *file_paths* until adding another file
+    would exceed *max_size* bytes or *max_files* files in the batch.  Files
+    which are at least *max_size* bytes large are each in their own batch, and
+    these batches come first so they can start uploading before the small
+    ones.
+    """
+    large = []
+    batches = []
+    batch = []
+    batch_size = 0
+    for file_path in file_paths:
+        file_size = os.path.getsize(file_path[0])
+        if file_size >= max_size:
+            large.append([file_path])
+            continue
+        if batch and (
+            batch_size + file_size > max_size or len(batch) >= max_files
+        ):
+            batches.append(batch)
+            batch = []
+            batch_size = 0
+        batch.append(file_path)
+        batch_size += file_size
+    if batch:
+        batches.append(batch)
+    return large + batches
+
+
 class Storage(abc.ABC):
     """Storage abstraction interface class"""
 
+    # Default limits for the batches of files sent by .upload_batches()
+    BATCH_SIZE = 4 * 1024 * 1024
+    BATCH_FILES = 32
+
     def __init__(self, config, credentials):
         """Base class for interacting with a storage implementation
 
@@ -62,6 +101,14 @@ class Storage(abc.ABC):
         """
         raise NotImplementedError
 
+    def flush(self):
+        """Save any state kept by the storage object after some uploads
+
+        This should be called once all the files of a build or any other
+        group of uploads have been uploaded.  The default implementation does
+        nothing.
+        """
+
     def upload_single(self, file_path, dest_path=""):
         """Upload a single file to storage
 
@@ -110,6 +157,60 @@ class Storage(abc.ABC):
             for (file_src, file_dst) in file_paths
         ]
 
+    def _upload_batch(self, file_paths, dest_path):
+        urls = self._upload(file_paths, dest_path)
+        return urls or {
+            file_dst: urljoin(
+                self.config.base_url, "/".join([".", dest_path, file_dst])
+            )
+            for (file_src, file_dst) in file_paths
+        }
+
+    def upload_batches(
+        self,
+        file_paths,
+        dest_path="",
+        max_size=None,
+        max_files=None,
+        max_workers=1,
+    ):
+        """Upload many files in batches of multiple files per request
+
+        Group the files from the *file_paths* list of (local, remote) 2-tuples
+        as per get_upload_batches() with *max_size* bytes and *max_files*
+        files per batch, or the BATCH_SIZE and BATCH_FILES defaults, then
+        upload each batch with the same destination *dest_path* as
+        .upload_multiple().  Up to *max_workers* batches are uploaded in
+        parallel, so large files get uploaded as separate concurrent requests.
+
+        This is a generator yielding a (batch, urls, error) 3-tuple for each
+        batch as soon as it's been uploaded.  The *urls* item is a dictionary
+        with the destination file names and their public URLs, or None if the
+        upload failed in which case *error* is the exception message.
+        """
+        self._connect()
+        batches = get_upload_batches(
+            file_paths,
+            max_size or self.BATCH_SIZE,
+            max_files or self.BATCH_FILES,
+        )
+        if not batches:
+            return
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(max_workers, len(batches))
+        ) as executor:
+            future_to_batch = {
+                executor.submit(self._upload_batch, batch, dest_path): batch
+                for batch in batches
+            }
+            for future in concurrent.futures.as_completed(future_to_batch):
+                batch = future_to_batch[future]
+                try:
+                    urls, error = future.result(), None
+                except Exception as exc:
+                    urls, error = None, str(exc)
+                yield batch, urls, error
+
     def upload_archive(
         self, archive_path, file_paths, dest_path="", archive_name=None
     ):
@@ -139,13 +240,21 @@ class Storage(abc.ABC):
         }
 
 
-def get_storage(config, credentials):
+def get_storage(config, credentials, dedup_index=None, dedup_verify=True):
     """Get a Storage instance for a given storage configuration
 
     Create and return a Storage implementation object instance that matches the
-    storage configuration in *config* using the provided *credentials*.
+    storage configuration in *config* using the provided *credentials*.  If
+    *dedup_index* is the path to a manifest index JSON file, the object is
+    wrapped in a kernelci.storage.dedup.DedupStorage to skip uploading files
+    which have already been uploaded.  If *dedup_verify* is True, files found
+    in the index are only skipped if their URL is still available.
     """
     module = importlib.import_module(
         ".".join(["kernelci", "storage", config.storage_type])
     )
-    return module.get_storage(config, credentials)
+    storage = module.get_storage(config, credentials)
+    if dedup_index:
+        dedup = importlib.import_module("kernelci.storage.dedup")
+        storage = dedup.DedupStorage(storage, dedup_index, dedup_verify)
+    return storage
@@ -5,9 +5,12 @@
 
 """KernelCI storage implementation for Azure Files"""
 
-import os
+import concurrent.futures
+import posixpath
+import threading
 from urllib.parse import urljoin
 
+from azure.core.exceptions import ResourceExistsError
 from azure.storage.blob import ContentSettings
 from azure.storage.fileshare import ShareServiceClient
 
@@ -26,56 +29,89 @@ class StorageAzureFiles(Storage):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._service = None
+        self._dirs = set()
+        self._dirs_lock = threading.Lock()
 
     def _connect(self):
         if self._service is not None:
             return
+        kwargs = {}
+        if self.config.chunk_size:
+            kwargs["max_range_size"] = self.config.chunk_size
         self._service = ShareServiceClient(
-            account_url=self.config.base_url, credential=self.credentials
+            account_url=self.config.base_url,
+            credential=self.credentials,
+            **kwargs,
         )
 
-    def _get_directory(self, share, path):
-        directoryp = share.get_directory_client(directory_path=path)
-        if not directoryp.exists():
-            # split directory path into components
-            # and create each one in turn
-            # As we might have newdirectory/newdirectory2/newdir3
-            components = path.split("/")
-            for i in range(1, len(components)):
-                directory2 = share.get_directory_client(
-                    directory_path="/".join(components[:i])
+    def _create_directory(self, share, path):
+        try:
+            share.get_directory_client(directory_path=path).create_directory()
+        except ResourceExistsError:
+            pass
+        with self._dirs_lock:
+            self._dirs.add(path)
+
+    def _create_directories(self, share, paths, executor):
+        # Get all the directories and their parents which haven't been created
+        # yet by this object, then try to create them level by level without
+        # checking whether they already exist as this would take an extra
+        # request for each one
+        missing = {}
+        with self._dirs_lock:
+            for path in paths:
+                components = posixpath.normpath(path).split("/")
+                for i in range(1, len(components) + 1):
+                    dir_path = "/".join(components[:i])
+                    if dir_path not in (".", "") and dir_path not in self._dirs:
+                        missing.setdefault(i, set()).add(dir_path)
+        for depth in sorted(missing):
+            list(
+                executor.map(
+                    lambda path: self._create_directory(share, path),
+                    sorted(missing[depth]),
                 )
-                if not directory2.exists():
-                    directory2.create_directory()
-            directoryp.create_directory()
+            )
 
-        return directoryp
+    def _get_directory(self, share, path, executor):
+        self._create_directories(share, [path], executor)
+        return share.get_directory_client(directory_path=path)
+
+    def _upload_file(self, root, src, dst):
+        file_client = root.get_file_client(file_name=dst)
+        with open(src, "rb") as src_file:
+            c_type = "application/octet-stream"
+            if src.endswith(".gz"):
+                c_type = "application/gzip"
+            c_settings = ContentSettings(content_type=c_type)
+            file_client.upload_file(
+                src_file,
+                content_settings=c_settings,
+                max_concurrency=self.config.chunk_concurrency,
+            )
 
     def _upload(self, file_paths, dest_path):
         share = self._service.get_share_client(share=self.config.share)
-        root = self._get_directory(share, dest_path or ".")
         urls = {}
-        dirs = []
-        # if dst include a path, we need to call ._get_directory
-        # to create the directory if it doesn't exist
-        # for example if dst is 'dtb/qcom/apq8016-sbc.dtb'
-        # get list of all directories to create
-        for src, dst in file_paths:
-            dstdir = os.path.dirname(dst)
-            if dstdir and dstdir not in dirs:
-                dirs.append(dstdir)
-        # create all directories
-        for dname in dirs:
-            dstdir = os.path.join(dest_path, dname)
-            self._get_directory(share, dstdir)
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.config.max_concurrency
+        ) as executor:
+            root = self._get_directory(share, dest_path or ".", executor)
+            # if dst include a path, we need to create the directory if it
+            # doesn't exist, for example if dst is 'dtb/qcom/apq8016-sbc.dtb'
+            dirs = {
+                posixpath.join(dest_path, posixpath.dirname(dst))
+                for src, dst in file_paths
+                if posixpath.dirname(dst)
+            }
+            self._create_directories(share, dirs, executor)
+            futures = [
+                executor.submit(self._upload_file, root, src, dst)
+                for src, dst in file_paths
+            ]
+            for future in futures:
+                future.result()
         for src, dst in file_paths:
-            file_client = root.get_file_client(file_name=dst)
-            with open(src, "rb") as src_file:
-                c_type = "application/octet-stream"
-                if src.endswith(".gz"):
-                    c_type = "application/gzip"
-                c_settings = ContentSettings(content_type=c_type)
-                file_client.upload_file(src_file, content_settings=c_settings)
             urls[dst] = (
                 urljoin(
                     self.config.base_url,
@@ -5,26 +5,140 @@
 
 """KernelCI storage implementation for kernelci-backend"""
 
+import os
+import threading
 import time
+import uuid
 from urllib.parse import urljoin
 
 import requests
 
 from . import Storage
 
+# Characters escaped in multipart header parameters, like urllib3 does
+_MULTIPART_ESCAPE = {10: "%0A", 13: "%0D", 34: "%22"}
+
+
+class MultipartStream:
+    """Stream a multipart/form-data request body with files read from disk
+
+    Unlike the `files` argument with requests, the files are read in chunks
+    while the request is being sent so the body is never held in memory.  The
+    total length is computed upfront from the file sizes so the body doesn't
+    need to be sent with chunked encoding.
+
+    *fields* is a dictionary with the form field values
+    *files* is a dictionary with (file name, local path) 2-tuples
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, fields, files):
+        self._boundary = uuid.uuid4().hex
+        self._parts = []
+        for name, value in fields.items():
+            self._parts.append(self._get_header(name))
+            self._parts.append(str(value).encode() + b"\r\n")
+        for name, (file_name, file_path) in files.items():
+            self._parts.append(self._get_header(name, file_name))
+            self._parts.append((file_path, os.path.getsize(file_path)))
+            self._parts.append(b"\r\n")
+        self._parts.append(f"--{self._boundary}--\r\n".encode())
+        self._length = sum(
+            len(part) if isinstance(part, bytes) else part[1]
+            for part in self._parts
+        )
+        self._file_size = sum(
+            part[1] for part in self._parts if isinstance(part, tuple)
+        )
+
+    def _get_header(self, name, file_name=None):
+        disposition = f'form-data; name="{name}"'
+        if file_name is not None:
+            file_name = file_name.translate(_MULTIPART_ESCAPE)
+            disposition += f'; filename="{file_name}"'
+        return (
+            f"--{self._boundary}\r\nContent-Disposition: {disposition}\r\n\r\n"
+        ).encode()
+
+    @property
+    def content_type(self):
+        """Content-Type header value with the multipart boundary"""
+        return f"multipart/form-data; boundary={self._boundary}"
+
+    @property
+    def file_size(self):
+        """Total size of the files in bytes"""
+        return self._file_size
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        for part in self._parts:
+            if isinstance(part, bytes):
+                yield part
+                continue
+            file_path, _ = part
+            with open(file_path, "rb") as part_file:
+                while True:
+                    chunk = part_file.read(self.CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+
 
 class StorageBackend(Storage):
     """Storage implementation for kernelci-backend
 
     This class implements the Storage interface for the kernelci-backend API.
-    It requires an API token as credentials.
+    It requires an API token as credentials.  All the uploads share a pool of
+    HTTP connections, so an instance can be used from several threads.
     """
 
-    def _close_files(self, files):
-        """Helper to close all file handles in the files dictionary."""
-        for file_tuple in files.values():
-            if hasattr(file_tuple[1], "close"):
-                file_tuple[1].close()
+    # Maximum number of connections kept open to the server
+    POOL_SIZE = 16
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    def _connect(self):
+        with self._session_lock:
+            if self._session is not None:
+                return
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=1, pool_maxsize=self.POOL_SIZE
+            )
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._session = session
+
+    def _post(self, path, fields, files, timeout):
+        """Send a streamed multipart POST request and report the throughput"""
+        self._connect()
+        body = MultipartStream(fields, files)
+        headers = {
+            "Authorization": self.credentials,
+            "Content-Type": body.content_type,
+        }
+        start = time.monotonic()
+        resp = self._session.post(
+            urljoin(self.config.api_url, path),
+            headers=headers,
+            data=body,
+            timeout=timeout,
+        )
+        resp.raise_for_status()
+        elapsed = time.monotonic() - start
+        size = body.file_size / (1024 * 1024)
+        print(
+            f"Uploaded {len(files)} file(s), {size:.2f} MiB in {elapsed:.2f}s "
+            f"({size / max(elapsed, 0.001):.2f} MiB/s)"
+        )
+        return resp
 
     def _handle_http_error(self, exc, attempt, max_retries, retry_delay):
         """Handle HTTP errors during upload with retry logic."""
@@ -76,12 +190,13 @@ class StorageBackend(Storage):
         return exc
 
     def _upload(self, file_paths, dest_path):
-        headers = {
-            "Authorization": self.credentials,
-        }
         data = {
             "path": dest_path,
         }
+        files = {
+            f"file{i}": (file_dst, file_src)
+            for i, (file_src, file_dst) in enumerate(file_paths)
+        }
 
         max_retries = 5
         retry_delay = 10  # seconds
@@ -89,20 +204,8 @@ class StorageBackend(Storage):
 
         for attempt in range(max_retries):
             try:
-                # Re-open files for each attempt since they get consumed
-                files = {
-                    f"file{i}": (file_dst, open(file_src, "rb"))
-                    for i, (file_src, file_dst) in enumerate(file_paths)
-                }
-
-                url = urljoin(self.config.api_url, "upload")
-                resp = requests.post(
-                    url, headers=headers, data=data, files=files, timeout=300
-                )
-                resp.raise_for_status()
-
-                # Success - close files and return
-                self._close_files(files)
+                # The files are read again from disk for each attempt
+                self._post("upload", data, files, timeout=300)
                 return
 
             except (
@@ -110,29 +213,15 @@ class StorageBackend(Storage):
                 requests.exceptions.ConnectionError,
                 requests.exceptions.Timeout,
             ) as exc:
-                # Close any open files before retry
-                if "files" in locals():
-                    self._close_files(files)
-
                 last_exception = self._handle_network_error(
                     exc, attempt, max_retries, retry_delay
                 )
 
             except requests.exceptions.HTTPError as exc:
-                # Close any open files before retry
-                if "files" in locals():
-                    self._close_files(files)
-
                 last_exception = self._handle_http_error(
                     exc, attempt, max_retries, retry_delay
                 )
 
-            except Exception:
-                # Close files on any other exception and re-raise
-                if "files" in locals():
-                    self._close_files(files)
-                raise
-
         # If we exhausted all retries, raise the last exception
         if last_exception:
             raise last_exception
@@ -140,12 +229,12 @@ class StorageBackend(Storage):
     def _upload_archive(
         self, archive_path, file_paths, dest_path, archive_name
     ):
-        headers = {
-            "Authorization": self.credentials,
-        }
         data = {
             "path": dest_path,
         }
+        files = {
+            "archive": (archive_name, archive_path),
+        }
 
         max_retries = 5
         retry_delay = 10  # seconds
@@ -153,20 +242,7 @@ class StorageBackend(Storage):
 
         for attempt in range(max_retries):
             try:
-                with open(archive_path, "rb") as archive_file:
-                    files = {
-                        "archive": (archive_name, archive_file),
-                    }
-
-                    url = urljoin(self.config.api_url, "v1/archive")
-                    resp = requests.post(
-                        url,
-                        headers=headers,
-                        data=data,
-                        files=files,
-                        timeout=900,
-                    )
-                    resp.raise_for_status()
+                resp = self._post("v1/archive", data, files, timeout=900)
 
                 try:
                     body = resp.json()
@@ -0,0 +1,226 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+#
+# Copyright (C) 2026 Collabora Limited
+
+"""Content-addressed deduplication layer for KernelCI storage
+
+Files with the same contents get uploaded again for each build, for example
+when rebuilding a stable tree with only a few changes.  DedupStorage wraps any
+other Storage implementation and keeps a manifest index with the SHA-256 digest
+of each uploaded file and its URL.  Files which have already been uploaded with
+the same digest and file name are skipped and the existing URL is returned
+instead.  The index file only gets updated when flush() is called, typically
+once all the artifacts of a build have been uploaded.
+"""
+
+import concurrent.futures
+import fcntl
+import hashlib
+import json
+import os
+import posixpath
+import tempfile
+import threading
+from urllib.parse import urljoin
+
+import requests
+
+from . import Storage
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path):
+    """Get the SHA-256 hex digest of a file by reading it in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as src_file:
+        while True:
+            chunk = src_file.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_files(paths, jobs=None):
+    """Get the SHA-256 hex digests of a list of files in parallel
+
+    The files in *paths* are hashed using up to *jobs* threads, or the number
+    of CPUs by default.  The returned value is a list with the digests in the
+    same order as *paths*.
+    """
+    paths = list(paths)
+    if len(paths) < 2:
+        return [hash_file(path) for path in paths]
+    jobs = min(jobs or os.cpu_count() or 1, len(paths))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(hash_file, paths))
+
+
+class ManifestIndex:
+    """Index of the uploaded file digests stored in a local JSON file
+
+    The *files* dictionary maps each digest to the URLs of the uploaded files
+    with these contents keyed by file name.  The index file can be shared by
+    several processes: it gets read again and merged with the entries added
+    in memory each time it's saved, while holding a lock on a separate .lock
+    file.
+    """
+
+    # Mode of the index file when creating it
+    MODE = 0o644
+
+    def __init__(self, path):
+        """Load the index from the JSON file in *path* if it already exists"""
+        self._path = path
+        self._lock = threading.Lock()
+        self._files = {}
+        self._removed = set()
+        self._merge(self._read())
+
+    @property
+    def path(self):
+        """Path to the JSON index file"""
+        return self._path
+
+    def _read(self):
+        if not os.path.exists(self._path):
+            return {}
+        with open(self._path, encoding="utf-8") as index_file:
+            return json.load(index_file)
+
+    def _merge(self, data):
+        for digest, urls in data.get("files", {}).items():
+            for file_name, url in urls.items():
+                if (digest, file_name) not in self._removed:
+                    self._files.setdefault(digest, {}).setdefault(
+                        file_name, url
+                    )
+
+    def get(self, digest, file_name):
+        """Get the URL of a file with a given digest and name or None"""
+        with self._lock:
+            return self._files.get(digest, {}).get(file_name)
+
+    def add(self, digest, file_name, url):
+        """Add the URL of an uploaded file"""
+        with self._lock:
+            self._files.setdefault(digest, {})[file_name] = url
+            self._removed.discard((digest, file_name))
+
+    def remove(self, digest, file_name):
+        """Remove the URL of a file which isn't available any more"""
+        with self._lock:
+            self._files.get(digest, {}).pop(file_name, None)
+            self._removed.add((digest, file_name))
+
+    def save(self):
+        """Merge the index with the file contents and write it atomically"""
+        index_dir = os.path.dirname(os.path.abspath(self._path))
+        with self._lock, open(f"{self._path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                mode = os.stat(self._path).st_mode & 0o777
+            except FileNotFoundError:
+                mode = self.MODE
+            self._merge(self._read())
+            data = {"files": self._files}
+            with tempfile.NamedTemporaryFile(
+                "w", dir=index_dir, delete=False, encoding="utf-8"
+            ) as index_file:
+                json.dump(data, index_file, indent=2)
+            os.chmod(index_file.name, mode)
+            os.replace(index_file.name, self._path)
+
+
+class DedupStorage(Storage):
+    """Storage wrapper skipping the files which have already been uploaded"""
+
+    def __init__(self, storage, index, verify=True, jobs=None):
+        """Deduplicate the uploads of another Storage object
+
+        *storage* is the Storage object used to upload the files
+        *index* is a ManifestIndex object or the path to its JSON file
+        *verify* is whether to check with an HTTP HEAD request that an already
+                 uploaded file is still available on the storage server
+        *jobs* is the number of threads used to hash the files
+        """
+        super().__init__(storage.config, storage.credentials)
+        self._storage = storage
+        if not isinstance(index, ManifestIndex):
+            index = ManifestIndex(index)
+        self._index = index
+        self._verify = verify
+        self._jobs = jobs
+
+    @property
+    def storage(self):
+        """Storage object used to upload the files"""
+        return self._storage
+
+    @property
+    def index(self):
+        """ManifestIndex object with the uploaded file digests"""
+        return self._index
+
+    def _get_url(self, dest_path, file_dst):
+        return urljoin(
+            self.config.base_url, "/".join([".", dest_path, file_dst])
+        )
+
+    def _is_available(self, url):
+        if not self._verify:
+            return True
+        try:
+            resp = requests.head(url, allow_redirects=True, timeout=30)
+        except requests.exceptions.RequestException:
+            return False
+        return resp.ok
+
+    def _lookup(self, digest, file_name):
+        url = self._index.get(digest, file_name)
+        if url and not self._is_available(url):
+            self._index.remove(digest, file_name)
+            return None
+        return url
+
+    def _connect(self):
+        self._storage._connect()
+
+    def _upload(self, file_paths, dest_path):
+        file_paths = list(file_paths)
+        digests = hash_files(
+            (file_src for file_src, _ in file_paths), self._jobs
+        )
+        urls = {}
+        uploads = []
+        for (file_src, file_dst), digest in zip(file_paths, digests):
+            file_name = posixpath.basename(file_dst)
+            existing_url = self._lookup(digest, file_name)
+            if existing_url:
+                print(f"Skipping upload of {file_dst}, already in storage")
+                urls[file_dst] = existing_url
+            else:
+                uploads.append(((file_src, file_dst), digest))
+        if uploads:
+            upload_paths = [file_path for file_path, _ in uploads]
+            upload_urls = self._storage._upload(upload_paths, dest_path) or {}
+            for (_, file_dst), digest in uploads:
+                url = upload_urls.get(file_dst) or self._get_url(
+                    dest_path, file_dst
+                )
+                urls[file_dst] = url
+                self._index.add(digest, posixpath.basename(file_dst), url)
+        return urls
+
+    def flush(self):
+        """Save the index with the files uploaded so far"""
+        self._storage.flush()
+        self._index.save()
+
+    def _upload_archive(
+        self, archive_path, file_paths, dest_path, archive_name
+    ):
+        return self._storage._upload_archive(
+            archive_path, file_paths, dest_path, archive_name
+        )
@@ -0,0 +1,122 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+#
+# Copyright (C) 2026 Collabora Limited
+
+"""Unit tests for KernelCI API asyncio bindings"""
+
+import asyncio
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+import kernelci.api.aio
+import kernelci.config.api
+
+
+async def _run_with_server(test_coro):
+    """Run a test coroutine against a local fake API server"""
+    nodes = {str(node_id): {"id": str(node_id)} for node_id in range(250)}
+    requests = {"count": 0, "failures": 1}
+
+    async def get_node(request):
+        requests["count"] += 1
+        node = nodes.get(request.match_info["node_id"])
+        if node is None:
+            return web.json_response({"detail": "Not found"}, status=404)
+        return web.json_response(node)
+
+    async def get_nodes(request):
+        offset = int(request.query["offset"])
+        limit = int(request.query["limit"])
+        items = list(nodes.values())[offset : offset + limit]
+        return web.json_response({"items": items})
+
+    async def post_node(request):
+        if requests["failures"]:
+            requests["failures"] -= 1
+            return web.json_response({}, status=503)
+        node = await request.json()
+        node["id"] = "new"
+        return web.json_response(node)
+
+    app = web.Application()
+    app.router.add_get("/latest/node/{node_id}", get_node)
+    app.router.add_get("/latest/nodes", get_nodes)
+    app.router.add_post("/latest/node", post_node)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    config = kernelci.config.api.API("test", f"http://127.0.0.1:{port}")
+    try:
+        async with kernelci.api.aio.get_api(config) as api:
+            await test_coro(api, requests)
+    finally:
+        await runner.cleanup()
+
+
+def test_aio_node_get_many():
+    """Test bulk node.get with bounded concurrency"""
+
+    async def _test(api, requests):
+        node_ids = [str(node_id) for node_id in range(100, 0, -1)]
+        nodes = await api.node.get_many(node_ids, concurrency=8)
+        assert [node["id"] for node in nodes] == node_ids
+        assert requests["count"] == 100
+
+    asyncio.run(_run_with_server(_test))
+
+
+def test_aio_node_find_paginated():
+    """Test paginated node.find"""
+
+    async def _test(api, _):
+        nodes = await api.node.find({})
+        assert len(nodes) == 250
+        nodes = await api.node.find({}, offset=10, limit=5)
+        assert [node["id"] for node in nodes] == ["10", "11", "12", "13", "14"]
+
+    asyncio.run(_run_with_server(_test))
+
+
+def test_aio_node_add_retry():
+    """Test that POST requests are retried on server errors"""
+
+    async def _test(api, requests):
+        node = await api.node.add({"name": "checkout"})
+        assert node == {"name": "checkout", "id": "new"}
+        assert requests["failures"] == 0
+
+    asyncio.run(_run_with_server(_test))
+
+
+def test_aio_http_error():
+    """Test that HTTP errors include a snippet of the response body"""
+
+    async def _test(api, _):
+        with pytest.raises(aiohttp.ClientResponseError) as exc:
+            await api.node.get("missing")
+        assert exc.value.status == 404
+        assert "body=Not found" in exc.value.message
+
+    asyncio.run(_run_with_server(_test))
+
+
+def test_aio_gather_concurrency():
+    """Test that gather() never exceeds the concurrency limit"""
+    running = {"now": 0, "max": 0}
+
+    async def _task(value):
+        running["now"] += 1
+        running["max"] = max(running["max"], running["now"])
+        await asyncio.sleep(0.001)
+        running["now"] -= 1
+        return value
+
+    results = asyncio.run(
+        kernelci.api.aio.gather((_task(i) for i in range(50)), 4)
+    )
+    assert results == list(range(50))
+    assert running["max"] == 4
@@ -12,6 +12,7 @@ import kernelci.api
 import kernelci.api.helper
 import kernelci.api.latest
 import kernelci.config
+import kernelci.config.api
 
 from .conftest import APIHelperTestData
 
@@ -284,3 +285,92 @@ def test_prepare_results(get_api_config, mock_api_get_node_from_id):
             "result",
             "state",
         }
+
+
+def test_api_config_retries():
+    """Test the per-method retry policy in the API configuration"""
+    config = kernelci.config.api.API(
+        "test", "http://localhost", retries={"post": 0, "GET": 2}
+    )
+    assert config.retries == {
+        "GET": 2,
+        "POST": 0,
+        "PUT": 5,
+        "PATCH": 5,
+        "DELETE": 5,
+    }
+    assert config.pool_size == 10
+    assert config.keep_alive is True
+
+
+def test_api_session_pool(get_api_config):
+    """Test that all the API bindings share one persistent HTTP session"""
+    for _, api_config in get_api_config.items():
+        api = kernelci.api.get_api(api_config)
+        session = api.data.session("GET")
+        assert api.node.data.session("GET") is session
+        assert api.user.data.session("GET") is session
+        assert api.data.session("POST") is not session
+        post_adapter = api.data.session("POST").get_adapter(api_config.url)
+        get_adapter = session.get_adapter(api_config.url)
+        assert post_adapter.poolmanager is get_adapter.poolmanager
+        assert get_adapter.max_retries.total == api_config.retries["GET"]
+        assert api.data.pool_stats() == {
+            "requests": 0,
+            "connections_opened": 0,
+            "connections_reused": 0,
+        }
+        api.data.close()
+        assert api.data.session("GET") is not session
+
+
+def _mock_paginated_get(total):
+    """Get a mock for Base._get serving `total` items with pagination"""
+
+    def _get(path, params=None):
+        offset, limit = params["offset"], params["limit"]
+        items = [
+            {"id": str(i)} for i in range(offset, min(offset + limit, total))
+        ]
+        resp = Mock()
+        resp.json.return_value = {
+            "items": items,
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+        }
+        return resp
+
+    return Mock(side_effect=_get)
+
+
+def test_node_find_paginated(get_api_config, monkeypatch):
+    """Test sequential pagination in node.find"""
+    mock_get = _mock_paginated_get(250)
+    monkeypatch.setattr(kernelci.api.Base, "_get", mock_get)
+    for _, api_config in get_api_config.items():
+        api = kernelci.api.get_api(api_config)
+        nodes = api.node.find({"kind": "test"})
+        assert [node["id"] for node in nodes] == [str(i) for i in range(250)]
+        assert mock_get.call_count == 3
+        break
+
+
+def test_node_iter_find_prefetch(get_api_config, monkeypatch):
+    """Test streaming pagination with parallel page prefetching"""
+    mock_get = _mock_paginated_get(1000)
+    monkeypatch.setattr(kernelci.api.Base, "_get", mock_get)
+    for _, api_config in get_api_config.items():
+        api = kernelci.api.get_api(api_config)
+        nodes = api.node.iter_find({"kind": "test"}, page_size=64, prefetch=4)
+        assert next(nodes) == {"id": "0"}
+        assert [node["id"] for node in nodes] == [
+            str(i) for i in range(1, 1000)
+        ]
+        offsets = sorted(
+            call.kwargs["params"]["offset"] for call in mock_get.call_args_list
+        )
+        assert offsets == list(range(0, 1000, 64))
+        events = api.telemetry.find({}, page_size=500, prefetch=2)
+        assert len(events) == 1000
+        break
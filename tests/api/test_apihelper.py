@@ -5,8 +5,13 @@
 
 """Test the APIHelper class"""
 
+import types
+
+import requests
+
 import kernelci.api
 from kernelci.api.helper import APIHelper
+from kernelci.config.rules import compile_rules
 
 
 def test_apihelper():
@@ -93,3 +98,251 @@ def test_apihelper():
         "Reviewed-by: Alexandre Chartre \n"
         "Signed-off-by: Linus Torvalds "
     )
+
+
+def test_apihelper_node_cache(get_api_config, mocker):
+    """Test that ancestor nodes are cached when evaluating rules"""
+    checkout = {
+        "id": "checkout-id",
+        "parent": None,
+        "data": {"kernel_revision": {"tree": "mainline", "branch": "master"}},
+    }
+    kbuild = {"id": "kbuild-id", "parent": "checkout-id", "data": {}}
+    nodes = {node["id"]: node for node in (checkout, kbuild)}
+    mock_get = mocker.patch(
+        "kernelci.api.latest.LatestAPI.Node.get",
+        side_effect=lambda node_id: nodes[node_id],
+    )
+    rules = {"tree": ["mainline"], "branch": ["master"]}
+    for _, api_config in get_api_config.items():
+        api = kernelci.api.get_api(api_config)
+        helper = APIHelper(api)
+        job_node = {"parent": "kbuild-id", "data": {}}
+        for _ in range(3):
+            assert helper.should_create_node(rules, job_node) is True
+        assert mock_get.call_count == 2
+        assert helper.node_cache.stats == {"hits": 4, "misses": 2}
+        helper.node_cache.invalidate("checkout-id")
+        assert helper.should_create_node(rules, job_node) is True
+        assert mock_get.call_count == 3
+        break
+
+
+def test_apihelper_compiled_rules(get_api_config, mocker):
+    """Test node creation rules compiled with compile_rules()"""
+    checkout = {
+        "id": "checkout-id",
+        "parent": None,
+        "data": {
+            "kernel_revision": {
+                "tree": "stable",
+                "branch": "linux-6.1.y",
+                "version": {"version": 6, "patchlevel": 1},
+            }
+        },
+    }
+    kbuild = {
+        "id": "kbuild-id",
+        "parent": "checkout-id",
+        "data": {"arch": "arm64", "fragments": ["kselftest"]},
+    }
+    nodes = {node["id"]: node for node in (checkout, kbuild)}
+    mocker.patch(
+        "kernelci.api.latest.LatestAPI.Node.get",
+        side_effect=lambda node_id: nodes[node_id],
+    )
+    job_node = {
+        "parent": "kbuild-id",
+        "data": {"kernel_revision": checkout["data"]["kernel_revision"]},
+    }
+    cases = [
+        ({"tree": ["linus:master", "stable"]}, True),
+        ({"tree": ["!stable:linux-6.1.y", "stable"]}, False),
+        ({"tree": ["mainline:master"]}, False),
+        ({"branch": ["!linux-6.1.y"]}, False),
+        ({"arch": ["arm64", "!arm"]}, True),
+        ({"arch": ["x86_64"]}, False),
+        ({"fragments": ["!kselftest"]}, False),
+        ({"fragments": ["kselftest", "!arm64-chromebook"]}, True),
+        ({"defconfig": ["!allnoconfig"]}, True),
+        ({"defconfig": ["defconfig"]}, False),
+        ({"min_version": {"version": 6, "patchlevel": 6}}, False),
+        ({"max_version": {"version": 6, "patchlevel": 6}}, True),
+    ]
+    for _, api_config in get_api_config.items():
+        api = kernelci.api.get_api(api_config)
+        helper = APIHelper(api)
+        for rules, expected in cases:
+            compiled = compile_rules(rules)
+            assert helper.should_create_node(compiled, job_node) is expected
+            assert helper.should_create_node(rules, job_node) is expected
+        break
+
+
+def _json_response(data):
+    """Build a minimal response object with a json() method"""
+    return type("Response", (), {"json": lambda self: data})()
+
+
+def _fake_put_hierarchy(requests):
+    """Fake PUT nodes/{id} endpoint creating the nodes without an id"""
+    counter = iter(range(1, 1000000))
+
+    def put(path, data):
+        if path.startswith("node/"):
+            assert path == f"node/{data['id']}"
+            requests.append(data)
+            return _json_response(data)
+        assert path == f"nodes/{data['node']['id']}"
+        requests.append(data)
+        nodes = []
+        items = [(data, data["node"].get("parent"))]
+        while items:
+            item, parent_id = items.pop(0)
+            node = dict(item["node"], parent=parent_id)
+            node.setdefault("id", f"node-{next(counter)}")
+            nodes.append(node)
+            items.extend((child, node["id"]) for child in item["child_nodes"])
+        return _json_response(nodes)
+
+    return put
+
+
+def test_apihelper_submit_results_chunked(get_api_config, mocker):
+    """Test submitting a hierarchy of results in several chunks"""
+    root = {
+        "id": "job-id",
+        "parent": "kbuild-id",
+        "name": "kselftest",
+        "kind": "job",
+        "path": ["checkout", "kbuild", "kselftest"],
+        "data": {},
+        "artifacts": {},
+    }
+
+    def _result(name, child_nodes=()):
+        return {
+            "node": {"name": name, "result": "pass"},
+            "child_nodes": list(child_nodes),
+        }
+
+    suites = [
+        _result(
+            f"suite-{suite}",
+            [_result(f"case-{case}") for case in range(7)]
+            + [_result("set", [_result(f"sub-{sub}") for sub in range(4)])],
+        )
+        for suite in range(3)
+    ]
+    results = dict(_result("kselftest", suites))
+    results["node"]["artifacts"] = {}
+    mocker.patch(
+        "kernelci.api.latest.LatestAPI.Node.get",
+        return_value={"id": "kbuild-id", "path": ["checkout", "kbuild"]},
+    )
+    for _, api_config in get_api_config.items():
+        api = kernelci.api.get_api(api_config)
+        helper = APIHelper(api)
+        requests = []
+        mocker.patch.object(
+            api, "_put", side_effect=_fake_put_hierarchy(requests)
+        )
+        nodes = helper.submit_results(results, root, chunk_size=5)
+        break
+    # 3 suites with 7 cases and 1 set with 4 sub-tests each
+    assert len(nodes) == 1 + 3 * (1 + 7 + 1 + 4)
+    paths = [tuple(node["path"]) for node in nodes]
+    assert len(set(paths)) == len(paths)
+    by_id = {node["id"]: node for node in nodes}
+    for node in nodes[1:]:
+        parent = by_id[node["parent"]]
+        assert parent["path"] == node["path"][:-1]
+    # The root node is only done once all the child nodes have been sent
+    assert requests[0]["node"]["state"] == "running"
+    assert requests[0]["node"]["result"] is None
+    assert all("node" in request for request in requests[:-1])
+    assert requests[-1]["id"] == "job-id"
+    assert requests[-1]["state"] == "done"
+    assert requests[-1]["result"] == "pass"
+    assert nodes[0]["state"] == "done"
+    sizes = []
+    for request in requests[:-1]:
+        items = list(request["child_nodes"])
+        size = 0
+        while items:
+            item = items.pop()
+            size += 1
+            items.extend(item["child_nodes"])
+        sizes.append(size)
+    assert max(sizes) == 5
+    assert sum(sizes) == len(nodes) - 1
+
+
+def test_apihelper_create_job_nodes(get_api_config, mocker):
+    """Test creating several job nodes in parallel"""
+    input_node = {
+        "id": "kbuild-id",
+        "parent": None,
+        "path": ["checkout", "kbuild"],
+        "jobfilter": [
+            "baseline",
+            "baseline-x86",
+            "kselftest",
+            "ltp",
+            "tast",
+        ],
+        "data": {
+            "kernel_revision": {"version": {"version": 6, "patchlevel": 1}},
+            "arch": "arm64",
+        },
+    }
+
+    def _job(name):
+        return types.SimpleNamespace(
+            name=name, kind="job", compiled_rules=None, params={}
+        )
+
+    platform = types.SimpleNamespace(
+        name="qemu",
+        compiled_rules=None,
+        format_params=lambda data, extra_args: data,
+    )
+
+    def _add(node):
+        if node["name"] == "kselftest":
+            raise requests.exceptions.ConnectionError("connection refused")
+        if node["name"] == "baseline-x86":
+            response = requests.Response()
+            response.status_code = 502
+            response._content = b"<html>Bad Gateway</html>"
+            raise requests.exceptions.HTTPError(response=response)
+        if node["name"] == "ltp":
+            response = requests.Response()
+            response.status_code = 500
+            response._content = b'{"detail": "error"}'
+            raise requests.exceptions.HTTPError(response=response)
+        return dict(node, id=f"{node['name']}-id")
+
+    mocker.patch("kernelci.api.latest.LatestAPI.Node.add", side_effect=_add)
+    jobs = [
+        (_job("baseline"), None, platform),
+        (_job("kunit"), None, None),
+        (_job("ltp"), None, platform),
+        (_job("kselftest"), None, platform),
+        (_job("tast"), None, platform),
+        (_job("baseline-x86"), None, platform),
+    ]
+    for _, api_config in get_api_config.items():
+        api = kernelci.api.get_api(api_config)
+        helper = APIHelper(api)
+        outcomes = helper.create_job_nodes(input_node, jobs, concurrency=2)
+        break
+    assert outcomes[0]["id"] == "baseline-id"
+    assert outcomes[0]["data"]["platform"] == "qemu"
+    assert outcomes[0]["path"] == ["checkout", "kbuild", "baseline"]
+    assert outcomes[1] is None
+    assert isinstance(outcomes[2], RuntimeError)
+    # Other errors are reported without losing the other outcomes
+    assert isinstance(outcomes[3], requests.exceptions.ConnectionError)
+    assert outcomes[4]["id"] == "tast-id"
+    assert isinstance(outcomes[5], ValueError)
@@ -9,13 +9,22 @@
 """Unit test for KernelCI YAML config handling"""
 
 import copy
+import datetime
+import os
+import pickle
+import time
 
 import pytest
 import yaml
 from pydantic import ValidationError
 
 import kernelci.config
+import kernelci.config.base
 import kernelci.config.build
+import kernelci.config.job
+import kernelci.config.platform
+import kernelci.config.runtime
+import kernelci.config.watcher
 
 # -----------------------------------------------------------------------------
 # Legacy
@@ -49,6 +58,223 @@ def test_architecture_init_name_only():
     assert len(architecture._filters) == 0
 
 
+def test_filters():
+    """Test the compiled and cached configuration filters"""
+    filters = kernelci.config.base.FilterFactory.load_from_yaml(
+        [
+            {"blocklist": {"defconfig": ["allmodconfig", "LPAE"]}},
+            {"passlist": {"plan": ["baseline", "kselftest"]}},
+            {"combination": {"keys": ["tree", "branch"], "values": []}},
+        ]
+    )
+    blocklist, passlist, combination = filters
+    params = {"defconfig": "multi_v7_defconfig", "plan": "baseline-nfs"}
+    assert blocklist.match(**params)
+    assert not blocklist.match(defconfig="multi_v7_defconfig+CONFIG_LPAE=y")
+    assert blocklist.match(defconfig="LPA")
+    assert passlist.match(**params)
+    assert not passlist.match(plan="sleep")
+    assert not passlist.match(defconfig="defconfig")
+    assert not combination.match(tree="mainline", branch="master")
+    # Combining filters resets the cached results
+    combination.combine(
+        {"keys": ["tree", "branch"], "values": [["mainline", "master"]]}
+    )
+    assert combination.match(tree="mainline", branch="master")
+    blocklist.combine({"defconfig": ["multi_v7"]})
+    assert not blocklist.match(**params)
+    params.update({"tree": "mainline", "branch": "master"})
+    assert not kernelci.config.base.match_filters(filters, params)
+    params["defconfig"] = "defconfig"
+    assert kernelci.config.base.match_filters(filters, params)
+    assert kernelci.config.base.match_filters([], params)
+
+
+def test_load_yaml_snapshot(tmp_path, monkeypatch):
+    """Test the YAML config snapshot cache"""
+    config_dir = tmp_path / "config"
+    config_dir.mkdir()
+    jobs = config_dir / "jobs.yaml"
+    jobs.write_text("jobs:\n  baseline:\n    template: baseline.jinja2\n")
+    (config_dir / "platforms.yaml").write_text("platforms:\n  qemu: {}\n")
+    cache_dir = tmp_path / "cache"
+    data = kernelci.config.load_yaml(str(config_dir), cache_dir=str(cache_dir))
+    assert data == kernelci.config.load_yaml(str(config_dir))
+    assert len(list(cache_dir.iterdir())) == 1
+
+    load_single_yaml = kernelci.config.load_single_yaml
+    loaded = []
+
+    def _load_single_yaml(config_path):
+        loaded.append(config_path)
+        return load_single_yaml(config_path)
+
+    monkeypatch.setattr(kernelci.config, "load_single_yaml", _load_single_yaml)
+    # Warm start, and modified time changed but not the contents
+    for _ in range(2):
+        assert (
+            kernelci.config.load_yaml(str(config_dir), cache_dir=str(cache_dir))
+            == data
+        )
+        os.utime(jobs, ns=(0, 0))
+    assert not loaded
+    # Stale snapshot
+    jobs.write_text("jobs:\n  kunit:\n    template: kunit.jinja2\n")
+    data = kernelci.config.load_yaml(str(config_dir), cache_dir=str(cache_dir))
+    assert list(data["jobs"]) == ["kunit"]
+    assert loaded == [str(config_dir)]
+    assert len(list(cache_dir.iterdir())) == 1
+
+
+class _Exploit:
+    """Object running a function when unpickled"""
+
+    def __reduce__(self):
+        return (print, ("exploited",))
+
+
+def test_load_yaml_snapshot_invalid(tmp_path, monkeypatch, capsys):
+    """Test that invalid or unsafe snapshots are replaced"""
+    config_dir = tmp_path / "config"
+    config_dir.mkdir()
+    (config_dir / "jobs.yaml").write_text(
+        "jobs:\n  baseline:\n    date: 2026-01-01\n"
+    )
+    cache_dir = tmp_path / "cache"
+    data = kernelci.config.load_yaml(str(config_dir), cache_dir=str(cache_dir))
+    assert data["jobs"]["baseline"]["date"] == datetime.date(2026, 1, 1)
+    (snapshot_path,) = cache_dir.iterdir()
+    snapshot = pickle.loads(snapshot_path.read_bytes())
+    unsafe = dict(snapshot, data=_Exploit())
+    for contents in [
+        b"garbage",
+        b"",
+        pickle.dumps(["stats", "hashes", "data"]),
+        pickle.dumps({"stats": None}),
+        pickle.dumps(unsafe),
+    ]:
+        snapshot_path.write_bytes(contents)
+        assert (
+            kernelci.config.load_yaml(str(config_dir), cache_dir=str(cache_dir))
+            == data
+        )
+        assert pickle.loads(snapshot_path.read_bytes()) == snapshot
+    assert "exploited" not in capsys.readouterr().out
+    # Snapshots writable by other users are not loaded
+    snapshot_path.write_bytes(pickle.dumps(dict(snapshot, data={})))
+    snapshot_path.chmod(0o666)
+    assert (
+        kernelci.config.load_yaml(str(config_dir), cache_dir=str(cache_dir))
+        == data
+    )
+    assert "Ignoring unsafe config snapshot" in capsys.readouterr().out
+    monkeypatch.setenv("KCI_CONFIG_JOBS", "many")
+    with pytest.raises(ValueError, match="KCI_CONFIG_JOBS"):
+        kernelci.config.load_yaml(str(config_dir))
+
+
+def test_load_yaml_parallel(monkeypatch):
+    """Test parsing the YAML config files in a process pool"""
+    monkeypatch.setattr(os, "cpu_count", lambda: 2)
+    config_paths = ["tests/configs", "config/core"]
+    data = kernelci.config.load_yaml(config_paths)
+    parallel = kernelci.config.load_yaml(config_paths, jobs=2)
+    assert yaml.dump(parallel, sort_keys=False) == yaml.dump(
+        data, sort_keys=False
+    )
+    timings = {}
+    assert not kernelci.config.validate_yaml(
+        config_paths, ["jobs"], jobs=2, timings=timings
+    )
+    assert list(timings) == [
+        yaml_path
+        for config_path in config_paths
+        for yaml_path in kernelci.config.iterate_yaml_paths(config_path)
+    ]
+
+
+def test_config_watcher(tmp_path, monkeypatch):
+    """Test reloading the YAML config files when they change"""
+    config_dir = tmp_path / "config"
+    config_dir.mkdir()
+    (config_dir / "jobs.yaml").write_text(
+        "jobs:\n  baseline:\n    template: baseline.jinja2\n"
+    )
+    platforms = config_dir / "platforms.yaml"
+    platforms.write_text("platforms:\n  qemu:\n    arch: x86_64\n")
+    watcher = kernelci.config.watcher.ConfigWatcher(
+        str(config_dir), interval=0.05
+    )
+    config = watcher.config
+    assert list(config["platforms"]) == ["qemu"]
+    iterate_yaml_files = kernelci.config.watcher.iterate_yaml_files
+    parsed = []
+
+    def _iterate_yaml_files(config_path):
+        parsed.append(config_path)
+        return iterate_yaml_files(config_path)
+
+    monkeypatch.setattr(
+        kernelci.config.watcher, "iterate_yaml_files", _iterate_yaml_files
+    )
+    reloads = []
+    watcher.add_callback(lambda *args: reloads.append(args))
+    assert not watcher.check()
+    platforms.write_text("platforms:\n  qemu: {}\n  rpi4:\n    arch: arm64\n")
+    assert watcher.check() == [str(platforms)]
+    assert parsed == [str(platforms)]
+    assert list(watcher.config["platforms"]) == ["qemu", "rpi4"]
+    assert watcher.config["jobs"]["baseline"].template == "baseline.jinja2"
+    assert reloads == [(watcher.config, [str(platforms)])]
+    # Broken files are only parsed again once modified
+    platforms.write_text("platforms: [\n")
+    with pytest.raises(yaml.YAMLError):
+        watcher.check()
+    assert not watcher.check()
+    assert list(watcher.config["platforms"]) == ["qemu", "rpi4"]
+    watcher.start()
+    try:
+        platforms.write_text("platforms:\n  juno: {}\n")
+        for _ in range(100):
+            if list(watcher.config["platforms"]) == ["juno"]:
+                break
+            time.sleep(0.02)
+        assert list(watcher.config["platforms"]) == ["juno"]
+    finally:
+        watcher.stop()
+    assert len(reloads) == 2
+
+
+def test_load_lazy(monkeypatch):
+    """Test creating the configuration objects on first access"""
+    config = kernelci.config.load("tests/configs", lazy=True)
+    eager = kernelci.config.load("tests/configs")
+    assert list(config) == list(eager)
+    for section, objects in eager.items():
+        if isinstance(objects, dict):
+            assert list(config[section]) == list(objects)
+            assert yaml.dump(dict(config[section])) == yaml.dump(objects)
+        else:
+            assert yaml.dump(config[section]) == yaml.dump(objects)
+    config = kernelci.config.load("tests/configs", lazy=True)
+    assert config["storage"] is config["storage_configs"]
+    from_yaml = kernelci.config.runtime.RuntimeFactory.from_yaml
+    loaded = []
+
+    def _from_yaml(name, runtime, default_filters):
+        loaded.append(name)
+        return from_yaml(name, runtime, default_filters)
+
+    monkeypatch.setattr(
+        kernelci.config.runtime.RuntimeFactory, "from_yaml", _from_yaml
+    )
+    runtime = config["runtimes"]["lab-baylibre"]
+    assert config["runtimes"]["lab-baylibre"] is runtime
+    assert "docker" in config["runtimes"]
+    assert loaded == ["lab-baylibre"]
+    assert runtime.url == eager["runtimes"]["lab-baylibre"].url
+
+
 class ConfigTest:
     """Base class with helpers for all YAML configuration tests"""
 
@@ -304,6 +530,40 @@ jobs:
         assert config["jobs"]["example"].template == "kbuild.jinja2"
         assert config["jobs"]["example"].priority == 50
 
+    def test_format_params(self):
+        """Format parameters with platform attributes and extra arguments."""
+        platform = kernelci.config.platform.Platform(
+            "qemu-arm", arch="arm", mach="qemu"
+        )
+        data = {
+            "plain": "no placeholders",
+            "kernel": "{karch}/{mach}/{krev}",
+            "rootfs": "{debarch}/{missing}",
+            "escaped": "{{arch}}",
+            "broken": "{arch:d}",
+            "nested": {"dtb": "{arch}.dtb", "count": 3},
+        }
+        for _ in range(2):
+            params = platform.format_params(
+                copy.deepcopy(data), {"krev": "6.1"}
+            )
+            assert params == {
+                "plain": "no placeholders",
+                "kernel": "arm/qemu/6.1",
+                "rootfs": "{debarch}/{missing}",
+                "escaped": "{arch}",
+                "broken": "{arch:d}",
+                "nested": {"dtb": "arm.dtb", "count": 3},
+            }
+        params = platform.format_params(
+            {"arch": "{debarch}"}, {"arch": "x86_64"}
+        )
+        assert params == {"arch": "amd64"}
+        job = kernelci.config.job.Job("example", "kbuild.jinja2", image="old")
+        assert job.format_params({"image": "{image}"}) == {"image": "old"}
+        job.image = "new"
+        assert job.format_params({"image": "{image}"}) == {"image": "new"}
+
 
 class TestAPIConfigs(ConfigTest):
     """Tests for configs related to the KernelCI API"""
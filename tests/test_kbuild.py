@@ -3,10 +3,15 @@
 
 import json
 import os
+import shutil
 import sys
 import types
 
+import pytest
+
+import kernelci.kbuild
 from kernelci.kbuild import KBuild
+from kernelci.storage import Storage
 
 
 def _kbuild(tmp_path, compiler="clang-21", arch="x86_64"):
@@ -25,6 +30,8 @@ def _kbuild(tmp_path, compiler="clang-21", arch="x86_64"):
     kbuild._steps = []
     kbuild._artifacts = []
     kbuild._current_job = None
+    kbuild._compression = {}
+    kbuild._compression_stats = {}
     os.makedirs(kbuild._af_dir)
     return kbuild
 
@@ -110,15 +117,28 @@ class TestKselftestSuiteResults:
         ]
 
 
-class FakeStorage:
+class FakeStorage(Storage):
+    BATCH_SIZE = 1024
+
     def __init__(self):
+        super().__init__(
+            types.SimpleNamespace(base_url="https://storage.test/"), None
+        )
         self.single_uploads = []
         self.archive_uploads = []
+        self.batch_uploads = []
+        self.flushes = 0
+
+    def _upload(self, file_paths, dest_path):
+        self.batch_uploads.append((list(file_paths), dest_path))
 
     def upload_single(self, file_path, dest_path=""):
         self.single_uploads.append((file_path, dest_path))
         return f"https://storage.test/{dest_path}/{file_path[1]}"
 
+    def flush(self):
+        self.flushes += 1
+
     def upload_archive(
         self, archive_path, file_paths, dest_path="", archive_name=None
     ):
@@ -149,6 +169,7 @@ class TestUploadArtifacts:
         node_af = kbuild.upload_artifacts()
 
         assert storage.single_uploads == []
+        assert storage.flushes == 1
         assert len(storage.archive_uploads) == 1
         archive_path, file_paths, dest_path, archive_name = (
             storage.archive_uploads[0]
@@ -197,6 +218,125 @@ class TestUploadArtifacts:
         ]
         assert node_af["dtbs/board-a_dtb"].endswith("dtbs/board-a.dtb")
 
+    def test_small_artifacts_are_batched(self, tmp_path):
+        kbuild = _kbuild(tmp_path)
+        kbuild._backend = "make"
+        af_dir = tmp_path / "artifacts"
+        kbuild._artifacts = ["bzImage", "vmlinux", "kernel.config"]
+        (af_dir / "bzImage").write_bytes(os.urandom(4096))
+        (af_dir / "vmlinux").write_bytes(os.urandom(4096))
+        (af_dir / "kernel.config").write_text("CONFIG_X=y\n")
+        for index in range(5):
+            kbuild._artifacts.append(f"build-{index}.log")
+            (af_dir / f"build-{index}.log").write_text("build log\n" * 100)
+
+        storage = FakeStorage()
+        kbuild._get_storage = lambda: storage
+        kbuild._apijobname = "kbuild-gcc-x86"
+        kbuild._node = {"id": "node123", "data": {}}
+        kbuild._full_artifacts = {}
+
+        node_af = kbuild.upload_artifacts()
+
+        assert storage.single_uploads == []
+        uploads = sorted(
+            sorted(file_dst for _file_src, file_dst in file_paths)
+            for file_paths, _dest_path in storage.batch_uploads
+        )
+        # The compressed artifacts are uploaded after the other ones
+        assert uploads == [
+            ["build-0.log.gz", "build-1.log.gz", "build-2.log.gz"]
+            + ["build-3.log.gz", "build-4.log.gz"],
+            ["bzImage"],
+            ["kernel.config"],
+            ["vmlinux.xz"],
+        ]
+        assert node_af["kernel"] == (
+            "https://storage.test/kbuild-gcc-x86-node123/bzImage"
+        )
+        assert node_af["build-0_log"].endswith("/build-0.log.gz")
+        assert len(kbuild._full_artifacts) == 8
+        assert not list(af_dir.glob("*.gz"))
+        assert not list(af_dir.glob("*.xz"))
+
+    @pytest.mark.skipif(not shutil.which("zstd"), reason="zstd not found")
+    def test_compression_settings(self, tmp_path):
+        kbuild = _kbuild(tmp_path)
+        kbuild._backend = "make"
+        kbuild._compression = {"vmlinux": "zstd:3", "logs": "none"}
+        kbuild._check_compression()
+        af_dir = tmp_path / "artifacts"
+        kbuild._artifacts = ["vmlinux", "build.log"]
+        (af_dir / "vmlinux").write_bytes(b"\0" * 100000)
+        (af_dir / "build.log").write_text("build log\n")
+
+        storage = FakeStorage()
+        kbuild._get_storage = lambda: storage
+        kbuild._apijobname = "kbuild-gcc-x86"
+        kbuild._node = {"id": "node123", "data": {}}
+        kbuild._full_artifacts = {}
+
+        node_af = kbuild.upload_artifacts()
+
+        assert node_af["vmlinux"].endswith("/vmlinux.zst")
+        assert node_af["build_log"].endswith("/build.log")
+        stats = kbuild._compression_stats
+        assert list(stats) == ["vmlinux"]
+        assert stats["vmlinux"]["codec"] == "zstd"
+        assert stats["vmlinux"]["level"] == 3
+        assert stats["vmlinux"]["size"] == 100000
+        assert stats["vmlinux"]["compressed_size"] < 1000
+        assert stats["vmlinux"]["time"] >= 0
+
+    def test_invalid_compression_codec(self, tmp_path):
+        kbuild = _kbuild(tmp_path)
+        kbuild._compression = {"vmlinux": "lz4"}
+        with pytest.raises(ValueError, match="lz4"):
+            kbuild._check_compression()
+
+    def test_invalid_compression_level(self, tmp_path):
+        kbuild = _kbuild(tmp_path)
+        kbuild._compression = {"vmlinux": "xz:19"}
+        with pytest.raises(ValueError, match="expected 0-9"):
+            kbuild._check_compression()
+        kbuild._compression = {"vmlinux": "zstd:19"}
+        kbuild._check_compression()
+
+    def test_missing_compression_tool(self, tmp_path, monkeypatch):
+        kbuild = _kbuild(tmp_path)
+        kbuild._compression = {"vmlinux": "zstd"}
+        kbuild._check_compression()
+        monkeypatch.setattr(
+            shutil, "which", lambda tool: None if tool == "zstd" else tool
+        )
+        with pytest.raises(ValueError, match="zstd"):
+            kbuild._check_compression(check_tools=True)
+
+    def test_compression_failure(self, tmp_path, monkeypatch):
+        monkeypatch.setitem(
+            kernelci.kbuild.COMPRESSION_CODECS, "xz", (["false"], ".xz")
+        )
+        kbuild = _kbuild(tmp_path)
+        kbuild._backend = "make"
+        af_dir = tmp_path / "artifacts"
+        kbuild._artifacts = ["bzImage", "vmlinux"]
+        (af_dir / "bzImage").write_bytes(b"kernel")
+        (af_dir / "vmlinux").write_bytes(b"vmlinux")
+
+        storage = FakeStorage()
+        kbuild._get_storage = lambda: storage
+        kbuild._apijobname = "kbuild-gcc-x86"
+        kbuild._node = {"id": "node123", "data": {}}
+        kbuild._full_artifacts = {}
+
+        node_af = kbuild.upload_artifacts()
+
+        assert node_af == {
+            "kernel": "https://storage.test/kbuild-gcc-x86-node123/bzImage"
+        }
+        assert list(kbuild._full_artifacts) == ["bzImage"]
+        assert not list(af_dir.glob("*.xz"))
+
 
 class TestPackageDtbs:
     def test_dtbs_are_packed_into_archive(self, tmp_path):
@@ -8,17 +8,23 @@
 
 """Unit test for KernelCI Runtime implementation"""
 
+import gzip
+import threading
 import types
 from pathlib import Path
 
+import kubernetes
 import pytest
+import urllib3
 import yaml
 from jinja2 import Environment, FileSystemLoader
 from jinja2.exceptions import TemplateRuntimeError
 
 import kernelci.config
+import kernelci.config.runtime
 import kernelci.legacy.lava
 import kernelci.runtime
+import kernelci.runtime.kubernetes
 import kernelci.runtime.lava
 from kernelci.runtime.pull_labs import compute_tuxrun_parameters
 
@@ -118,6 +124,46 @@ class _FakeSession:
         return self._post_handler(url, json)
 
 
+LAVA_LOG_YAML = """\
+- {"dt": "2026-01-01T10:00:00.000", "lvl": "info", "msg": "start: 1 deploy"}
+- {"dt": "2026-01-01T10:00:01.000", "lvl": "target", "msg": "Linux version"}
+- {"dt": "2026-01-01T10:00:02.000", "lvl": "results", "msg": {"case": "login"}}
+- {dt: 2026-01-01T10:00:03.000, lvl: target, msg: "\\e[0m  color  "}
+- dt: '2026-01-01T10:00:04.000'
+  lvl: target
+  msg: |
+    multi-line
+    message
+- {"dt": "2026-01-01T10:00:05.000", "lvl": "target", "msg": "   "}
+- {"dt": "2026-01-01T10:00:06.000", "lvl": "target", "msg": NaN}
+- {"dt": "2026-01-01T10:00:07.000", "lvl": "target", "msg": -Infinity}
+"""
+
+
+def test_lava_log_parser(tmp_path):
+    """Test that the LAVA log is parsed one entry at a time."""
+    expected = [
+        (
+            entry["dt"],
+            entry["lvl"],
+            entry["msg"].strip().replace("\x1b", "^["),
+        )
+        for entry in yaml.safe_load(LAVA_LOG_YAML)
+        if isinstance(entry["msg"], str) and entry["msg"].strip()
+    ]
+    text = "Linux version\n^[[0m  color\nmulti-line\nmessage\nNaN\n-Infinity\n"
+    log_file = tmp_path / "output.yaml"
+    log_file.write_text(LAVA_LOG_YAML)
+    with open(log_file, encoding="utf-8") as log_data:
+        for data in (LAVA_LOG_YAML, LAVA_LOG_YAML.encode(), log_data):
+            parser = kernelci.runtime.lava.LogParser(data)
+            assert list(parser.iter_raw_log()) == expected
+            assert parser.get_text() == text
+        parser.to_text_file(str(tmp_path / "log.txt.gz"))
+    with gzip.open(tmp_path / "log.txt.gz", "rt") as text_log:
+        assert text_log.read() == text
+
+
 def _lava_callback(lava_results):
     return kernelci.runtime.lava.Callback(
         {
@@ -199,6 +245,69 @@ def test_lava_callback_infrastructure_setup_failures_stay_incomplete(
     assert hierarchy["child_nodes"][0]["node"]["result"] == "fail"
 
 
+def test_lava_callback_decodes_results_once(monkeypatch):
+    """Each results document should only be decoded once per callback."""
+    suites = {
+        "lava": [
+            {"name": "job", "result": "pass", "metadata": {}},
+            {"name": "0_kselftest-a", "result": "pass", "metadata": {}},
+            {"name": "1_kselftest-b", "result": "fail", "metadata": {}},
+            {"name": "2_tast", "result": "pass", "metadata": {}},
+        ],
+        "0_kselftest-a": [
+            {"name": "case-1", "result": "pass", "metadata": {"set": "s1"}},
+            {"name": "case-2", "result": "fail", "metadata": {"set": "s2"}},
+        ],
+        "1_kselftest-b": [
+            {"name": "case-1", "result": "pass", "metadata": {"set": "s1"}},
+        ],
+        "0_tast": [
+            {
+                "name": "os-release",
+                "result": "pass",
+                "metadata": {},
+                "measurement": "bookworm",
+            },
+        ],
+    }
+    callback = kernelci.runtime.lava.Callback(
+        {
+            "status": kernelci.runtime.lava.Callback.COMPLETE,
+            "definition": yaml.safe_dump({"metadata": {"kernelci.node": "n"}}),
+            "results": {
+                name: yaml.safe_dump(tests) for name, tests in suites.items()
+            },
+        }
+    )
+    decoded = []
+    yaml_load = yaml.load
+
+    def _load(stream, Loader):
+        decoded.append(stream)
+        return yaml_load(stream, Loader=Loader)
+
+    monkeypatch.setattr(yaml, "load", _load)
+    job_node = dict(_lava_job_node(), result="pass")
+    results = callback.get_results()
+    hierarchy = callback.get_hierarchy(results, job_node)
+    assert not callback.is_infra_error()
+    assert callback.get_meta("kernelci.node") == "n"
+    assert callback.get_meta("missing") is None
+    assert len(decoded) == len(suites) + 1
+    assert hierarchy["node"]["result"] == "fail"
+    suite_results = {
+        child["node"]["name"]: child["node"]["result"]
+        for child in hierarchy["child_nodes"]
+    }
+    assert suite_results == {
+        "kselftest-a": "fail",
+        "kselftest-b": "fail",
+        "tast": "pass",
+    }
+    tast = hierarchy["child_nodes"][2]["child_nodes"][0]["node"]
+    assert tast["data"]["misc"]["measurement"] == "bookworm"
+
+
 def test_runtimes_init():
     """Test that all the runtimes can be initialised (offline)"""
     config = kernelci.config.load("tests/configs/runtimes.yaml")
@@ -208,6 +317,30 @@ def test_runtimes_init():
         kernelci.runtime.get_runtime(runtime_config)
 
 
+def test_runtime_template_cache(tmp_path):
+    """Test that Jinja2 templates are compiled once and cached on disk."""
+    config = kernelci.config.load("tests/configs/runtimes.yaml")
+    template_dir = tmp_path / "templates"
+    template_dir.mkdir()
+    (template_dir / "job.jinja2").write_text("{{ kci_yaml_dump(params) }}")
+    job_config = types.SimpleNamespace(template="job.jinja2")
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    runtimes = [
+        kernelci.runtime.get_runtime(
+            config["runtimes"]["shell"],
+            custom_template_dir=str(template_dir),
+            template_cache_dir=str(cache_dir),
+            template_auto_reload=False,
+        )
+        for _ in range(2)
+    ]
+    templates = [runtime._get_template(job_config) for runtime in runtimes]
+    assert templates[0] is templates[1]
+    assert templates[0].render(params={"a": 1}) == "a: 1\n"
+    assert len(list(cache_dir.iterdir())) == 1
+
+
 def test_lava_priority_hierarchy():
     """Test LAVA priority: human=highest, tree=high/medium/low"""
     config = kernelci.config.load("tests/configs/lava-runtimes.yaml")
@@ -493,6 +626,143 @@ def test_lava_submit_rest():
     assert captured["json"]["definition"] == "jobdef"
 
 
+def test_kubernetes_clusters_load_cache(monkeypatch):
+    """Test the cached k8s clusters load and per-context API clients."""
+    clients = []
+    requests = []
+    pending = {"ctx-a": 3, "ctx-b": 1}
+
+    def new_client_from_config(context):
+        clients.append(context)
+        return context
+
+    class _CoreV1Api:
+        def __init__(self, client):
+            self._context = client
+
+        def list_namespaced_pod(self, namespace, field_selector, **kwargs):
+            assert field_selector == "status.phase=Pending"
+            requests.append(self._context)
+            return types.SimpleNamespace(items=[None] * pending[self._context])
+
+    monkeypatch.setattr(
+        kubernetes.config, "new_client_from_config", new_client_from_config
+    )
+    monkeypatch.setattr(kubernetes.client, "CoreV1Api", _CoreV1Api)
+    monkeypatch.setattr(
+        kubernetes.utils, "create_from_yaml", lambda client, path: client
+    )
+    runtime_config = kernelci.config.runtime.RuntimeKubernetes(
+        name="k8s", lab_type="kubernetes", context=["ctx-a", "ctx-b"]
+    )
+    k8s = kernelci.runtime.get_runtime(runtime_config)
+    try:
+        submitted = [k8s.submit("job.yaml") for _ in range(4)]
+    finally:
+        k8s.stop_load_refresh()
+    assert submitted == ["ctx-b", "ctx-b", "ctx-a", "ctx-b"]
+    assert sorted(requests) == ["ctx-a", "ctx-b"]
+    assert sorted(clients) == ["ctx-a", "ctx-b"]
+
+
+def _k8s_pod(job_name, version, reason=None):
+    state = types.SimpleNamespace(
+        terminated=types.SimpleNamespace(reason=reason) if reason else None
+    )
+    statuses = [types.SimpleNamespace(state=state)] if version > 1 else None
+    return types.SimpleNamespace(
+        metadata=types.SimpleNamespace(
+            labels={"job-name": job_name}, resource_version=str(version)
+        ),
+        status=types.SimpleNamespace(container_statuses=statuses),
+    )
+
+
+def _k8s_pod_event(event_type, job_name, version, reason=None):
+    return {"type": event_type, "object": _k8s_pod(job_name, version, reason)}
+
+
+def _k8s_job_watcher(monkeypatch, streams, pods=None, **kwargs):
+    """Get a JobWatcher with fake watch streams and listed pods
+
+    The streams only start once the returned event is set.
+    """
+    watches = []
+    started = threading.Event()
+
+    class _Watch:
+        def stream(self, func, **kwargs):
+            assert kwargs["label_selector"] == "job-name"
+            started.wait()
+            watches.append(kwargs.get("resource_version"))
+            stream = streams.pop(0) if streams else []
+            if isinstance(stream, Exception):
+                raise stream
+            yield from stream
+
+        def stop(self):
+            pass
+
+    def list_namespaced_pod(namespace, label_selector, **kwargs):
+        job_name = label_selector.split("=")[1]
+        return types.SimpleNamespace(items=(pods or {}).get(job_name, []))
+
+    monkeypatch.setattr(kubernetes.watch, "Watch", _Watch)
+    monkeypatch.setattr(kernelci.runtime.kubernetes.time, "sleep", lambda _: 0)
+    watcher = kernelci.runtime.kubernetes.JobWatcher(
+        types.SimpleNamespace(list_namespaced_pod=list_namespaced_pod),
+        **kwargs,
+    )
+    return watcher, watches, started
+
+
+def test_kubernetes_job_watcher(monkeypatch):
+    """Test waiting for several k8s jobs with a shared watch."""
+    streams = [
+        [
+            _k8s_pod_event("ADDED", "job-a", 1),
+            _k8s_pod_event("MODIFIED", "job-a", 2),
+            _k8s_pod_event("MODIFIED", "job-b", 3, "Error"),
+        ],
+        urllib3.exceptions.ProtocolError("Connection reset"),
+        [
+            _k8s_pod_event("MODIFIED", "job-c", 4, "Completed"),
+            _k8s_pod_event("MODIFIED", "job-a", 5, "Completed"),
+        ],
+    ]
+    pods = {"job-b": [_k8s_pod("job-b", 3, "Error")]}
+    watcher, watches, started = _k8s_job_watcher(monkeypatch, streams, pods)
+    futures = [watcher.submit(name) for name in ("job-a", "job-b", "job-a")]
+    assert futures[1].result(timeout=10) == 1
+    started.set()
+    assert [future.result(timeout=10) for future in futures] == [0, 1, 0]
+    assert watches == [None, "3", "3"]
+    # Already terminated, found without any new watch events
+    assert watcher.wait("job-b") == 1
+    assert not watcher._waiters
+
+
+def test_kubernetes_job_watcher_errors(monkeypatch):
+    """Test the k8s job watch errors being set on the pending futures."""
+    forbidden = kubernetes.client.rest.ApiException(status=403)
+    watcher, _, started = _k8s_job_watcher(monkeypatch, [forbidden])
+    futures = [watcher.submit(name) for name in ("job-a", "job-b")]
+    started.set()
+    for future in futures:
+        assert future.exception(timeout=10) is forbidden
+    assert not watcher._waiters
+    # Transient errors are retried until the deadline
+    error = urllib3.exceptions.ReadTimeoutError(None, None, "Read timed out")
+    watcher, watches, started = _k8s_job_watcher(
+        monkeypatch, [error] * 3, retry_timeout=0
+    )
+    future = watcher.submit("job-a")
+    started.set()
+    assert future.exception(timeout=10) is error
+    assert len(watches) == 1
+    assert not watcher._waiters
+
+
 def _node_with_branch(branch):
     return {"data": {"kernel_revision": {"branch": branch}}}
 
@@ -4,10 +4,19 @@
 
 """Unit tests for kernelci.scheduler edge-triggered matching (#2912)"""
 
+import itertools
+import random
+import time
 import types
 import unittest
 
-from kernelci.scheduler import Scheduler
+from kernelci.scheduler import (
+    PowerOfTwoSelection,
+    RuntimeLoadCache,
+    RuntimeSelection,
+    Scheduler,
+    WeightedRoundRobinSelection,
+)
 
 
 def _entry(event):
@@ -19,6 +28,7 @@ def _scheduler(entries):
     """Build a Scheduler with a preset list of entries, bypassing __init__."""
     sched = Scheduler.__new__(Scheduler)
     sched._scheduler = entries
+    sched._index = Scheduler._build_index(entries)
     return sched
 
 
@@ -169,5 +179,241 @@ class TestGetConfigsEdgeTrigger(unittest.TestCase):
         )
 
 
+def _linear_get_configs(entries, event, channel="node"):
+    """Reference implementation scanning all the entries for every event."""
+    for entry in entries:
+        if entry.event.get("channel") != channel:
+            continue
+        sched_event = entry.event.copy()
+        sched_event.pop("channel")
+        if not sched_event.items() <= event.items():
+            continue
+        if event.get("op") == "updated" and "previous_state" in event:
+            previous_event = dict(event)
+            previous_event["state"] = event.get("previous_state")
+            previous_event["result"] = event.get("previous_result")
+            if sched_event.items() <= previous_event.items():
+                continue
+        yield entry
+
+
+class TestGetConfigsIndex(unittest.TestCase):
+    """get_configs() should give the same results as a linear scan."""
+
+    NAMES = ["checkout", "kbuild-gcc-14-arm", "kbuild-gcc-14-x86", "kunit"]
+    KINDS = ["checkout", "kbuild", "job", "test"]
+    STATES = ["running", "available", "closing", "done"]
+    RESULTS = [None, "pass", "fail", "incomplete"]
+
+    def _random_criteria(self, rand):
+        criteria = {"channel": rand.choice(["node", "node", "retry"])}
+        for key, values in (
+            ("name", self.NAMES),
+            ("kind", self.KINDS),
+            ("state", self.STATES),
+            ("result", self.RESULTS),
+        ):
+            if rand.random() < 0.4:
+                criteria[key] = rand.choice(values)
+        return criteria
+
+    def _random_event(self, rand):
+        event = {
+            "id": "6332d8f51a45d41c279e7a01",
+            "op": rand.choice(["created", "updated"]),
+            "name": rand.choice(self.NAMES),
+            "kind": rand.choice(self.KINDS),
+            "state": rand.choice(self.STATES),
+            "result": rand.choice(self.RESULTS),
+        }
+        if rand.random() < 0.2:
+            del event[rand.choice(["name", "kind", "state", "result"])]
+        if event["op"] == "updated" and rand.random() < 0.7:
+            event["previous_state"] = rand.choice(self.STATES)
+            event["previous_result"] = rand.choice(self.RESULTS)
+        return event
+
+    def test_replay_event_stream(self):
+        """Replay a stream of events with both the index and a linear scan."""
+        rand = random.Random(2912)
+        entries = [_entry(self._random_criteria(rand)) for _ in range(300)]
+        sched = _scheduler(entries)
+        for event, channel in itertools.product(
+            (self._random_event(rand) for _ in range(500)), ("node", "retry")
+        ):
+            self.assertEqual(
+                list(sched.get_configs(event, channel)),
+                list(_linear_get_configs(entries, event, channel)),
+            )
+
+
+class _Runtime:
+    """Fake runtime with a preset load"""
+
+    def __init__(self, name, load, lab_type="lava"):
+        self.config = types.SimpleNamespace(name=name, lab_type=lab_type)
+        self.load = load
+        self.probes = 0
+
+    def get_load(self, platforms):
+        self.probes += 1
+        if isinstance(self.load, Exception):
+            raise self.load
+        return self.load
+
+
+class TestGetScheduleSelection(unittest.TestCase):
+    """get_schedule() should select runtimes according to their load."""
+
+    def _schedule(self, runtimes, selection, count=1, entry_selection=None):
+        entry = types.SimpleNamespace(
+            event={"channel": "node", "kind": "kbuild"},
+            job="baseline",
+            runtime={"type": "lava"},
+            platforms=["qemu"],
+            rules=None,
+        )
+        if entry_selection:
+            entry.runtime["selection"] = entry_selection
+        configs = {
+            "scheduler": [entry],
+            "jobs": {"baseline": types.SimpleNamespace(name="baseline")},
+            "platforms": {"qemu": types.SimpleNamespace(name="qemu")},
+        }
+        sched = Scheduler(
+            configs,
+            {runtime.config.name: runtime for runtime in runtimes},
+            selection=selection,
+        )
+        try:
+            return [
+                runtime.config.name
+                for _ in range(count)
+                for _, runtime, _, _ in sched.get_schedule({"kind": "kbuild"})
+            ]
+        finally:
+            sched.close()
+
+    def test_least_queued(self):
+        """The least loaded runtime is selected, unknown loads come last."""
+        runtimes = [
+            _Runtime("lab-busy", 12),
+            _Runtime("lab-idle", 3),
+            _Runtime("lab-unknown", None),
+            _Runtime("lab-broken", ValueError("no response")),
+        ]
+        self.assertEqual(
+            self._schedule(runtimes, "least-queued", 5), ["lab-idle"] * 5
+        )
+        self.assertEqual([runtime.probes for runtime in runtimes], [1] * 4)
+
+    def test_power_of_two(self):
+        """The most loaded runtime is never selected."""
+        runtimes = [_Runtime(f"lab-{load}", load) for load in range(4)]
+        selection = PowerOfTwoSelection(random.Random(2912))
+        names = self._schedule(runtimes, selection, 50)
+        self.assertNotIn("lab-3", names)
+        self.assertIn("lab-1", names)
+
+    def test_weighted_round_robin(self):
+        """Runtimes are selected in proportion to their weights."""
+        runtimes = [
+            _Runtime("lab-a", 0),
+            _Runtime("lab-b", 0),
+            _Runtime("lab-down", None),
+        ]
+        selection = WeightedRoundRobinSelection({"lab-a": 3})
+        names = self._schedule(runtimes, selection, 8)
+        self.assertEqual(names.count("lab-a"), 6)
+        self.assertEqual(names.count("lab-b"), 2)
+        self.assertEqual(names[:4].count("lab-b"), 1)
+
+    def test_selection_is_abstract(self):
+        """Selection policies need to implement select()."""
+        with self.assertRaises(TypeError):
+            RuntimeSelection()
+
+    def test_entry_selection(self):
+        """Scheduler entries can override the default selection policy."""
+        runtimes = [_Runtime("lab-busy", 12), _Runtime("lab-idle", 0)]
+        self.assertEqual(
+            self._schedule(runtimes, None, 3, "least-queued"),
+            ["lab-idle"] * 3,
+        )
+        with self.assertRaises(ValueError):
+            self._schedule(runtimes, "unknown")
+
+    def test_reload(self):
+        """A reloaded scheduler uses the new configs and the same runtimes."""
+        runtime = _Runtime("lab", 0)
+        entry = types.SimpleNamespace(
+            event={"channel": "node", "kind": "kbuild"},
+            job="baseline",
+            runtime={"name": "lab"},
+            platforms=["qemu", "rpi4"],
+            rules=None,
+        )
+        configs = {
+            "scheduler": [entry],
+            "jobs": {"baseline": types.SimpleNamespace(name="baseline")},
+            "platforms": {"qemu": types.SimpleNamespace(name="qemu")},
+        }
+        sched = Scheduler(configs, {"lab": runtime})
+        configs = dict(configs)
+        configs["platforms"] = {
+            name: types.SimpleNamespace(name=name) for name in entry.platforms
+        }
+        sched._loads.get(runtime, [])
+        reloaded = sched.reload(configs)
+        self.assertFalse(sched._loads._probes)
+        sched.close()
+        try:
+            schedule = list(reloaded.get_schedule({"kind": "kbuild"}))
+        finally:
+            reloaded.close()
+        self.assertEqual(
+            [platform.name for _, _, platform, _ in schedule], ["qemu", "rpi4"]
+        )
+        self.assertIs(schedule[0][1], runtime)
+
+    def test_load_cache_refresh(self):
+        """Loads are cached and refreshed in the background."""
+        runtime = _Runtime("lab", 5)
+        platforms = [types.SimpleNamespace(name="qemu")]
+        cache = RuntimeLoadCache(ttl=0.2)
+        try:
+            self.assertEqual(cache.get(runtime, platforms), 5)
+            runtime.load = 1
+            self.assertEqual(cache.get(runtime, platforms), 5)
+            for _ in range(100):
+                if cache.get(runtime, platforms) == 1:
+                    break
+                time.sleep(0.01)
+            self.assertEqual(cache.get(runtime, platforms), 1)
+            self.assertGreater(runtime.probes, 1)
+        finally:
+            cache.stop()
+
+    def test_load_cache_evict(self):
+        """Loads not requested within the TTL stop being refreshed."""
+        runtime = _Runtime("lab", 5)
+        platforms = [types.SimpleNamespace(name="qemu")]
+        cache = RuntimeLoadCache(ttl=0.1)
+        try:
+            for _ in range(2):
+                self.assertEqual(cache.get(runtime, platforms), 5)
+                thread = cache._thread
+                thread.join(timeout=10)
+                self.assertFalse(thread.is_alive())
+                self.assertIsNone(cache._thread)
+                probes = runtime.probes
+                time.sleep(0.2)
+                self.assertEqual(runtime.probes, probes)
+                # Refreshing starts again after being stopped
+                cache.stop()
+        finally:
+            cache.stop()
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,399 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+#
+# Copyright (C) 2026 Collabora Limited
+
+"""Unit tests for the kernelci.storage implementations"""
+
+import hashlib
+import http.server
+import os
+import pathlib
+import posixpath
+import threading
+import types
+
+import requests
+import urllib3
+import urllib3.fields
+from azure.core.exceptions import ResourceExistsError
+
+from kernelci.storage import Storage, get_upload_batches
+from kernelci.storage.azure import StorageAzureFiles
+from kernelci.storage.backend import MultipartStream, StorageBackend
+from kernelci.storage.dedup import DedupStorage, ManifestIndex, hash_files
+
+
+class _UploadHandler(http.server.BaseHTTPRequestHandler):
+    """HTTP handler recording the uploads with keep-alive connections"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers["Content-Length"])
+        self.server.uploads.append(
+            (self.client_address, self.path, self.rfile.read(length))
+        )
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def do_HEAD(self):
+        self.send_response(200 if self.path in self.server.files else 404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class _RecordingStorage(Storage):
+    """Storage implementation recording the uploaded files"""
+
+    def __init__(self):
+        super().__init__(
+            types.SimpleNamespace(base_url="https://storage.test/"), None
+        )
+        self.uploads = []
+
+    def _upload(self, file_paths, dest_path):
+        self.uploads.extend(
+            "/".join([dest_path, file_dst]) for _, file_dst in file_paths
+        )
+
+
+class _FakeShare:
+    """Azure Files share client recording the requests"""
+
+    def __init__(self):
+        self.dirs = set()
+        self.files = {}
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def get_directory_client(self, directory_path):
+        return _FakeDirectory(self, directory_path)
+
+
+class _FakeDirectory:
+    def __init__(self, share, path):
+        self._share = share
+        self._path = path
+
+    def exists(self):
+        self._share.requests.append(("exists", self._path))
+        return self._path in self._share.dirs
+
+    def create_directory(self):
+        with self._share._lock:
+            self._share.requests.append(("create", self._path))
+            parent = posixpath.dirname(self._path)
+            assert not parent or parent in self._share.dirs
+            if self._path in self._share.dirs:
+                raise ResourceExistsError("The specified resource exists")
+            self._share.dirs.add(self._path)
+
+    def get_file_client(self, file_name):
+        return _FakeFile(self._share, posixpath.join(self._path, file_name))
+
+
+class _FakeFile:
+    def __init__(self, share, path):
+        self._share = share
+        self._path = path
+
+    def upload_file(self, data, content_settings, max_concurrency=None):
+        assert max_concurrency == 1
+        with self._share._lock:
+            self._share.requests.append(("upload", self._path))
+            self._share.files[self._path] = data.read()
+
+
+def _start_server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _UploadHandler)
+    server.uploads = []
+    server.files = set()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_multipart_stream(tmp_path):
+    """The streamed body is the same as the one encoded by requests"""
+    log_file = tmp_path / "build.log"
+    log_file.write_bytes(b"build log\n" * 100000)
+    empty_file = tmp_path / "empty"
+    empty_file.write_bytes(b"")
+    fields = {"path": "kbuild-1234"}
+    files = {
+        "file0": ('logs/"build".log', str(log_file)),
+        "file1": ("empty", str(empty_file)),
+    }
+    stream = MultipartStream(fields, files)
+    body = b"".join(stream)
+    assert len(body) == len(stream)
+    assert stream.file_size == 1000000
+    boundary = stream.content_type.split("boundary=")[1]
+    # Encode the files in the same way as requests does
+    ref_fields = list(fields.items())
+    for name, (file_name, file_path) in files.items():
+        with open(file_path, "rb") as ref_file:
+            field = urllib3.fields.RequestField(
+                name=name, data=ref_file.read(), filename=file_name
+            )
+        field.make_multipart(content_type=None)
+        ref_fields.append(field)
+    ref_body, _ = urllib3.encode_multipart_formdata(
+        ref_fields, boundary=boundary
+    )
+    assert body == ref_body
+
+
+def test_storage_backend_upload(tmp_path, mocker):
+    """Uploads are streamed and reuse the same connection"""
+    server = _start_server()
+    config = types.SimpleNamespace(
+        api_url=f"http://127.0.0.1:{server.server_port}/",
+        base_url="https://files.kernelci.org/",
+    )
+    storage = StorageBackend(config, "secret-token")
+    post = mocker.spy(requests.Session, "post")
+    paths = []
+    for index in range(3):
+        path = tmp_path / f"file{index}.txt"
+        path.write_text(f"file {index}\n")
+        paths.append(path)
+    try:
+        urls = [
+            storage.upload_single((str(path), path.name), "kbuild-1234")
+            for path in paths
+        ]
+    finally:
+        server.shutdown()
+    assert urls == [
+        f"https://files.kernelci.org/kbuild-1234/file{index}.txt"
+        for index in range(3)
+    ]
+    assert len(server.uploads) == 3
+    assert len({client for client, _, _ in server.uploads}) == 1
+    assert all(path == "/upload" for _, path, _ in server.uploads)
+    assert b"file 2\n" in server.uploads[2][2]
+    assert all(
+        isinstance(call.kwargs["data"], MultipartStream)
+        for call in post.call_args_list
+    )
+
+
+def test_get_upload_batches(tmp_path):
+    """Small files are grouped and large ones are uploaded on their own"""
+    file_paths = []
+    for name, size in [
+        ("a", 10),
+        ("big", 100),
+        ("b", 40),
+        ("c", 40),
+        ("d", 1),
+        ("e", 1),
+        ("f", 1),
+    ]:
+        path = tmp_path / name
+        path.write_bytes(b"x" * size)
+        file_paths.append((str(path), name))
+    batches = get_upload_batches(file_paths, max_size=100, max_files=3)
+    assert [[dst for _, dst in batch] for batch in batches] == [
+        ["big"],
+        ["a", "b", "c"],
+        ["d", "e", "f"],
+    ]
+    batches = get_upload_batches(file_paths, max_size=60, max_files=10)
+    assert [[dst for _, dst in batch] for batch in batches] == [
+        ["big"],
+        ["a", "b"],
+        ["c", "d", "e", "f"],
+    ]
+
+
+def test_storage_backend_upload_batches(tmp_path):
+    """Files are uploaded with fewer requests than one per file"""
+    server = _start_server()
+    config = types.SimpleNamespace(
+        api_url=f"http://127.0.0.1:{server.server_port}/",
+        base_url="https://files.kernelci.org/",
+    )
+    storage = StorageBackend(config, "secret-token")
+    file_paths = []
+    for index in range(40):
+        path = tmp_path / f"file{index}.txt"
+        path.write_text(f"file {index}\n")
+        file_paths.append((str(path), f"logs/{path.name}"))
+    try:
+        results = list(
+            storage.upload_batches(file_paths, "kbuild-1234", max_workers=4)
+        )
+    finally:
+        server.shutdown()
+    assert len(server.uploads) == 2
+    assert all(error is None for _, _, error in results)
+    urls = {}
+    for _, batch_urls, _ in results:
+        urls.update(batch_urls)
+    assert urls == {
+        f"logs/file{index}.txt": (
+            f"https://files.kernelci.org/kbuild-1234/logs/file{index}.txt"
+        )
+        for index in range(40)
+    }
+    assert b"file 39\n" in b"".join(body for _, _, body in server.uploads)
+
+
+def test_hash_files(tmp_path):
+    """Files are hashed in parallel with the digests in the same order"""
+    paths = []
+    for index in range(5):
+        path = tmp_path / f"file{index}"
+        path.write_bytes(bytes([index]) * (index * 1000000 + 1))
+        paths.append(str(path))
+    assert hash_files(paths, jobs=3) == [
+        hashlib.sha256(pathlib.Path(path).read_bytes()).hexdigest()
+        for path in paths
+    ]
+
+
+def test_dedup_storage(tmp_path):
+    """Files already uploaded with the same contents are skipped"""
+    index_path = tmp_path / "index.json"
+    (tmp_path / "Image").write_bytes(b"kernel image")
+    (tmp_path / "config").write_text("CONFIG_X=y\n")
+    file_paths = [
+        (str(tmp_path / "Image"), "Image"),
+        (str(tmp_path / "config"), "kernel/.config"),
+    ]
+
+    first = _RecordingStorage()
+    dedup = DedupStorage(first, str(index_path), verify=False)
+    urls = dedup.upload_multiple(file_paths, "kbuild-1")
+    assert first.uploads == ["kbuild-1/Image", "kbuild-1/kernel/.config"]
+    assert urls == {
+        "Image": "https://storage.test/kbuild-1/Image",
+        "kernel/.config": "https://storage.test/kbuild-1/kernel/.config",
+    }
+    # The index is only saved when flushing
+    assert not index_path.exists()
+    dedup.flush()
+
+    # Load the index again from the file, as for another build
+    (tmp_path / "config").write_text("CONFIG_X=n\n")
+    (tmp_path / "vmlinux").write_bytes(b"kernel image")
+    second = _RecordingStorage()
+    dedup = DedupStorage(second, str(index_path), verify=False)
+    urls = dedup.upload_multiple(
+        file_paths + [(str(tmp_path / "vmlinux"), "vmlinux")], "kbuild-2"
+    )
+    assert second.uploads == ["kbuild-2/kernel/.config", "kbuild-2/vmlinux"]
+    assert urls == {
+        "Image": "https://storage.test/kbuild-1/Image",
+        "kernel/.config": "https://storage.test/kbuild-2/kernel/.config",
+        "vmlinux": "https://storage.test/kbuild-2/vmlinux",
+    }
+    assert dedup.upload_single(file_paths[0], "kbuild-3") == (
+        "https://storage.test/kbuild-1/Image"
+    )
+
+
+def test_manifest_index_shared(tmp_path):
+    """Entries saved by other index objects are kept"""
+    index_path = str(tmp_path / "index.json")
+    first = ManifestIndex(index_path)
+    second = ManifestIndex(index_path)
+    first.add("d1", "Image", "https://storage.test/kbuild-1/Image")
+    first.save()
+    os.chmod(index_path, 0o664)
+    second.add("d2", "vmlinux", "https://storage.test/kbuild-2/vmlinux")
+    second.save()
+    assert os.stat(index_path).st_mode & 0o777 == 0o664
+    index = ManifestIndex(index_path)
+    assert index.get("d1", "Image") == "https://storage.test/kbuild-1/Image"
+    assert index.get("d2", "vmlinux") == (
+        "https://storage.test/kbuild-2/vmlinux"
+    )
+    # Removed entries are not merged back from the file
+    index.remove("d1", "Image")
+    index.save()
+    assert ManifestIndex(index_path).get("d1", "Image") is None
+
+
+def test_dedup_storage_verify(tmp_path):
+    """Files no longer available on the storage server are uploaded again"""
+    server = _start_server()
+    base_url = f"http://127.0.0.1:{server.server_port}/"
+    (tmp_path / "Image").write_bytes(b"kernel image")
+    file_path = (str(tmp_path / "Image"), "Image")
+    index_path = str(tmp_path / "index.json")
+    try:
+        storage = _RecordingStorage()
+        storage.config.base_url = base_url
+        dedup = DedupStorage(storage, index_path)
+        assert dedup.upload_single(file_path, "kbuild-1") == (
+            f"{base_url}kbuild-1/Image"
+        )
+        server.files.add("/kbuild-1/Image")
+        assert dedup.upload_single(file_path, "kbuild-2") == (
+            f"{base_url}kbuild-1/Image"
+        )
+        server.files.clear()
+        assert dedup.upload_single(file_path, "kbuild-3") == (
+            f"{base_url}kbuild-3/Image"
+        )
+    finally:
+        server.shutdown()
+    assert storage.uploads == ["kbuild-1/Image", "kbuild-3/Image"]
+
+
+def test_azure_files_directories(tmp_path):
+    """Directories are only created once and files uploaded in parallel"""
+    share = _FakeShare()
+    config = types.SimpleNamespace(
+        base_url="https://kernelci.file.core.windows.net/",
+        share="artifacts",
+        sas_public_token="?sv=token",
+        max_concurrency=4,
+        chunk_concurrency=1,
+        chunk_size=None,
+    )
+    storage = StorageAzureFiles(config, "secret-token")
+    storage._service = types.SimpleNamespace(
+        get_share_client=lambda **kwargs: share
+    )
+    file_paths = []
+    for vendor in ["qcom", "rockchip"]:
+        for index in range(3):
+            path = tmp_path / f"{vendor}-{index}.dtb"
+            path.write_bytes(f"{vendor} {index}".encode())
+            file_paths.append((str(path), f"dtbs/{vendor}/{path.name}"))
+    urls = storage.upload_multiple(file_paths, "kbuild-1234")
+    assert urls["dtbs/qcom/qcom-0.dtb"] == (
+        "https://kernelci.file.core.windows.net/"
+        "artifacts/kbuild-1234/dtbs/qcom/qcom-0.dtb?sv=token"
+    )
+    assert share.dirs == {
+        "kbuild-1234",
+        "kbuild-1234/dtbs",
+        "kbuild-1234/dtbs/qcom",
+        "kbuild-1234/dtbs/rockchip",
+    }
+    assert share.files["kbuild-1234/dtbs/rockchip/rockchip-2.dtb"] == (
+        b"rockchip 2"
+    )
+    assert not any(request == "exists" for request, _ in share.requests)
+    assert len(share.requests) == 4 + 6
+    share.requests.clear()
+    storage.upload_single(file_paths[0], "kbuild-1234")
+    assert share.requests == [
+        ("upload", "kbuild-1234/dtbs/qcom/qcom-0.dtb"),
+    ]
+    # Directories which already exist on the server are not an error
+    storage = StorageAzureFiles(config, "secret-token")
+    storage._service = types.SimpleNamespace(
+        get_share_client=lambda **kwargs: share
+    )
+    storage.upload_single(file_paths[0], "kbuild-1234")
+    assert len(share.requests) == 1 + 3 + 1